@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Codec benchmarks over the bundled test corpora and synthetic scaled inputs.
+
+Measures encode / decode throughput, per-call latency percentiles and peak memory
+of the binary, boost, portable storage, object and JSON codecs.
+
+>>> python -m monero_serialize.bench --json results.json
+
+Allocation profile of a single call, see alloc:
+
+>>> python -m monero_serialize.bench.alloc tx.bin --type Transaction --codec xmrserialize
+
+Performance regression gate against the checked-in baseline.json, see gate:
+
+>>> python -m monero_serialize.bench.gate
+'''
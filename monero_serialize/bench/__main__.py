@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Benchmark entry point
+
+>>> python -m monero_serialize.bench --codec xmrboost --corpus tx_01 --json -
+'''
+
+import argparse
+import json
+import sys
+
+from . import codecs
+from . import corpus
+from . import runner
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Monero serialization codec benchmarks')
+    parser.add_argument('--codec', action='append', choices=list(codecs.CODECS.keys()),
+                        help='Codec to benchmark, all by default')
+    parser.add_argument('--corpus', action='append',
+                        help='Corpus to benchmark, all by default: %s, the scaled and generated %s' % (
+                            ', '.join(c[0] for c in corpus.CORPORA),
+                            ', '.join('%sxN' % c for c in corpus.SCALED + [g[0] for g in corpus.GENERATED])))
+    parser.add_argument('--scale', action='append', type=int,
+                        help='Scale factor of the synthetic inputs, default 10')
+    parser.add_argument('--op', action='append', choices=['encode', 'decode'],
+                        help='Operation, both by default')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='Minimal measured time per benchmark in seconds')
+    parser.add_argument('--no-memory', action='store_true', default=False,
+                        help='Skip the peak memory measurement')
+    parser.add_argument('--json', dest='json_out',
+                        help='Write machine-readable results to the file, - for stdout')
+    parser.add_argument('--quiet', action='store_true', default=False,
+                        help='No text report')
+    return parser
+
+
+def main(args=None):
+    args = build_parser().parse_args(args)
+    report = None if args.quiet or args.json_out == '-' else lambda rec: print(runner.format_result(rec))
+
+    results = runner.run_benchmarks(codec_names=args.codec, corpus_names=args.corpus,
+                                    scales=args.scale or (10, ), ops=args.op or ('encode', 'decode'),
+                                    min_time=args.min_time, memory=not args.no_memory, progress=report)
+
+    doc = runner.results_doc(results)
+    if args.json_out == '-':
+        json.dump(doc, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    elif args.json_out:
+        with open(args.json_out, 'w') as fh:
+            json.dump(doc, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
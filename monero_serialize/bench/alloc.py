@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Allocation profiling of a single encode / decode call.
+
+Three views of the memory spent on the call:
+
+- constructed: objects created during the call, counted by hooking the constructors of the
+  xmrtypes classes and the wire primitives, i.e., load_blob bytearrays (load_bytes),
+  gen_elem_array lists, eref tuples and tracker objects. Transient objects are included.
+- retained: the object graph of the result, per class, shallow sizes.
+- sites: tracemalloc snapshot of the allocations alive after the call, per source line.
+
+>>> python -m monero_serialize.bench.alloc tests/data/tx_01.txt --type Transaction --codec xmrboost
+'''
+
+import argparse
+import binascii
+import collections
+import json
+import os
+import string
+import sys
+import tracemalloc
+
+from .. import xmrserialize as x
+from .. import xmrtypes as xmr
+from .. import helpers
+from . import codecs
+
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIM_BLOB = 'load_blob bytearray'
+PRIM_ARRAY = 'gen_elem_array list'
+PRIM_EREF = 'eref tuple'
+PRIM_TRACKER = 'tracker'
+
+
+class AllocCounter(object):
+    """
+    Number of objects and their shallow size per class / primitive
+    """
+
+    def __init__(self):
+        self.counts = collections.OrderedDict()  # name -> [count, bytes]
+
+    def add(self, name, obj):
+        entry = self.counts.get(name)
+        if entry is None:
+            entry = self.counts[name] = [0, 0]
+        entry[0] += 1
+        entry[1] += sys.getsizeof(obj)
+
+    def rows(self):
+        return sorted(self.counts.items(), key=lambda r: r[1][1], reverse=True)
+
+    def to_dict(self):
+        return collections.OrderedDict((k, {'count': v[0], 'bytes': v[1]}) for k, v in self.rows())
+
+
+class ConstructorHooks(object):
+    """
+    Temporarily replaces the primitives and the xmrtypes constructors with counting versions.
+    Module level functions are replaced in all package modules referencing them.
+    """
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.restore = []
+
+    def _modules(self):
+        root = x.__name__.rpartition('.')[0]
+        return [mod for name, mod in list(sys.modules.items())
+                if mod is not None and (name == root or name.startswith(root + '.'))]
+
+    def _patch_function(self, name, wrapper):
+        orig = getattr(x, name)
+        fnc = wrapper(orig)
+        for mod in self._modules():
+            if getattr(mod, name, None) is orig:
+                setattr(mod, name, fnc)
+                self.restore.append((mod, name, orig))
+
+    def _patch_init(self, cls, label=None):
+        orig = cls.__dict__['__init__']
+        counter = self.counter
+
+        def __init__(obj, *args, **kwargs):
+            counter.add(label if label else obj.__class__.__name__, obj)
+            orig(obj, *args, **kwargs)
+
+        cls.__init__ = __init__
+        self.restore.append((cls, '__init__', orig))
+
+    def __enter__(self):
+        counter = self.counter
+
+        def load_bytes(orig):
+            async def counted(reader, size):
+                res = await orig(reader, size)
+                counter.add(PRIM_BLOB, res)
+                return res
+            return counted
+
+        def gen_elem_array(orig):
+            def counted(size, elem_type=None):
+                res = orig(size, elem_type)
+                counter.add(PRIM_ARRAY, res)
+                return res
+            return counted
+
+        def eref(orig):
+            def counted(obj, key, is_assoc=None):
+                res = orig(obj, key, is_assoc)
+                if res is not None:
+                    counter.add(PRIM_EREF, res)
+                return res
+            return counted
+
+        self._patch_function('load_bytes', load_bytes)
+        self._patch_function('gen_elem_array', gen_elem_array)
+        self._patch_function('eref', eref)
+        for cls in (x.MessageType, x.VariantType, x.BlobType, x.ContainerType, x.TupleType):
+            self._patch_init(cls)
+        self._patch_init(helpers.Tracker, PRIM_TRACKER)
+        self._patch_init(helpers.TrackedObj, PRIM_TRACKER)
+        return self
+
+    def __exit__(self, *args):
+        for obj, name, orig in reversed(self.restore):
+            setattr(obj, name, orig)
+        self.restore = []
+
+
+def retained(obj, counter=None):
+    """
+    Counts objects of the graph reachable from obj, per class, shallow sizes
+    :param obj:
+    :param counter:
+    :return:
+    """
+    counter = AllocCounter() if counter is None else counter
+    seen = set()
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if id(cur) in seen or cur is None or isinstance(cur, type):
+            continue
+        seen.add(id(cur))
+        counter.add(cur.__class__.__name__, cur)
+
+        if isinstance(cur, (list, tuple, set)):
+            stack.extend(cur)
+        elif isinstance(cur, dict):
+            stack.extend(cur.keys())
+            stack.extend(cur.values())
+        elif isinstance(cur, x.XmrType):
+            if hasattr(cur, '__dict__'):
+                counter.add('__dict__', cur.__dict__)
+                stack.extend(cur.__dict__.values())
+            for slot in getattr(cur.__class__, '__slots__', ()):
+                stack.append(getattr(cur, slot, None))
+    return counter
+
+
+def allocation_sites(snapshot, limit=20):
+    """
+    Package allocations alive in the snapshot per source line
+    :param snapshot:
+    :param limit:
+    :return: list of (file:line, count, bytes)
+    """
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(True, os.path.join(PACKAGE_DIR, '*')),
+        tracemalloc.Filter(False, os.path.abspath(__file__)),
+    ])
+    res = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        res.append(('%s:%s' % (os.path.relpath(frame.filename, PACKAGE_DIR), frame.lineno), stat.count, stat.size))
+    return res
+
+
+def profile(fnc, limit=20):
+    """
+    Profiles allocations of the call
+    :param fnc: callable without arguments
+    :param limit: number of the allocation sites reported
+    :return: dict with constructed, retained, sites, peak
+    """
+    constructed = AllocCounter()
+    with ConstructorHooks(constructed):
+        fnc()
+
+    tracemalloc.start()
+    try:
+        res = fnc()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return collections.OrderedDict([
+        ('constructed', constructed.to_dict()),
+        ('retained', retained(res).to_dict()),
+        ('sites', [{'site': s[0], 'count': s[1], 'bytes': s[2]} for s in allocation_sites(snapshot, limit)]),
+        ('peak', peak),
+    ])
+
+
+def load_blob_file(fname):
+    """
+    Reads the blob file, hex-encoded files are decoded
+    :param fname:
+    :return:
+    """
+    with open(fname, 'rb') as fh:
+        data = fh.read()
+    stripped = data.strip()
+    if stripped and len(stripped) % 2 == 0 and all(c in string.hexdigits.encode('ascii') for c in set(stripped)):
+        return binascii.unhexlify(stripped)
+    return data
+
+
+def format_report(report):
+    lines = []
+    for section in ('constructed', 'retained'):
+        lines.append('%-40s %10s %12s' % (section, 'count', 'bytes'))
+        for name, val in report[section].items():
+            lines.append('  %-38s %10d %12d' % (name, val['count'], val['bytes']))
+        lines.append('')
+
+    lines.append('%-40s %10s %12s' % ('sites (alive after the call)', 'count', 'bytes'))
+    for site in report['sites']:
+        lines.append('  %-38s %10d %12d' % (site['site'], site['count'], site['bytes']))
+    lines.append('')
+    lines.append('peak traced memory: %d bytes' % report['peak'])
+    return '\n'.join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Allocation profile of decoding / encoding a blob file')
+    parser.add_argument('file', help='Blob file, raw or hex-encoded; JSON for xmrobj')
+    parser.add_argument('--type', dest='msg_type', default='Transaction',
+                        help='xmrtypes message type, default Transaction')
+    parser.add_argument('--codec', default='xmrboost', choices=list(codecs.CODECS.keys()),
+                        help='Blob format, default xmrboost')
+    parser.add_argument('--encode', action='store_true', default=False,
+                        help='Profile encoding of the decoded message instead of decoding')
+    parser.add_argument('--limit', type=int, default=20, help='Number of allocation sites')
+    parser.add_argument('--json', dest='json_out', help='Write the report as JSON to the file, - for stdout')
+    return parser
+
+
+def main(args=None):
+    args = build_parser().parse_args(args)
+    msg_type = getattr(xmr, args.msg_type, None)
+    if not isinstance(msg_type, type) or not issubclass(msg_type, x.XmrType):
+        raise ValueError('Unknown message type: %s' % args.msg_type)
+
+    codec = codecs.CODECS[args.codec]
+    if args.codec == 'xmrobj':
+        with open(args.file, 'rb') as fh:
+            payload = json.loads(fh.read().decode('utf8'))
+    else:
+        payload = load_blob_file(args.file)
+
+    if args.encode:
+        msg = helpers.run_sync(codec.decode(payload, msg_type))
+        report = profile(lambda: helpers.run_sync(codec.encode(msg, msg_type)), limit=args.limit)
+    else:
+        report = profile(lambda: helpers.run_sync(codec.decode(payload, msg_type)), limit=args.limit)
+
+    if args.json_out == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print(format_report(report))
+        if args.json_out:
+            with open(args.json_out, 'w') as fh:
+                json.dump(report, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Codecs under benchmark. Encoding produces the payload from the message, decoding the message back.
+All readers and writers are in-memory, the coroutines never suspend.
+'''
+
+import collections
+
+from .. import xmrserialize as x
+from .. import xmrboost as xmrb
+from .. import xmrrpc
+from .. import xmrobj as xmro
+from .. import xmrjson as xmrjs
+
+
+class Codec(object):
+    """
+    Binary serialization, xmrserialize.Archive
+    """
+    name = 'xmrserialize'
+
+    async def encode(self, msg, msg_type):
+        writer = x.MemoryReaderWriter()
+        await x.Archive(writer, True).message(msg, msg_type)
+        return bytes(writer.buffer)
+
+    async def decode(self, payload, msg_type):
+        return await x.Archive(x.BufferReader(payload), False).message(None, msg_type)
+
+    def size(self, payload):
+        """
+        Payload size in bytes for the throughput
+        :param payload:
+        :return:
+        """
+        return len(payload)
+
+
+class BoostCodec(Codec):
+    name = 'xmrboost'
+
+    async def encode(self, msg, msg_type):
+        writer = x.MemoryReaderWriter()
+        ar = xmrb.Archive(writer, True)
+        await ar.root()
+        await ar.message(msg, msg_type)
+        return bytes(writer.buffer)
+
+    async def decode(self, payload, msg_type):
+        ar = xmrb.Archive(x.BufferReader(payload), False)
+        await ar.root()
+        return await ar.message(None, msg_type)
+
+
+class KVCodec(Codec):
+    """
+    Portable storage, xmrrpc.KVArchive
+    """
+    name = 'xmrrpc'
+
+    async def encode(self, msg, msg_type):
+        writer = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer, msg, msg_type)
+        return bytes(writer.buffer)
+
+    async def decode(self, payload, msg_type):
+        return await xmrrpc.load_kv(x.BufferReader(payload), msg_type)
+
+
+class ObjCodec(Codec):
+    """
+    Object representation, the payload is the popo, its size is the size of its standard library JSON
+    """
+    name = 'xmrobj'
+
+    async def encode(self, msg, msg_type):
+        return await xmro.dump_message(None, msg)
+
+    async def decode(self, payload, msg_type):
+        return await xmro.load_message(payload, msg_type)
+
+    def size(self, payload):
+        return len(xmrjs.json_dumps(payload, backend='json'))
+
+
+class JsonCodec(Codec):
+    """
+    Streaming JSON archive, xmrjson.Archive
+    """
+    name = 'xmrjson'
+
+    async def encode(self, msg, msg_type):
+        writer = x.MemoryReaderWriter()
+        await xmrjs.dump_json(writer, msg, msg_type)
+        return bytes(writer.buffer)
+
+    async def decode(self, payload, msg_type):
+        return await xmrjs.load_json(x.MemoryReaderWriter(bytearray(payload)), msg_type)
+
+
+CODECS = collections.OrderedDict([
+    (cls.name, cls()) for cls in (Codec, BoostCodec, KVCodec, ObjCodec, JsonCodec)
+])
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Benchmark inputs: bundled test corpora decoded to messages, synthetic inputs scaled from them
+and inputs generated by the seeded tests.test_data.XmrTestData generator.
+'''
+
+import binascii
+import copy
+import os
+
+from .. import xmrserialize as x
+from .. import xmrboost as xmrb
+from .. import xmrtypes as xmr
+from .. import helpers
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'data')
+
+# name -> (file, message type, source format)
+CORPORA = [
+    ('tx_01', 'tx_01.txt', xmr.Transaction, 'boost'),
+    ('tx_metadata_01', 'tx_metadata_01.txt', xmr.PendingTransaction, 'boost'),
+    ('tx_unsigned_01', 'tx_unsigned_01.txt', xmr.UnsignedTxSet, 'boost'),
+    ('tx_prefix_01', 'tx_prefix_01.txt', xmr.TransactionPrefix, 'boost'),
+    ('tx_rct_01', 'tx_rct_01.txt', xmr.Transaction, 'binary'),
+]
+
+# Corpora the synthetic inputs are scaled from
+SCALED = ['tx_rct_01']
+
+# Generated inputs, name -> (message type, generator(test_data, scale))
+GENERATED = [
+    ('gen_tx_full', xmr.Transaction,
+     lambda td, scale: td.gen_transaction(inputs=scale, outputs=scale, rct_type=xmr.RctType.Full)),
+    ('gen_tx_bp', xmr.Transaction,
+     lambda td, scale: td.gen_transaction(inputs=scale, outputs=scale, rct_type=xmr.RctType.SimpleBulletproof)),
+    ('gen_block', xmr.Block, lambda td, scale: td.gen_block(txs=100 * scale)),
+    ('gen_unsigned', xmr.UnsignedTxSet, lambda td, scale: td.gen_unsigned_tx_set(transfers=10 * scale)),
+]
+
+GENERATOR_SEED = 0
+
+
+class CorpusEntry(object):
+    """
+    Benchmark input message
+    """
+    __slots__ = ('name', 'msg_type', 'msg', 'scale')
+
+    def __init__(self, name, msg_type, msg, scale=1):
+        self.name = name
+        self.msg_type = msg_type
+        self.msg = msg
+        self.scale = scale
+
+    def __repr__(self):
+        return '<CorpusEntry: %s>' % self.name
+
+
+async def _decode(data, msg_type, fmt):
+    reader = x.BufferReader(bytearray(data))
+    if fmt == 'boost':
+        ar = xmrb.Archive(reader, False)
+        await ar.root()
+        return await ar.message(None, msg_type)
+    return await x.Archive(reader, False).message(None, msg_type)
+
+
+def load_file(fname, msg_type, fmt):
+    """
+    Decodes the hex-encoded corpus file
+    :param fname:
+    :param msg_type:
+    :param fmt: boost or binary
+    :return:
+    """
+    with open(os.path.join(DATA_DIR, fname), 'rb') as fh:
+        data = binascii.unhexlify(fh.read().strip())
+    return helpers.run_sync(_decode(data, msg_type, fmt))
+
+
+def scale_transaction(tx, factor):
+    """
+    Multiplies inputs and outputs of the RCT transaction together with their signatures.
+    Lists repeat the same elements, serialization does not depend on the identity.
+    :param tx:
+    :param factor:
+    :return:
+    """
+    res = copy.copy(tx)
+    res.vin = tx.vin * factor
+    res.vout = tx.vout * factor
+
+    rct = copy.copy(tx.rct_signatures)
+    for fname in ('pseudoOuts', 'ecdhInfo', 'outPk'):
+        if getattr(rct, fname, None):
+            setattr(rct, fname, getattr(rct, fname) * factor)
+
+    prunable = copy.copy(rct.p)
+    for fname in ('rangeSigs', 'bulletproofs', 'MGs', 'pseudoOuts'):
+        if getattr(prunable, fname, None):
+            setattr(prunable, fname, getattr(prunable, fname) * factor)
+
+    rct.p = prunable
+    res.rct_signatures = rct
+    return res
+
+
+def generate(name, scale, seed=GENERATOR_SEED):
+    """
+    Generates the named input, deterministic for the seed
+    :param name:
+    :param scale:
+    :param seed:
+    :return:
+    """
+    from ..tests.test_data import XmrTestData
+    msg_type, generator = {gen[0]: gen[1:] for gen in GENERATED}[name]
+    return CorpusEntry('%sx%s' % (name, scale), msg_type, generator(XmrTestData(seed), scale), scale)
+
+
+def load_corpus(names=None, scales=(10, )):
+    """
+    Returns the benchmark inputs, bundled corpora, the scaled and the generated ones,
+    e.g., tx_rct_01x10, gen_tx_bpx10
+    :param names: corpus names to load, all by default
+    :param scales: scale factors of the synthetic inputs
+    :return:
+    """
+    res = []
+    for name, fname, msg_type, fmt in CORPORA:
+        scaled = ['%sx%s' % (name, scale) for scale in scales] if name in SCALED else []
+        wanted = names is None or name in names or any(sname in names for sname in scaled)
+        if not wanted:
+            continue
+
+        msg = load_file(fname, msg_type, fmt)
+        if names is None or name in names:
+            res.append(CorpusEntry(name, msg_type, msg))
+        for scale, sname in zip(scales, scaled):
+            if names is None or sname in names:
+                res.append(CorpusEntry(sname, msg_type, scale_transaction(msg, scale), scale))
+
+    for name, _, _ in GENERATED:
+        for scale in scales:
+            if names is None or '%sx%s' % (name, scale) in names:
+                res.append(generate(name, scale))
+    return res
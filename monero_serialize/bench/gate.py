@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Performance regression gate.
+
+Runs the standard codec benchmarks and compares them with the checked-in baseline,
+exits with 1 on a regression beyond the tolerance.
+
+Gated per benchmark are the deterministic metrics, the number of the bytecode instructions
+executed by a call and the peak memory. Both depend on the interpreter, they are compared
+only on the Python implementation and version the baseline was recorded on.
+
+Time is noisy on shared machines, even the fastest call of a benchmark varies by tens of percent
+between runs, so it is reported and gated only if the baseline sets a throughput tolerance.
+Throughput is normalized by a calibration loop independent of the package code, run once per
+gate run. codec_throughput gates the geometric mean of the changes over all benchmarks of a codec,
+slower codecs are measured again before the regression is reported, the best of the runs is kept.
+
+The gate is not a part of the unit tests, run it with ./test.sh --perf or directly:
+
+>>> python -m monero_serialize.bench.gate
+>>> python -m monero_serialize.bench.gate --update  # records the new baseline
+'''
+
+import argparse
+import collections
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+from . import runner
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+BASELINE_VERSION = 1
+
+STANDARD_CODECS = None  # all
+STANDARD_CORPORA = ['tx_01', 'tx_unsigned_01', 'tx_prefix_01', 'tx_rct_01', 'gen_tx_bpx10']
+
+# Allowed relative growth of the executed instructions, of the peak memory,
+# slowdown of the throughput of a benchmark and of a codec, None is not gated
+DEFAULT_TOLERANCE = collections.OrderedDict([
+    ('opcodes', 0.05), ('memory', 0.1), ('throughput', None), ('codec_throughput', None),
+])
+
+CALIBRATION_ROUNDS = 25
+
+
+def calibrate(rounds=CALIBRATION_ROUNDS, size=20000):
+    """
+    Machine speed reference, best time of the pure Python loop in seconds.
+    Varint coding over a bytearray resembles the archive hot path without using it.
+    :param rounds:
+    :param size:
+    :return:
+    """
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        buf = bytearray()
+        for i in range(size):
+            val = i * 7919
+            while val >= 0x80:
+                buf.append((val & 0x7f) | 0x80)
+                val >>= 7
+            buf.append(val)
+
+        res, offset = [], 0
+        while offset < len(buf):
+            val, shift = 0, 0
+            while True:
+                b = buf[offset]
+                offset += 1
+                val |= (b & 0x7f) << shift
+                shift += 7
+                if not b & 0x80:
+                    break
+            res.append(val)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def metrics(rec):
+    """
+    Gated metrics of the benchmark result
+    :param rec: runner result record with the calibration time of the run
+    :return:
+    """
+    res = collections.OrderedDict()
+    res['mb_s'] = rec['size'] / rec['min_us']  # bytes per us = MB/s
+    res['norm'] = res['mb_s'] * rec['calibration']
+    for key in ('opcodes', 'peak_kb'):
+        if key in rec:
+            res[key] = rec[key]
+    return res
+
+
+def run_standard(min_time=0.1, codecs=STANDARD_CODECS, corpora=STANDARD_CORPORA, opcodes=True):
+    """
+    Runs the calibration and the standard benchmarks
+    :param min_time:
+    :param codecs:
+    :param corpora:
+    :param opcodes: count the executed instructions
+    :return: results
+    """
+    calib = calibrate()
+    results = runner.run_benchmarks(codec_names=codecs, corpus_names=corpora, min_time=min_time, opcodes=opcodes)
+    for rec in results:
+        rec['calibration'] = calib
+    return results
+
+
+def best_of(results, other):
+    """
+    Merges the timing of two runs, the timing of the faster run of each benchmark is kept
+    :param results:
+    :param other:
+    :return:
+    """
+    others = {rec['name']: rec for rec in other if 'skipped' not in rec}
+    res = []
+    for rec in results:
+        alt = others.get(rec['name'])
+        if 'skipped' not in rec and alt is not None and metrics(alt)['norm'] > metrics(rec)['norm']:
+            rec = dict(rec, min_us=alt['min_us'], calibration=alt['calibration'])
+        res.append(rec)
+    return res
+
+
+def same_interpreter(baseline):
+    """
+    Returns true if the baseline was recorded on the running Python implementation and version
+    :param baseline:
+    :return:
+    """
+    version = baseline.get('python', '').split('.')[:2]
+    return baseline.get('implementation') == platform.python_implementation() \
+        and version == [str(v) for v in sys.version_info[:2]]
+
+
+def make_baseline(results, old=None):
+    """
+    Baseline document from the benchmark results, tolerances of the old baseline are kept
+    :param results:
+    :param old: previous baseline
+    :return:
+    """
+    old_benchmarks = old['benchmarks'] if old else {}
+    benchmarks = collections.OrderedDict()
+    for rec in results:
+        if 'skipped' in rec:
+            continue
+        entry = metrics(rec)
+        if 'tolerance' in old_benchmarks.get(rec['name'], {}):
+            entry['tolerance'] = old_benchmarks[rec['name']]['tolerance']
+        benchmarks[rec['name']] = entry
+
+    doc = runner.results_doc([])
+    del doc['results']
+    doc['version'] = BASELINE_VERSION
+    doc['tolerance'] = old['tolerance'] if old else DEFAULT_TOLERANCE
+    doc['benchmarks'] = benchmarks
+    return doc
+
+
+def _exceeds(base, cur, key, tol):
+    return tol is not None and key in base and key in cur and cur[key] > base[key] * (1 + tol)
+
+
+def compare(baseline, results, deterministic=True):
+    """
+    Compares the results with the baseline
+    :param baseline:
+    :param results:
+    :param deterministic: executed instructions and peak memory are gated, same interpreter only
+    :return: (benchmark rows, codec rows), rows are (name, status, base metrics, current metrics)
+    """
+    current = {rec['name']: rec for rec in results if 'skipped' not in rec}
+    rows = []
+    ratios = collections.OrderedDict()
+    for name, base in baseline['benchmarks'].items():
+        tol = dict(baseline['tolerance'])
+        tol.update(base.get('tolerance', {}))
+
+        if name not in current:
+            rows.append((name, 'MISSING', base, None))
+            continue
+
+        cur = metrics(current[name])
+        ratios.setdefault(current[name]['codec'], []).append(cur['norm'] / base['norm'])
+        status = 'ok'
+        if deterministic and _exceeds(base, cur, 'opcodes', tol['opcodes']):
+            status = 'OPCODES'
+        elif deterministic and _exceeds(base, cur, 'peak_kb', tol['memory']):
+            status = 'MEMORY'
+        elif tol['throughput'] is not None and cur['norm'] < base['norm'] * (1 - tol['throughput']):
+            status = 'SLOWER'
+        rows.append((name, status, base, cur))
+
+    for name, rec in sorted(current.items()):
+        if name not in baseline['benchmarks']:
+            rows.append((name, 'new', None, metrics(rec)))
+
+    codec_rows = []
+    codec_tol = baseline['tolerance']['codec_throughput']
+    for codec, vals in ratios.items():
+        ratio = math.exp(sum(math.log(v) for v in vals) / len(vals))
+        status = 'SLOWER' if codec_tol is not None and ratio < 1 - codec_tol else 'ok'
+        codec_rows.append((codec, status, {'norm': 1.0}, {'norm': ratio}))
+    return rows, codec_rows
+
+
+def is_regression(rows):
+    return any(row[1] in ('MISSING', 'OPCODES', 'MEMORY', 'SLOWER') for row in rows)
+
+
+def format_codec_rows(rows):
+    """
+    Geometric mean of the throughput changes per codec
+    :param rows:
+    :return:
+    """
+    lines = ['%-38s %8s  %s' % ('codec', 'change', 'status')]
+    for name, status, base, cur in rows:
+        lines.append('%-38s %8s  %s' % (name, _change(base, cur, 'norm'), status))
+    return '\n'.join(lines)
+
+
+def _change(base, cur, key):
+    if base is None or cur is None or key not in base or key not in cur:
+        return '-'
+    return '%+.1f%%' % (100.0 * (cur[key] / base[key] - 1))
+
+
+def format_rows(rows):
+    """
+    Readable diff, throughput change is the normalized one
+    :param rows:
+    :return:
+    """
+    fmt = '%-38s %9s %8s %9s %9s %8s %10s %10s %8s  %s'
+    lines = [fmt % ('benchmark', 'opcodes', 'change', 'base MB/s', 'MB/s', 'change',
+                    'base kB', 'peak kB', 'change', 'status')]
+    for name, status, base, cur in rows:
+        lines.append(fmt % (
+            name,
+            cur['opcodes'] if cur and 'opcodes' in cur else '-',
+            _change(base, cur, 'opcodes'),
+            '%.2f' % base['mb_s'] if base else '-',
+            '%.2f' % cur['mb_s'] if cur else '-',
+            _change(base, cur, 'norm'),
+            '%.1f' % base['peak_kb'] if base and 'peak_kb' in base else '-',
+            '%.1f' % cur['peak_kb'] if cur and 'peak_kb' in cur else '-',
+            _change(base, cur, 'peak_kb'),
+            status))
+    return '\n'.join(lines)
+
+
+def load_baseline(fname):
+    with open(fname) as fh:
+        doc = json.load(fh, object_pairs_hook=collections.OrderedDict)
+    if doc.get('version') != BASELINE_VERSION:
+        raise ValueError('Unsupported baseline version: %s' % doc.get('version'))
+    return doc
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Codec performance regression gate')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline file')
+    parser.add_argument('--update', action='store_true', default=False,
+                        help='Record the current run as the baseline')
+    parser.add_argument('--min-time', type=float, default=0.1,
+                        help='Minimal measured time per benchmark in seconds')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='Number of the repeated measurements of the slower codecs')
+    return parser
+
+
+def main(args=None):
+    args = build_parser().parse_args(args)
+    old = load_baseline(args.baseline) if os.path.exists(args.baseline) else None
+    results = run_standard(min_time=args.min_time)
+
+    if args.update:
+        with open(args.baseline, 'w') as fh:
+            json.dump(make_baseline(results, old), fh, indent=2)
+            fh.write('\n')
+        print('Baseline written to %s' % args.baseline)
+        return 0
+
+    if old is None:
+        print('No baseline at %s, run with --update first' % args.baseline)
+        return 2
+
+    deterministic = same_interpreter(old)
+    rows, codec_rows = compare(old, results, deterministic)
+    for _ in range(args.retries):
+        slower = [row[0] for row in codec_rows if row[1] == 'SLOWER']
+        if not slower:
+            break
+        results = best_of(results, run_standard(min_time=args.min_time, codecs=slower, opcodes=False))
+        rows, codec_rows = compare(old, results, deterministic)
+
+    print(format_rows(rows))
+    if not deterministic:
+        print('Opcodes and peak memory not gated, baseline recorded on %s %s'
+              % (old.get('implementation'), old.get('python')))
+    print()
+    print(format_codec_rows(codec_rows))
+    if is_regression(rows) or is_regression(codec_rows):
+        print('Performance regression')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
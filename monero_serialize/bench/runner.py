@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Benchmark runner, measures the codecs on the corpus entries.
+'''
+
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+from .. import helpers
+from . import codecs
+from . import corpus
+
+
+RESULTS_VERSION = 1
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of the sorted values
+    :param values:
+    :param pct:
+    :return:
+    """
+    idx = max(0, min(len(values) - 1, int(math.ceil(pct / 100.0 * len(values))) - 1))
+    return values[idx]
+
+
+def measure(fnc, min_time=0.2, min_calls=3, max_calls=10000):
+    """
+    Calls fnc repeatedly, returns the per-call latencies in seconds
+    :param fnc:
+    :param min_time: minimal total time
+    :param min_calls:
+    :param max_calls:
+    :return:
+    """
+    latencies = []
+    timer = time.perf_counter
+    start = timer()
+    while True:
+        t0 = timer()
+        fnc()
+        t1 = timer()
+        latencies.append(t1 - t0)
+        if len(latencies) >= max_calls or (len(latencies) >= min_calls and t1 - start >= min_time):
+            return latencies
+
+
+def peak_memory(fnc):
+    """
+    Peak memory allocated by a single call, in bytes
+    :param fnc:
+    :return:
+    """
+    tracemalloc.start()
+    try:
+        fnc()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def count_opcodes(fnc):
+    """
+    Number of the bytecode instructions executed by a single call, None if not supported.
+    Deterministic measure of the interpreter work, unlike the time it does not depend on the machine load.
+    :param fnc:
+    :return:
+    """
+    if sys.version_info < (3, 7):
+        return None
+
+    counter = [0]
+
+    def trace(frame, event, arg):
+        if event == 'call':
+            frame.f_trace_opcodes = True
+            frame.f_trace_lines = False
+        elif event == 'opcode':
+            counter[0] += 1
+        return trace
+
+    sys.settrace(trace)
+    try:
+        fnc()
+    finally:
+        sys.settrace(None)
+    return counter[0]
+
+
+def bench_op(codec, op, entry, fnc, size, min_time=0.2, memory=True, opcodes=False):
+    """
+    Measures one operation, returns the result record
+    :param codec:
+    :param op:
+    :param entry:
+    :param fnc:
+    :param size: payload size
+    :param min_time:
+    :param memory:
+    :param opcodes: count the executed bytecode instructions
+    :return:
+    """
+    fnc()  # warm-up, caches
+    latencies = sorted(measure(fnc, min_time=min_time))
+    total = sum(latencies)
+    res = {
+        'name': '%s.%s.%s' % (codec.name, op, entry.name),
+        'codec': codec.name,
+        'op': op,
+        'corpus': entry.name,
+        'size': size,
+        'calls': len(latencies),
+        'time': total,
+        'mb_s': size * len(latencies) / total / 1e6,
+        'obj_s': len(latencies) / total,
+        'mean_us': total / len(latencies) * 1e6,
+        'min_us': latencies[0] * 1e6,
+        'p50_us': percentile(latencies, 50) * 1e6,
+        'p90_us': percentile(latencies, 90) * 1e6,
+        'p99_us': percentile(latencies, 99) * 1e6,
+    }
+    if memory:
+        res['peak_kb'] = peak_memory(fnc) / 1024.0
+    if opcodes:
+        count = count_opcodes(fnc)
+        if count is not None:
+            res['opcodes'] = count
+    return res
+
+
+def run_benchmarks(codec_names=None, corpus_names=None, scales=(10, ), ops=('encode', 'decode'),
+                   min_time=0.2, memory=True, opcodes=False, progress=None):
+    """
+    Runs the benchmarks, returns the result records.
+    Codecs not supporting the message type are recorded as skipped, other errors are raised.
+
+    :param codec_names: all by default
+    :param corpus_names: all by default
+    :param scales: synthetic input scale factors
+    :param ops:
+    :param min_time: minimal measured time per benchmark
+    :param memory: measure the peak memory
+    :param opcodes: count the executed bytecode instructions
+    :param progress: called with each result record
+    :return:
+    """
+    results = []
+    entries = corpus.load_corpus(corpus_names, scales=scales)
+    for name, codec in codecs.CODECS.items():
+        if codec_names is not None and name not in codec_names:
+            continue
+
+        for entry in entries:
+            try:
+                payload = helpers.run_sync(codec.encode(entry.msg, entry.msg_type))
+                helpers.run_sync(codec.decode(payload, entry.msg_type))
+                size = codec.size(payload)
+            except (helpers.ArchiveException, TypeError) as e:
+                rec = {'name': '%s.*.%s' % (codec.name, entry.name), 'codec': codec.name, 'corpus': entry.name,
+                       'skipped': '%s: %s' % (e.__class__.__name__, e)}
+                results.append(rec)
+                if progress:
+                    progress(rec)
+                continue
+
+            calls = {
+                'encode': lambda: helpers.run_sync(codec.encode(entry.msg, entry.msg_type)),
+                'decode': lambda: helpers.run_sync(codec.decode(payload, entry.msg_type)),
+            }
+            for op in ops:
+                rec = bench_op(codec, op, entry, calls[op], size, min_time=min_time, memory=memory, opcodes=opcodes)
+                results.append(rec)
+                if progress:
+                    progress(rec)
+    return results
+
+
+def results_doc(results):
+    """
+    Machine-readable results document
+    :param results:
+    :return:
+    """
+    return {
+        'version': RESULTS_VERSION,
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': int(time.time()),
+        'results': results,
+    }
+
+
+def format_result(rec):
+    """
+    One line of the text report
+    :param rec:
+    :return:
+    """
+    if 'skipped' in rec:
+        return '%-40s skipped, %s' % (rec['name'], rec['skipped'][:80])
+    return '%-40s %9.2f MB/s %9.1f obj/s  p50 %9.1f us  p99 %9.1f us  peak %9s' % (
+        rec['name'], rec['mb_s'], rec['obj_s'], rec['p50_us'], rec['p99_us'],
+        '%.1f kB' % rec['peak_kb'] if 'peak_kb' in rec else '-')
@@ -23,8 +23,16 @@ class TrackVariant(TrackedObj):
 
 
 class Tracker(object):
-    def __init__(self):
+    """
+    Path to the currently processed element.
+
+    With tracking on, the archive pushes every field and element it enters.
+    With tracking off, nothing is kept while the processing succeeds and the path
+    is built from the innermost element while the exception unwinds, see track_exception().
+    """
+    def __init__(self, tracking=True):
         self.cur = []
+        self.tracking = tracking
 
     def push(self, obj):
         self.cur.append(obj)
@@ -38,6 +46,9 @@ class Tracker(object):
     def push_variant(self, obj):
         self.push(TrackVariant(obj))
 
+    def push_front(self, obj):
+        self.cur.insert(0, obj)
+
     def pop(self):
         self.cur.pop()
 
@@ -49,3 +60,44 @@ class ArchiveException(Exception):
     def __init__(self, *args, **kwargs):
         super().__init__(*args)
         self.tracker = kwargs.get('tracker', None)
+
+
+def track_exception(e, tracker, track_type=None, val=None):
+    """
+    Builds ArchiveException for the exception raised in the archive.
+    If the tracking is on, the tracker holds the current path already.
+    Otherwise the element the exception passes through is prepended
+    to the path carried by the exception.
+
+    :param e: exception
+    :param tracker: archive tracker
+    :param track_type: TrackedObj type of the element, None if not applicable
+    :param val: tracked value of the element
+    :return:
+    """
+    if tracker.tracking:
+        return ArchiveException(e, tracker=tracker)
+
+    etracker = getattr(e, 'tracker', None) if isinstance(e, ArchiveException) else None
+    if etracker is None:
+        etracker = Tracker(False)
+    if track_type is not None:
+        etracker.push_front(track_type(val))
+    return ArchiveException(e, tracker=etracker)
+
+
+def run_sync(coro):
+    """
+    Runs the coroutine which never suspends, e.g., an archive over an in-memory reader,
+    and returns its result.
+
+    :param coro:
+    :return:
+    """
+    try:
+        yielded = coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+    coro.close()
+    raise ValueError('Coroutine suspended on %r, cannot be run synchronously' % (yielded, ))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+
+import aiounittest
+
+from .. import helpers
+from .. import xmrserialize as x
+from .. import xmrtypes as xmr
+from ..bench import alloc, codecs, corpus, gate, runner
+from ..bench import __main__ as bench_main
+
+
+__author__ = 'dusanklinec'
+
+
+class XmrBenchTest(aiounittest.AsyncTestCase):
+    """Benchmark suite smoke tests"""
+
+    def __init__(self, *args, **kwargs):
+        super(XmrBenchTest, self).__init__(*args, **kwargs)
+
+    def test_scaled_corpus(self):
+        """
+        Scaled transaction keeps the binary roundtrip
+        :return:
+        """
+        base, scaled = corpus.load_corpus(['tx_rct_01', 'tx_rct_01x3'], scales=(3, ))
+        self.assertEqual(scaled.scale, 3)
+        self.assertEqual(len(scaled.msg.vout), 3 * len(base.msg.vout))
+
+        codec = codecs.CODECS['xmrserialize']
+        data = helpers.run_sync(codec.encode(scaled.msg, scaled.msg_type))
+        msg = helpers.run_sync(codec.decode(data, scaled.msg_type))
+        self.assertEqual(helpers.run_sync(codec.encode(msg, scaled.msg_type)), data)
+
+    def test_run(self):
+        """
+        Quick benchmark run, machine-readable output
+        :return:
+        """
+        res = runner.run_benchmarks(codec_names=['xmrserialize', 'xmrobj'], corpus_names=['tx_prefix_01'],
+                                    min_time=0.001)
+        self.assertEqual([r['name'] for r in res], [
+            'xmrserialize.encode.tx_prefix_01', 'xmrserialize.decode.tx_prefix_01',
+            'xmrobj.encode.tx_prefix_01', 'xmrobj.decode.tx_prefix_01'])
+        for r in res:
+            self.assertGreater(r['mb_s'], 0)
+            self.assertLessEqual(r['p50_us'], r['p99_us'])
+            self.assertIn('peak_kb', r)
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            bench_main.main(['--codec', 'xmrboost', '--corpus', 'tx_prefix_01', '--op', 'decode',
+                             '--min-time', '0.001', '--no-memory', '--json', '-'])
+        doc = json.loads(out.getvalue())
+        self.assertEqual(doc['version'], runner.RESULTS_VERSION)
+        self.assertEqual([r['name'] for r in doc['results']], ['xmrboost.decode.tx_prefix_01'])
+
+        res = runner.run_benchmarks(codec_names=['xmrrpc', 'xmrobj'], corpus_names=['tx_01', 'tx_unsigned_01'],
+                                    ops=())
+        self.assertEqual([r['name'] for r in res if 'skipped' in r], ['xmrrpc.*.tx_unsigned_01'])
+
+    def test_percentile(self):
+        """
+        Nearest-rank percentile
+        :return:
+        """
+        values = list(range(1, 101))
+        self.assertEqual(runner.percentile(values, 50), 50)
+        self.assertEqual(runner.percentile(values, 99), 99)
+        self.assertEqual(runner.percentile(values, 100), 100)
+        self.assertEqual(runner.percentile(values, 0), 1)
+        self.assertEqual(runner.percentile([5], 90), 5)
+
+    def test_alloc(self):
+        """
+        Allocation profile of the decoded corpus file
+        :return:
+        """
+        eref, gen_elem_array = x.eref, x.gen_elem_array
+        out = io.StringIO()
+        with redirect_stdout(out):
+            alloc.main([os.path.join(corpus.DATA_DIR, 'tx_rct_01.txt'), '--codec', 'xmrserialize', '--json', '-'])
+        report = json.loads(out.getvalue())
+
+        self.assertIs(x.eref, eref)
+        self.assertIs(x.gen_elem_array, gen_elem_array)
+        self.assertIs(xmr.eref, eref)
+        self.assertIs(xmr.Transaction.__init__, x.MessageType.__init__)
+
+        constructed = report['constructed']
+        for name in (alloc.PRIM_BLOB, alloc.PRIM_ARRAY, alloc.PRIM_EREF, 'Transaction', 'MgSig'):
+            self.assertGreater(constructed[name]['count'], 0)
+        self.assertEqual(constructed['Transaction']['count'], 1)
+        self.assertEqual(report['retained']['Transaction']['count'], 1)
+        self.assertGreaterEqual(report['retained']['bytearray']['count'], constructed[alloc.PRIM_BLOB]['count'] // 2)
+        self.assertTrue(report['sites'])
+        self.assertGreater(report['peak'], 0)
+
+    def test_gate(self):
+        """
+        Regression gate over the synthetic results
+        :return:
+        """
+        def rec(codec, corp, min_us, peak_kb, opcodes=1000, calibration=0.01):
+            return {'name': '%s.decode.%s' % (codec, corp), 'codec': codec, 'size': 1000, 'min_us': min_us,
+                    'peak_kb': peak_kb, 'opcodes': opcodes, 'calibration': calibration}
+
+        base_results = [rec('a', 'c1', 100, 10), rec('a', 'c2', 100, 10), rec('b', 'c1', 100, 10),
+                        {'name': 'b.*.c2', 'skipped': 'error'}]
+        baseline = gate.make_baseline(base_results)
+        self.assertEqual(list(baseline['benchmarks'].keys()), ['a.decode.c1', 'a.decode.c2', 'b.decode.c1'])
+
+        # Twice slower machine, same normalized throughput
+        rows, codec_rows = gate.compare(baseline, [rec(r['codec'], r['name'].split('.')[2], 200, 10, calibration=0.02)
+                                                   for r in base_results[:3]])
+        self.assertFalse(gate.is_regression(rows) or gate.is_regression(codec_rows))
+        self.assertAlmostEqual(codec_rows[0][3]['norm'], 1.0)
+
+        # Codec a slower on average, more instructions / memory in the single benchmarks
+        self.assertEqual(gate.compare(baseline, [rec('a', 'c1', 250, 10)])[1][0][1], 'ok')
+        baseline['tolerance']['codec_throughput'] = 0.5
+        rows, codec_rows = gate.compare(baseline, [rec('a', 'c1', 250, 10, 1040), rec('a', 'c2', 250, 10, 1100),
+                                                   rec('b', 'c1', 100, 12), rec('b', 'c3', 100, 10)])
+        self.assertEqual([r[1] for r in rows], ['ok', 'OPCODES', 'MEMORY', 'new'])
+        self.assertEqual([r[1] for r in codec_rows], ['SLOWER', 'ok'])
+        self.assertTrue(gate.is_regression(codec_rows))
+        self.assertIn('OPCODES', gate.format_rows(rows))
+
+        # Deterministic metrics gated only on the same interpreter
+        rows, _ = gate.compare(baseline, [rec('a', 'c2', 100, 10, 1100), rec('b', 'c1', 100, 12)],
+                               deterministic=False)
+        self.assertEqual([r[1] for r in rows], ['MISSING', 'ok', 'ok'])
+        self.assertTrue(gate.same_interpreter(baseline))
+        self.assertFalse(gate.same_interpreter(dict(baseline, python='2.7.18')))
+
+        # Single benchmarks are not gated on time by default
+        rows, _ = gate.compare(baseline, [rec('a', 'c1', 300, 10), rec('b', 'c1', 100, 10)])
+        self.assertEqual([r[1] for r in rows], ['ok', 'MISSING', 'ok'])
+
+        # Per benchmark tolerance kept on update
+        baseline['benchmarks']['a.decode.c1']['tolerance'] = {'throughput': 0.5}
+        rows, _ = gate.compare(baseline, [rec('a', 'c1', 300, 10)])
+        self.assertEqual(rows[0][1], 'SLOWER')
+        updated = gate.make_baseline(base_results, baseline)
+        self.assertEqual(updated['benchmarks']['a.decode.c1']['tolerance'], {'throughput': 0.5})
+
+        # Repeated measurement keeps the faster timing and the deterministic metrics
+        merged = gate.best_of([rec('a', 'c1', 300, 10), rec('a', 'c2', 100, 10)],
+                              [rec('a', 'c1', 120, 20, 2000), rec('a', 'c2', 200, 10)])
+        self.assertEqual([(r['min_us'], r['peak_kb'], r['opcodes']) for r in merged],
+                         [(120, 10, 1000), (100, 10, 1000)])
+
+        counted = runner.count_opcodes(lambda: sum(i for i in range(100)))
+        self.assertGreater(counted, 100)
+        self.assertEqual(runner.count_opcodes(lambda: sum(i for i in range(100))), counted)
+
+if __name__ == "__main__":
+    unittest.main()  # pragma: no cover
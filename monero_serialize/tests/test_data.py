@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import random
 import base64
+import collections
 import unittest
 import pkg_resources
 
@@ -10,20 +11,34 @@ import aiounittest
 
 from .. import xmrserialize as x
 from .. import xmrtypes as xmr
+from .. import helpers
+from ..bench import codecs
 
 
 __author__ = 'dusanklinec'
 
 
+# Default tx_extra composition, field names as in the TxExtraField variant without the prefix
+EXTRA_MIX = ('pub_key', 'nonce')
+
+
 class XmrTestData(object):
-    """Simple tests data generator"""
+    """
+    Tests data generator.
 
-    def __init__(self, *args, **kwargs):
+    Fixed samples use the EC key offset counter, generated Transactions, Blocks
+    and UnsignedTxSets are random, deterministic given the seed.
+    """
+
+    def __init__(self, seed=0, *args, **kwargs):
         super(XmrTestData, self).__init__()
         self.ec_offset = 0
+        self.seed = seed
+        self.rng = random.Random(seed)
 
     def reset(self):
         self.ec_offset = 0
+        self.rng.seed(self.seed)
 
     def generate_ec_key(self, use_offset=True):
         """
@@ -68,6 +83,244 @@ class XmrTestData(object):
         msg = xmr.BoroSig(s0=s0, s1=s1, ee=ee)
         return msg
 
+    def gen_key(self):
+        """
+        Returns random 32 element byte array
+        :return:
+        """
+        return bytearray(self.rng.getrandbits(256).to_bytes(32, 'little'))
+
+    def gen_keys(self, num):
+        return [self.gen_key() for _ in range(num)]
+
+    def gen_extra(self, mix=EXTRA_MIX, outputs=2):
+        """
+        Returns serialized tx_extra with the given fields.
+        Padding has to be the last field.
+
+        :param mix: pub_key, nonce, additional_pub_keys, merge_mining_tag, mysterious_minergate, padding
+        :param outputs: number of additional public keys
+        :return:
+        """
+        fields = []
+        padding = 0
+        for fname in mix:
+            if padding:
+                raise ValueError('Padding has to be the last extra field')
+            elif fname == 'pub_key':
+                fields.append(xmr.TxExtraPubKey(pub_key=self.gen_key()))
+            elif fname == 'nonce':
+                fields.append(xmr.TxExtraNonce(nonce=b'\x01' + bytes(self.gen_key()[:8])))
+            elif fname == 'additional_pub_keys':
+                fields.append(xmr.TxExtraAdditionalPubKeys(data=self.gen_keys(outputs)))
+            elif fname == 'merge_mining_tag':
+                fields.append(xmr.TxExtraMergeMiningTag(field_len=33, depth=self.rng.randint(0, 16),
+                                                        merkle_root=self.gen_key()))
+            elif fname == 'mysterious_minergate':
+                fields.append(xmr.TxExtraMysteriousMinergate(data=bytes(self.gen_key())))
+            elif fname == 'padding':
+                padding = self.rng.randint(1, xmr.TxExtraPadding.TX_EXTRA_PADDING_MAX_COUNT)
+            else:
+                raise ValueError('Unknown extra field: %s' % fname)
+
+        writer = x.MemoryReaderWriter()
+        ar = x.Archive(writer, True)
+        for field in fields:
+            helpers.run_sync(ar.variant(field, xmr.TxExtraField))
+
+        # padding tag is the first zero byte of the padding
+        return list(writer.buffer) + [0] * padding
+
+    def gen_tx_prefix(self, inputs=2, outputs=2, ring_size=11, extra=EXTRA_MIX, msg_type=xmr.TransactionPrefix):
+        """
+        Returns random transaction prefix spending RCT outputs
+        :param inputs:
+        :param outputs:
+        :param ring_size:
+        :param extra: tx_extra fields mix
+        :param msg_type: prefix message type to build
+        :return:
+        """
+        vin = []
+        for _ in range(inputs):
+            offsets = [self.rng.randint(1, 2 ** 22)] + [self.rng.randint(1, 2 ** 14) for _ in range(ring_size - 1)]
+            vin.append(xmr.TxinToKey(amount=0, key_offsets=offsets, k_image=self.gen_key()))
+
+        vout = [xmr.TxOut(amount=0, target=xmr.TxoutToKey(key=self.gen_key())) for _ in range(outputs)]
+        return msg_type(version=2, unlock_time=0, vin=vin, vout=vout, extra=self.gen_extra(extra, outputs))
+
+    def gen_mgsig(self, ring_size, cols):
+        return xmr.MgSig(ss=[self.gen_keys(cols) for _ in range(ring_size)], cc=self.gen_key())
+
+    def gen_rangesig(self):
+        asig = xmr.BoroSig(s0=self.gen_keys(64), s1=self.gen_keys(64), ee=self.gen_key())
+        return xmr.RangeSig(asig=asig, Ci=self.gen_keys(64))
+
+    def gen_bulletproof(self):
+        return xmr.Bulletproof(V=self.gen_key(), A=self.gen_key(), S=self.gen_key(), T1=self.gen_key(),
+                               T2=self.gen_key(), taux=self.gen_key(), mu=self.gen_key(),
+                               L=self.gen_keys(6), R=self.gen_keys(6), a=self.gen_key(), b=self.gen_key(),
+                               t=self.gen_key())
+
+    def gen_rct_signatures(self, inputs=2, outputs=2, ring_size=11, rct_type=xmr.RctType.SimpleBulletproof):
+        """
+        Returns random RCT signatures of the given type
+        :param inputs:
+        :param outputs:
+        :param ring_size:
+        :param rct_type: xmr.RctType, Full, Simple, FullBulletproof or SimpleBulletproof
+        :return:
+        """
+        if rct_type not in (xmr.RctType.Full, xmr.RctType.Simple,
+                            xmr.RctType.FullBulletproof, xmr.RctType.SimpleBulletproof):
+            raise ValueError('Unknown RCT type: %s' % rct_type)
+
+        simple = rct_type in (xmr.RctType.Simple, xmr.RctType.SimpleBulletproof)
+        bulletproof = rct_type in (xmr.RctType.FullBulletproof, xmr.RctType.SimpleBulletproof)
+
+        pseudo_outs = self.gen_keys(inputs) if simple else []
+        prunable = xmr.RctSigPrunable(
+            rangeSigs=[] if bulletproof else [self.gen_rangesig() for _ in range(outputs)],
+            bulletproofs=[self.gen_bulletproof() for _ in range(outputs)] if bulletproof else [],
+            MGs=[self.gen_mgsig(ring_size, 2 if simple else 1 + inputs) for _ in range(inputs if simple else 1)],
+            pseudoOuts=pseudo_outs if rct_type == xmr.RctType.SimpleBulletproof else [])
+
+        return xmr.RctSig(
+            type=rct_type, txnFee=self.rng.randint(10 ** 8, 10 ** 11),
+            pseudoOuts=pseudo_outs if rct_type == xmr.RctType.Simple else [],
+            ecdhInfo=[xmr.EcdhTuple(mask=self.gen_key(), amount=self.gen_key()) for _ in range(outputs)],
+            outPk=[xmr.CtKey(dest=self.gen_key(), mask=self.gen_key()) for _ in range(outputs)],
+            p=prunable)
+
+    def gen_transaction(self, inputs=2, outputs=2, ring_size=11, rct_type=xmr.RctType.SimpleBulletproof,
+                        extra=EXTRA_MIX):
+        """
+        Returns random RCT transaction
+        :param inputs:
+        :param outputs:
+        :param ring_size:
+        :param rct_type: xmr.RctType
+        :param extra: tx_extra fields mix
+        :return:
+        """
+        tx = self.gen_tx_prefix(inputs, outputs, ring_size, extra, msg_type=xmr.Transaction)
+        tx.signatures = []
+        tx.rct_signatures = self.gen_rct_signatures(inputs, outputs, ring_size, rct_type)
+        return tx
+
+    def gen_miner_transaction(self, height, outputs=1):
+        """
+        Returns coinbase transaction
+        :param height:
+        :param outputs:
+        :return:
+        """
+        vout = [xmr.TxOut(amount=self.rng.randint(10 ** 11, 10 ** 13), target=xmr.TxoutToKey(key=self.gen_key()))
+                for _ in range(outputs)]
+        return xmr.Transaction(version=2, unlock_time=height + 60, vin=[xmr.TxinGen(height=height)], vout=vout,
+                               extra=self.gen_extra(('pub_key', ), outputs), signatures=[],
+                               rct_signatures=xmr.RctSig(type=xmr.RctType.Null, txnFee=0, ecdhInfo=[], outPk=[]))
+
+    def gen_block(self, txs=10, height=None):
+        """
+        Returns block with the given number of transaction hashes
+        :param txs: transactions in the block
+        :param height:
+        :return:
+        """
+        height = self.rng.randint(10 ** 6, 2 * 10 ** 6) if height is None else height
+        return xmr.Block(major_version=7, minor_version=7, timestamp=self.rng.randint(15 * 10 ** 8, 16 * 10 ** 8),
+                         prev_id=self.gen_key(), nonce=self.rng.getrandbits(32),
+                         miner_tx=self.gen_miner_transaction(height), tx_hashes=self.gen_keys(txs))
+
+    def gen_address(self):
+        return xmr.AccountPublicAddress(m_spend_public_key=self.gen_key(), m_view_public_key=self.gen_key())
+
+    def gen_transfer_details(self, idx=0, inputs=1, outputs=2, ring_size=11, extra=EXTRA_MIX):
+        """
+        Returns random wallet transfer
+        :param idx: transfer index
+        :param inputs: inputs of the incoming transaction
+        :param outputs: outputs of the incoming transaction
+        :param ring_size:
+        :param extra:
+        :return:
+        """
+        return xmr.TransferDetails(
+            m_block_height=self.rng.randint(10 ** 6, 2 * 10 ** 6),
+            m_tx=self.gen_tx_prefix(inputs, outputs, ring_size, extra),
+            m_txid=self.gen_key(), m_internal_output_index=self.rng.randint(0, outputs - 1),
+            m_global_output_index=self.rng.randint(10 ** 6, 10 ** 7), m_spent=False, m_spent_height=0,
+            m_key_image=self.gen_key(), m_mask=self.gen_key(), m_amount=self.rng.randint(10 ** 9, 10 ** 13),
+            m_rct=True, m_key_image_known=True, m_pk_index=0,
+            m_subaddr_index=xmr.SubaddressIndex(major=0, minor=idx), m_key_image_partial=False,
+            m_multisig_k=[], m_multisig_info=[])
+
+    def gen_tx_construction_data(self, transfers, inputs=2, outputs=2, ring_size=11, extra=EXTRA_MIX):
+        """
+        Returns construction data spending the given transfers
+        :param transfers: number of transfers in the set, selected are the first inputs
+        :param inputs:
+        :param outputs: destinations, including the change
+        :param ring_size:
+        :param extra:
+        :return:
+        """
+        sources = []
+        for _ in range(inputs):
+            ring = [[self.rng.randint(10 ** 6, 10 ** 7), xmr.CtKey(dest=self.gen_key(), mask=self.gen_key())]
+                    for _ in range(ring_size)]
+            sources.append(xmr.TxSourceEntry(
+                outputs=ring, real_output=self.rng.randint(0, ring_size - 1), real_out_tx_key=self.gen_key(),
+                real_out_additional_tx_keys=[], real_output_in_tx_index=self.rng.randint(0, 1),
+                amount=self.rng.randint(10 ** 9, 10 ** 13), rct=True, mask=self.gen_key(),
+                multisig_kLRki=xmr.MultisigKLRki(K=bytearray(32), L=bytearray(32), R=bytearray(32),
+                                                 ki=bytearray(32))))
+
+        dsts = [xmr.TxDestinationEntry(amount=self.rng.randint(10 ** 9, 10 ** 12), addr=self.gen_address(),
+                                       is_subaddress=False) for _ in range(outputs)]
+        return xmr.TxConstructionData(
+            sources=sources, change_dts=dsts[-1], splitted_dsts=dsts,
+            selected_transfers=list(range(min(inputs, transfers))), extra=self.gen_extra(extra, outputs),
+            unlock_time=0, use_rct=True, dests=dsts[:-1], subaddr_account=0, subaddr_indices=[0])
+
+    def gen_unsigned_tx_set(self, transfers=10, txes=1, inputs=2, outputs=2, ring_size=11, extra=EXTRA_MIX):
+        """
+        Returns unsigned transaction set
+        :param transfers: number of TransferDetails
+        :param txes: transactions to sign
+        :param inputs: inputs per transaction
+        :param outputs: outputs per transaction
+        :param ring_size:
+        :param extra:
+        :return:
+        """
+        return xmr.UnsignedTxSet(
+            txes=[self.gen_tx_construction_data(transfers, inputs, outputs, ring_size, extra) for _ in range(txes)],
+            transfers=[self.gen_transfer_details(i, ring_size=ring_size, extra=extra) for i in range(transfers)])
+
+    def gen_blobs(self, msg, msg_type=None, formats=None):
+        """
+        Encodes the message in the archive formats, bench.codecs names.
+        Formats unable to represent the message are left out, the xmrobj payload is the object.
+
+        :param msg:
+        :param msg_type:
+        :param formats: codec names, all by default
+        :return: OrderedDict codec name -> payload
+        """
+        msg_type = msg.__class__ if msg_type is None else msg_type
+        res = collections.OrderedDict()
+        for name, codec in codecs.CODECS.items():
+            if formats is not None and name not in formats:
+                continue
+            try:
+                res[name] = helpers.run_sync(codec.encode(msg, msg_type))
+            except helpers.ArchiveException:
+                if formats is not None:
+                    raise
+        return res
+
 
 if __name__ == "__main__":
     unittest.main()  # pragma: no cover
@@ -10,7 +10,9 @@ import aiounittest
 
 from .test_data import XmrTestData
 from .. import xmrserialize as x
+from .. import xmrboost as xmrb
 from .. import xmrtypes as xmr
+from ..bench import codecs
 
 
 __author__ = 'dusanklinec'
@@ -275,6 +277,97 @@ class XmrTypesBaseTest(aiounittest.AsyncTestCase):
         self.assertEqual(msg.rct_signatures.p.rangeSigs[1].Ci[63][0], 0xfc)
         self.assertEqual(msg.rct_signatures.p.rangeSigs[1].asig.ee[0], 0xe7)
 
+    async def test_decode_limits(self):
+        """
+        Hostile length prefixes
+        :return:
+        """
+        writer = x.MemoryReaderWriter()
+        await x.dump_uvarint(writer, 2**40)
+        await writer.awrite(bytearray(16))
+        data = bytearray(writer.buffer)
+
+        limits = x.DecodeLimits(max_blob_size=1024)
+        with self.assertRaises(x.LimitExceeded):
+            await x.load_blob(x.MemoryReaderWriter(bytearray(data)), x.BlobType, limits=limits)
+
+        # Without limits the blob grows only with the data read
+        with self.assertRaises(EOFError):
+            await x.load_blob(x.MemoryReaderWriter(bytearray(data)), x.BlobType)
+
+        # Without limits the prepared container is bounded by the data left
+        for ar in (x.Archive(x.MemoryReaderWriter(bytearray(data)), False),
+                   x.Archive(x.BufferReader(data), False),
+                   xmrb.Archive(x.BufferReader(data), False)):
+            with self.assertRaises(EOFError):
+                await ar.prepare_container(2**40, None, elem_type=xmr.ECKey)
+        ar = x.Archive(x.BufferReader(data), False)
+        self.assertEqual(len(await ar.prepare_container(len(data), None, elem_type=xmr.ECKey)), len(data))
+
+        msg = xmr.TxinToKey(amount=123, key_offsets=list(range(100)), k_image=bytearray(range(32)))
+        writer = x.MemoryReaderWriter()
+        await x.dump_message(writer, msg)
+
+        ar = x.Archive(x.MemoryReaderWriter(bytearray(writer.buffer)), False,
+                       limits=x.DecodeLimits(max_container_size=99))
+        with self.assertRaises(x.LimitExceeded):
+            await ar.message(xmr.TxinToKey())
+        self.assertEqual(ar.limits.depth, 0)
+
+        ar = x.Archive(x.MemoryReaderWriter(bytearray(writer.buffer)), False,
+                       limits=x.DecodeLimits(max_container_size=100, max_depth=3, max_total_size=32))
+        msg2 = xmr.TxinToKey()
+        await ar.message(msg2)
+        self.assertEqual(msg, msg2)
+
+        ar = x.Archive(x.MemoryReaderWriter(bytearray(writer.buffer)), False,
+                       limits=x.DecodeLimits(max_total_size=31))
+        with self.assertRaises(x.LimitExceeded):
+            await ar.message(xmr.TxinToKey())
+
+        writer = x.MemoryReaderWriter()
+        await x.dump_message(writer, self.test_data.gen_transaction_prefix())
+        ar = x.Archive(x.MemoryReaderWriter(bytearray(writer.buffer)), False, limits=x.DecodeLimits(max_depth=2))
+        with self.assertRaises(x.LimitExceeded):
+            await ar.message(xmr.TransactionPrefix())
+        self.assertEqual(ar.limits.depth, 0)
+
+    async def test_generated(self):
+        """
+        Generated messages, determinism and the roundtrip in all archive formats
+        :return:
+        """
+        self.assertEqual(XmrTestData(7).gen_unsigned_tx_set(3), XmrTestData(7).gen_unsigned_tx_set(3))
+        self.assertNotEqual(XmrTestData(7).gen_block(3), XmrTestData(8).gen_block(3))
+
+        msgs = [self.test_data.gen_transaction(inputs=3, outputs=2, ring_size=5, rct_type=rct_type)
+                for rct_type in (xmr.RctType.Full, xmr.RctType.Simple,
+                                 xmr.RctType.FullBulletproof, xmr.RctType.SimpleBulletproof)]
+        msgs += [self.test_data.gen_block(txs=4), self.test_data.gen_unsigned_tx_set(transfers=3, ring_size=4)]
+
+        for msg in msgs:
+            blobs = self.test_data.gen_blobs(msg)
+            self.assertEqual(len(blobs), len(codecs.CODECS) - (1 if isinstance(msg, xmr.UnsignedTxSet) else 0))
+            for name, payload in blobs.items():
+                codec = codecs.CODECS[name]
+                msg2 = await codec.decode(payload, msg.__class__)
+                self.assertEqual(await codec.encode(msg2, msg.__class__), payload)
+
+        tx = msgs[0]
+        self.assertEqual(len(tx.rct_signatures.p.MGs[0].ss), 5)
+        self.assertEqual(len(tx.rct_signatures.p.MGs[0].ss[0]), 4)
+        self.assertEqual(len(msgs[-1].transfers), 3)
+        self.assertEqual(len(msgs[-2].tx_hashes), 4)
+
+        extra = self.test_data.gen_extra(('pub_key', 'nonce', 'additional_pub_keys', 'padding'), outputs=3)
+        reader = x.MemoryReaderWriter(bytearray(extra))
+        ar = x.Archive(reader, False)
+        fields = [await ar.variant(elem_type=xmr.TxExtraField) for _ in range(3)]
+        self.assertEqual([f.__class__ for f in fields],
+                         [xmr.TxExtraPubKey, xmr.TxExtraNonce, xmr.TxExtraAdditionalPubKeys])
+        self.assertEqual(len(fields[2].data), 3)
+        self.assertTrue(len(reader.buffer) > 0 and not any(reader.buffer))
+
 
 if __name__ == "__main__":
     unittest.main()  # pragma: no cover
@@ -16,6 +16,7 @@ from .. import xmrtypes as xmr
 from .. import xmrboost as xmrb
 from .. import xmrobj as xmro
 from .. import xmrjson as xmrjs
+from .. import helpers
 
 
 __author__ = 'dusanklinec'
@@ -103,6 +104,25 @@ class XmrBoostTest(aiounittest.AsyncTestCase):
         await ar2.message(msg2)
         self.assertEqual(data_bin, bytearray(writer.buffer))
 
+    async def test_error_path(self):
+        """
+        Exception carries the same field path with and without tracking
+        :return:
+        """
+        addr = xmr.AccountPublicAddress(m_spend_public_key=bytearray(32), m_view_public_key=bytearray(32))
+        dsts = [xmr.TxDestinationEntry(amount=1, addr=addr, is_subaddress=0),
+                xmr.TxDestinationEntry(amount=2, addr=addr, is_subaddress='x')]
+
+        paths = []
+        for tracking in (True, False):
+            ar = xmrb.Archive(x.MemoryReaderWriter(), True, tracking=tracking)
+            with self.assertRaises(helpers.ArchiveException) as ctx:
+                await ar.container(dsts, x.ContainerType, params=[xmr.TxDestinationEntry])
+            paths.append(str(ctx.exception.tracker))
+
+        self.assertEqual(paths[0], '[1][is_subaddress]')
+        self.assertEqual(paths[0], paths[1])
+
     async def test_tx_prefix(self):
         """
         Transaction prefix
@@ -210,6 +230,83 @@ class XmrBoostTest(aiounittest.AsyncTestCase):
         await ar2.message(msg)
         self.assertEqual(data_bin, bytearray(writer.buffer))
 
+    async def test_type_wrapper_cache(self):
+        """
+        Versioning metadata resolved once per type
+        :return:
+        """
+        tw = xmrb.TypeWrapper.get(x.ContainerType, (xmr.TransferDetails, ))
+        self.assertIs(tw, xmrb.TypeWrapper.get(x.ContainerType, (xmr.TransferDetails, )))
+        self.assertIs(tw, xmrb.TypeWrapper.get(x.ContainerType, xmr.TransferDetails))
+        self.assertIs(tw, xmrb.TypeWrapper.get(x.ContainerType, [xmr.TransferDetails]))
+        self.assertEqual(tw, xmrb.TypeWrapper(x.ContainerType, [xmr.TransferDetails]))
+        self.assertTrue(tw.versioned)
+
+        tw = xmrb.TypeWrapper.get(xmr.TransferDetails, ())
+        self.assertIs(tw, xmrb.TypeWrapper.get(xmr.TransferDetails))
+        self.assertEqual(tw.current_version, 9)
+        self.assertFalse(xmrb.TypeWrapper.get(x.UInt64).versioned)
+        self.assertTrue(xmrb.TypeWrapper.get(x.UInt64).elementary)
+
+    async def test_uvarint(self):
+        """
+        Boost integers, single and chained reads
+        :return:
+        """
+        values = [0, 1, 255, 256, 0, 2**32 + 7, 2**64 - 1, -1, -300, 0]
+        for val in values:
+            writer = x.MemoryReaderWriter()
+            await xmrb.dump_uvarint(writer, val)
+            self.assertEqual(len(writer.buffer), 1 + (abs(val).bit_length() + 7) // 8)
+            self.assertEqual(await xmrb.load_uvarint(x.MemoryReaderWriter(writer.buffer)), val)
+
+        writer = x.MemoryReaderWriter()
+        await xmrb.dump_uvarint_array(writer, values)
+        await xmrb.dump_uvarint(writer, 77)
+        reader = x.MemoryReaderWriter(writer.buffer)
+        self.assertEqual(await xmrb.load_uvarint_array(reader, len(values)), values)
+        self.assertEqual(await xmrb.load_uvarint(reader), 77)
+
+        writer = x.MemoryReaderWriter()
+        ar = xmrb.Archive(writer, True)
+        await ar.container([5, 2**40], x.ContainerType, params=[x.UInt64])
+        await ar.container([1, 2, 255], x.ContainerType, params=[x.UInt8])
+        ar2 = xmrb.Archive(x.MemoryReaderWriter(writer.buffer), False)
+        self.assertEqual(await ar2.container(None, x.ContainerType, params=[x.UInt64]), [5, 2**40])
+        self.assertEqual(await ar2.container(None, x.ContainerType, params=[x.UInt8]), [1, 2, 255])
+
+    async def test_boost_plan(self):
+        """
+        Declared boost field order and version gates
+        :return:
+        """
+        class GatedMsg(x.MessageType):
+            BOOST_VERSION = 2
+            BOOST_MIN_VERSION = 1
+            MFIELDS = [
+                ('a', x.UVarintType),
+                ('b', x.UVarintType),
+                ('c', x.UVarintType),
+            ]
+            BOOST_FIELDS = ['c', 'a', 'b']
+            BOOST_FIELDS_SINCE = {'b': 2}
+
+        plan = xmrb.get_boost_plan(GatedMsg)
+        self.assertIs(plan, xmrb.get_boost_plan(GatedMsg))
+        self.assertEqual([f[0] for f in plan.fields_for(2)], ['c', 'a', 'b'])
+        self.assertEqual([f[0] for f in plan.fields_for(1)], ['c', 'a'])
+        with self.assertRaises(ValueError):
+            plan.fields_for(0)
+
+        msg = GatedMsg(a=1, b=2, c=3)
+        writer = x.MemoryReaderWriter()
+        await xmrb.Archive(writer, True).message(msg, use_version=1)
+        self.assertEqual(bytearray(writer.buffer), bytearray([1, 3, 1, 1]))
+
+        msg2 = await xmrb.Archive(x.MemoryReaderWriter(writer.buffer), False).message(None, GatedMsg, use_version=1)
+        self.assertEqual((msg2.a, msg2.c), (1, 3))
+        self.assertEqual(xmr.Bulletproof._field_index()['mu'], ('mu', xmr.ECKey))
+
     async def test_tx_unsigned(self):
         unsigned_tx_c = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_unsigned_01.txt'))
         unsigned_tx = binascii.unhexlify(unsigned_tx_c)
@@ -235,6 +332,71 @@ class XmrBoostTest(aiounittest.AsyncTestCase):
         await ar2.message(msg)
         self.assertEqual(unsigned_tx, bytearray(writer.buffer))
 
+    async def test_version_template(self):
+        """
+        Version headers stamped and validated from the template
+        :return:
+        """
+        unsigned_tx_c = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_unsigned_01.txt'))
+        unsigned_tx = binascii.unhexlify(unsigned_tx_c)
+
+        tpl = xmrb.VersionTemplate.get(xmr.UnsignedTxSet)
+        self.assertIs(tpl, xmrb.VersionTemplate.get(xmr.UnsignedTxSet))
+        self.assertEqual(tpl.sequence()[0], (xmrb.TypeWrapper.get(xmr.UnsignedTxSet), 0))
+        self.assertEqual(tpl.versions[xmrb.TypeWrapper.get(xmr.TransferDetails)], 9)
+
+        ar = xmrb.Archive(x.MemoryReaderWriter(bytearray(unsigned_tx)), False, template=tpl)
+        await ar.root()
+        msg = await ar.message(None, xmr.UnsignedTxSet)
+        self.assertEqual(len(msg.transfers), 2)
+        self.assertTrue(tpl.check(ar.version_db))
+
+        writer = x.MemoryReaderWriter()
+        ar2 = xmrb.Archive(writer, True, template=tpl)
+        await ar2.root()
+        await ar2.message(msg)
+        self.assertEqual(unsigned_tx, bytearray(writer.buffer))
+
+        tpl2 = xmrb.VersionTemplate(xmr.UnsignedTxSet, versions={xmr.TransferDetails: 10})
+        ar = xmrb.Archive(x.MemoryReaderWriter(bytearray(unsigned_tx)), False, template=tpl2)
+        await ar.root()
+        with self.assertRaises(helpers.ArchiveException):
+            await ar.message(None, xmr.UnsignedTxSet)
+
+    async def test_iter_transfers(self):
+        """
+        Transfers loaded one at a time, projected
+        :return:
+        """
+        unsigned_tx_c = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_unsigned_01.txt'))
+        unsigned_tx = binascii.unhexlify(unsigned_tx_c)
+
+        ar = xmrb.Archive(x.MemoryReaderWriter(bytearray(unsigned_tx)), False)
+        await ar.root()
+        msg = await ar.message(None, xmr.UnsignedTxSet)
+
+        ar = xmrb.Archive(x.MemoryReaderWriter(bytearray(unsigned_tx)), False)
+        await ar.root()
+        res = []
+        async for td in await xmr.iter_transfers(ar):
+            res.append(td)
+        self.assertEqual(res, msg.transfers)
+
+        reader = x.MemoryReaderWriter(bytearray(unsigned_tx))
+        ar = xmrb.Archive(reader, False)
+        await ar.root()
+        fields = ('m_key_image', 'm_amount', 'm_spent', 'm_block_height')
+        res = []
+        async for td in await xmr.iter_transfers(ar, skip_tx=True, fields=fields):
+            res.append(td)
+        self.assertEqual(len(res), 2)
+        self.assertEqual(len(reader.buffer), 0)
+        for td, orig in zip(res, msg.transfers):
+            self.assertFalse(hasattr(td, 'm_tx'))
+            self.assertFalse(hasattr(td, 'm_mask'))
+            for fname in fields:
+                self.assertEqual(getattr(td, fname), getattr(orig, fname))
+
 
 if __name__ == "__main__":
     unittest.main()  # pragma: no cover
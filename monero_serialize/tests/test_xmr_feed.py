@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import binascii
+import os
+import unittest
+import pkg_resources
+
+import aiounittest
+
+from .test_data import XmrTestData
+from .. import xmrserialize as x
+from .. import xmrtypes as xmr
+from .. import xmrfeed
+
+
+__author__ = 'dusanklinec'
+
+
+class XmrFeedTest(aiounittest.AsyncTestCase):
+    """Incremental decoder tests"""
+
+    def __init__(self, *args, **kwargs):
+        super(XmrFeedTest, self).__init__(*args, **kwargs)
+        self.test_data = XmrTestData()
+
+    def setUp(self):
+        self.test_data.reset()
+
+    async def test_binary_fragments(self):
+        """
+        Two transaction prefixes fed byte by byte
+        :return:
+        """
+        msg = self.test_data.gen_transaction_prefix()
+        writer = x.MemoryReaderWriter()
+        await x.dump_message(writer, msg)
+        await x.dump_message(writer, msg)
+        data = bytes(writer.buffer)
+
+        decoder = xmrfeed.binary_decoder(xmr.TransactionPrefix)
+        self.assertTrue(decoder.needs_data)
+
+        res = []
+        for idx in range(len(data)):
+            res += decoder.feed(data[idx:idx+1])
+            if len(res) == 0:
+                self.assertTrue(decoder.in_message)
+
+        self.assertEqual(len(res), 2)
+        self.assertEqual(res[0], msg)
+        self.assertEqual(res[1], msg)
+        self.assertTrue(decoder.needs_data)
+        self.assertFalse(decoder.in_message)
+        self.assertEqual(decoder.reader.nread, len(data))
+        self.assertEqual(decoder.close(), [])
+
+    async def test_boost_chunks(self):
+        """
+        Boost transaction fed in chunks
+        :return:
+        """
+        data_hex = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_01.txt'))
+        data_bin = binascii.unhexlify(data_hex)
+
+        decoder = xmrfeed.boost_decoder(xmr.Transaction)
+        res = []
+        for idx in range(0, len(data_bin), 1000):
+            res += decoder.feed(data_bin[idx:idx+1000])
+
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0].rct_signatures.txnFee, 9119110000)
+        self.assertEqual(len(res[0].rct_signatures.p.MGs[0].ss), 7)
+
+    async def test_portable_storage(self):
+        """
+        Portable storage section split at every position
+        :return:
+        """
+        data = b'01110101010102010108146d5f6372656174696f6e5f74696d657374616d70057099935300000000066d5f6b6579730c0c116d5f6163636f756e745f616464726573730c08126d5f7370656e645f7075626c69635f6b65790a805a10cca900ee47a7f412cd661b29f5ab356d6a1951884593bb170b5ec8b6f2e8116d5f766965775f7075626c69635f6b65790a803b1da411527d062c9fedeb2dad669f2f5585a00a88462b8c95c809a630e5734c126d5f7370656e645f7365637265745f6b65790a80f2644a3dd97d43e87887e74d1691d52baa0614206ad1b0c239ff4aa3b501750a116d5f766965775f7365637265745f6b65790a804ce88c168e0f5f8d6524f712d5f8d7d83233b1e7a2a60b5aba5206cc0ea2bc08'
+        data_bin = binascii.unhexlify(data)
+
+        for split in range(1, len(data_bin), 17):
+            decoder = xmrfeed.portable_storage_decoder(modeled=False)
+            self.assertEqual(decoder.feed(data_bin[:split]), [])
+            res = decoder.feed(data_bin[split:])
+            self.assertEqual(len(res), 1)
+            self.assertEqual(res[0]['m_creation_timestamp'], 1402182000)
+            self.assertIn('m_spend_public_key', res[0]['m_keys']['m_account_address'])
+
+    async def test_truncated(self):
+        """
+        Incomplete message on close
+        :return:
+        """
+        msg = self.test_data.gen_transaction_prefix()
+        writer = x.MemoryReaderWriter()
+        await x.dump_message(writer, msg)
+        data = bytes(writer.buffer)
+
+        decoder = xmrfeed.binary_decoder(xmr.TransactionPrefix)
+        self.assertEqual(decoder.feed(data[:-1]), [])
+        with self.assertRaises(EOFError):
+            decoder.close()
+
+
+if __name__ == "__main__":
+    unittest.main()  # pragma: no cover
+
+
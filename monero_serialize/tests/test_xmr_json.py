@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import os
 import random
 import base64
 import unittest
 import json
+import collections
 import pkg_resources
 
 import asyncio
@@ -14,6 +16,8 @@ from .. import xmrserialize as x
 from .. import xmrtypes as xmr
 from .. import xmrobj as xmro
 from .. import xmrjson as xmrjs
+from .. import xmrrpc
+from .. import xmrfeed
 
 
 __author__ = 'dusanklinec'
@@ -74,6 +78,240 @@ class XmrJsonTest(aiounittest.AsyncTestCase):
         self.assertIsNotNone(msg2)
         self.assertEqual(msg, msg2)
 
+    async def test_obj_tx(self):
+        """
+        Transaction to the object representation and back
+        :return:
+        """
+        data_hex = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_rct_01.txt'))
+        reader = x.MemoryReaderWriter(bytearray(base64.b16decode(data_hex, True)))
+        msg = await x.Archive(reader, False).message(None, xmr.Transaction)
+
+        msg_dict = await xmro.dump_message(None, msg)
+        self.assertEqual(msg_dict['vin'][0]['txin_to_key']['key_offsets'], [0, 45, 68])
+        self.assertEqual(msg_dict['rct_signatures']['outPk'][0]['mask'],
+                         base64.b16encode(bytes(msg.rct_signatures.outPk[0].mask)))
+        self.assertEqual(msg_dict['rct_signatures']['p']['MGs'][0]['ss'][0][0][:2], b'F3')
+        self.assertEqual(await xmro.dump_blob(bytearray()), b'')
+        self.assertEqual(await xmro.dump_blob(bytearray(b'\x0a\xbc')), b'0ABC')
+
+        popo = json.loads(xmrjs.json_dumps(msg_dict))
+        msg2 = await xmro.load_message(popo, xmr.Transaction)
+        self.assertEqual(await xmro.dump_message(None, msg2), msg_dict)
+
+        writer = x.MemoryReaderWriter()
+        await x.Archive(writer, True).message(msg2)
+        self.assertEqual(base64.b16encode(bytes(writer.buffer)), data_hex.strip().upper())
+
+        msg3 = xmr.TxinToKey(key_offsets=[0, 1])
+        await xmro.load_message({'amount': 1, 'key_offsets': [2, 3], 'k_image': b'0A0b'}, xmr.TxinToKey, msg3)
+        self.assertEqual(msg3.key_offsets, [2, 3])
+        self.assertEqual(msg3.k_image, b'\x0a\x0b')
+
+        # Existing containers are truncated / extended to the loaded length
+        await xmro.load_message({'amount': 1, 'key_offsets': [4], 'k_image': ''}, xmr.TxinToKey, msg3)
+        self.assertEqual(msg3.key_offsets, [4])
+        await xmro.load_message({'amount': 1, 'key_offsets': [5, 6, 7], 'k_image': ''}, xmr.TxinToKey, msg3)
+        self.assertEqual(msg3.key_offsets, [5, 6, 7])
+
+    async def test_obj_loader(self):
+        """
+        Streaming load of the object representation
+        :return:
+        """
+        data_hex = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_rct_01.txt'))
+        reader = x.MemoryReaderWriter(bytearray(base64.b16decode(data_hex, True)))
+        msg = await x.Archive(reader, False).message(None, xmr.Transaction)
+        msg_dict = await xmro.dump_message(None, msg)
+        data_json = xmrjs.json_dumps(msg_dict, indent=1).encode('utf8')
+
+        msg2 = xmrjs.loads_message(data_json, xmr.Transaction)
+        self.assertEqual(await xmro.dump_message(None, msg2), msg_dict)
+        self.assertEqual(bytes(msg2.rct_signatures.p.MGs[0].ss[0][0]), bytes(msg.rct_signatures.p.MGs[0].ss[0][0]))
+
+        reader = x.MemoryReaderWriter(bytearray(data_json))
+        msg3 = await xmrjs.load_message(reader, xmr.Transaction)
+        self.assertEqual(await xmro.dump_message(None, msg3), msg_dict)
+
+        reader = x.MemoryReaderWriter(bytearray(data_json))
+        loader = xmrjs.ObjLoader(xmrjs.JsonTokenReader(reader, chunk_size=5))
+        msg3 = await loader.field(xmr.Transaction)
+        self.assertEqual(await xmro.dump_message(None, msg3), msg_dict)
+
+        msg4 = xmrjs.loads_message('{"extra": [1], "x": [{"y": null}, 1.5], "vin": [{"txin_gen": {"height": 5}}]}',
+                                   xmr.TransactionPrefix)
+        self.assertEqual(msg4.extra, [1])
+        self.assertEqual(msg4.vin[0].height, 5)
+
+        # Existing containers are truncated / extended to the loaded length
+        msg6 = xmrjs.loads_message(b'{"key_offsets": [7, 8, 9]}', xmr.TxinToKey, msg=xmr.TxinToKey(key_offsets=[1]))
+        self.assertEqual(msg6.key_offsets, [7, 8, 9])
+        msg6 = xmrjs.loads_message(b'{"key_offsets": [7]}', xmr.TxinToKey, msg=xmr.TxinToKey(key_offsets=[1, 2, 3, 4]))
+        self.assertEqual(msg6.key_offsets, [7])
+        prefix = xmr.TransactionPrefix(vout=[xmr.TxOut(amount=1)])
+        data = b'{"vout": [{"amount": 2, "target": {"txout_to_key": {"key": "%s"}}}, ' \
+               b'{"amount": 3, "target": {"txout_to_key": {"key": "%s"}}}]}' % (b'00' * 32, b'11' * 32)
+        msg6 = xmrjs.loads_message(data, xmr.TransactionPrefix, msg=prefix)
+        self.assertEqual([o.amount for o in msg6.vout], [2, 3])
+        msg6 = xmrjs.loads_message(b'{"vout": []}', xmr.TransactionPrefix, msg=prefix)
+        self.assertEqual(msg6.vout, [])
+
+        # Readers raising EOFError on a partial read, documents shorter than the chunk
+        msg5 = await xmrjs.load_message(x.BufferReader(b'{"vin": [{"txin_gen": {"height": 5}}]}'),
+                                        xmr.TransactionPrefix)
+        self.assertEqual(msg5.vin[0].height, 5)
+        msg5 = await xmrjs.load_message(x.BufferReader(bytes(data_json)), xmr.Transaction)
+        self.assertEqual(await xmro.dump_message(None, msg5), msg_dict)
+
+        reader = xmrfeed.FeedReader(data_json)
+        reader.eof = True
+        loader = xmrjs.ObjLoader(xmrjs.JsonTokenReader(reader, chunk_size=1000))
+        msg5 = await loader.field(xmr.Transaction)
+        self.assertEqual(await xmro.dump_message(None, msg5), msg_dict)
+
+        with self.assertRaises(x.LimitExceeded):
+            xmrjs.loads_message(data_json, xmr.Transaction, limits=x.DecodeLimits(max_container_size=10))
+
+        loader = xmrjs.ObjLoader(xmrjs.JsonTokenReader(None, data=b'{"extra": [1, 2, 3]}'),
+                                 limits=x.DecodeLimits(max_container_size=2))
+        with self.assertRaises(x.LimitExceeded):
+            await loader.field(xmr.TransactionPrefix)
+        self.assertEqual(loader.limits.depth, 0)
+        for data in [b'{"vin": [{"txin_unknown": {}}]}', b'{"extra": [1 2]}', b'{"extra": "00"}']:
+            with self.assertRaises(ValueError):
+                xmrjs.loads_message(data, xmr.TransactionPrefix)
+
+    async def test_archive_tx(self):
+        """
+        Transaction streamed to JSON by the archive and back
+        :return:
+        """
+        data_hex = pkg_resources.resource_string(__name__, os.path.join('data', 'tx_rct_01.txt'))
+        reader = x.MemoryReaderWriter(bytearray(base64.b16decode(data_hex, True)))
+        msg = await x.Archive(reader, False).message(None, xmr.Transaction)
+
+        writer = x.MemoryReaderWriter()
+        await xmrjs.Archive(writer, True).message(msg)
+        data_json = bytes(writer.buffer)
+
+        js = json.loads(data_json.decode('utf8'))
+        self.assertEqual(js['version'], 2)
+        self.assertEqual(js['vin'][1]['txin_to_key']['key_offsets'], [5, 79, 38])
+        self.assertEqual(js['extra'][43], 199)
+        self.assertEqual(js['rct_signatures']['txnFee'], 26000000000)
+        self.assertEqual(js['rct_signatures']['outPk'][0][:2], '8f')
+        self.assertEqual(len(js['rctsig_prunable']['MGs'][0]['ss']), 3)
+        self.assertEqual(js['rctsig_prunable']['MGs'][1]['cc'][:2], '12')
+
+        reader = x.MemoryReaderWriter(bytearray(data_json))
+        msg2 = await xmrjs.load_json(reader, xmr.Transaction)
+        self.assertEqual(msg, msg2)
+
+        msg2 = await xmrjs.load_json(x.BufferReader(data_json), xmr.Transaction)
+        self.assertEqual(msg, msg2)
+        data = b'{"amount": 1, "key_offsets": [2, 3], "k_image": "%s"}' % (b'0a' * 32)
+        msg3 = await xmrjs.load_json(x.BufferReader(data), xmr.TxinToKey)
+        self.assertEqual(msg3.key_offsets, [2, 3])
+        self.assertEqual(msg3.k_image, b'\x0a' * 32)
+
+        writer = x.MemoryReaderWriter()
+        await xmrjs.dump_json(writer, msg2, indent=2)
+        self.assertEqual(json.loads(bytes(writer.buffer).decode('utf8')), js)
+
+    async def test_archive_msg(self):
+        """
+        Variants, tuples and strings in the JSON archive
+        :return:
+        """
+        msg = self.test_data.gen_transaction_prefix()
+        writer = x.MemoryReaderWriter()
+        await xmrjs.Archive(writer, True).message(msg)
+
+        reader = x.MemoryReaderWriter(bytearray(writer.buffer))
+        ar = xmrjs.Archive(reader, False)
+        ar.tokens.chunk_size = 7
+        msg2 = await ar.message(None, xmr.TransactionPrefix)
+        self.assertEqual(msg, msg2)
+
+        for data in [b'{"version": 1}', b'{"unlock_time": 0, "version": 1}', b'{"version": 1, "unlock_time": "0"}']:
+            with self.assertRaises((ValueError, EOFError)):
+                await xmrjs.Archive(x.MemoryReaderWriter(bytearray(data)), False).message(None, xmr.TransactionPrefix)
+
+    def test_json_backends(self):
+        """
+        JSON backends encode the models and blobs as the standard encoder
+        :return:
+        """
+        obj = collections.OrderedDict([
+            ('status', b'OK'),
+            ('height', xmrrpc.IntegerModel(2 ** 64 - 1, xmrrpc.SerializeType.UINT64)),
+            ('o_indexes', xmrrpc.ArrayModel([1, 2], xmrrpc.SerializeType.UINT64)),
+            ('tags', {3}),
+            ('blocks', [{'blob': bytearray(b'ab'), 'i': (1, None, 1.5, True)}]),
+            ('unicode', u'\u017e/'),
+        ])
+        native = xmrjs.to_native(obj)
+        self.assertEqual(native['blocks'][0], {'blob': 'ab', 'i': [1, None, 1.5, True]})
+        self.assertEqual(xmrjs.to_native(obj, hexlify=True)['status'], '4f4b')
+
+        for name, backend in xmrjs.JSON_BACKENDS.items():
+            if not backend.available():
+                with self.assertRaises(ValueError):
+                    xmrjs.get_json_backend(name)
+                continue
+
+            for hexlify in (False, True):
+                expected = json.loads(xmrjs.JSON_BACKENDS['json'].dumps(obj, hexlify=hexlify))
+                self.assertEqual(json.loads(xmrjs.json_dumps(obj, hexlify=hexlify, backend=name)), expected)
+                self.assertEqual(json.loads(xmrjs.json_dumps(obj, hexlify=hexlify, backend=name, indent=2)), expected)
+
+            js = xmrjs.json_dumps(obj, backend=name, separators=(',', ':'))
+            self.assertIn('"height":18446744073709551615', js)
+            self.assertEqual(json.loads(xmrjs.json_dumps({'a': 2 ** 70}, backend=name)), {'a': 2 ** 70})
+
+        self.assertTrue(xmrjs.get_json_backend('auto').available())
+        with self.assertRaises(ValueError):
+            xmrjs.get_json_backend('unknown')
+
+        # Default output is the standard library output regardless of the installed backends
+        plain = collections.OrderedDict([('a', 1), ('u', u'\u017e')])
+        self.assertEqual(xmrjs.json_dumps(plain), json.dumps(plain))
+        self.assertEqual(xmrjs.json_dumps(plain), '{"a": 1, "u": "\\u017e"}')
+        self.assertEqual(xmrjs.json_dumps(obj, indent=2), json.dumps(obj, cls=xmrjs.AutoJSONEncoder, indent=2))
+        self.assertIs(xmrjs.get_json_backend(), xmrjs.JSON_BACKENDS['json'])
+        try:
+            xmrjs.set_json_backend('auto')
+            self.assertIs(xmrjs.get_json_backend(), xmrjs.get_json_backend('auto'))
+            self.assertEqual(json.loads(xmrjs.json_dumps(plain)), plain)
+        finally:
+            xmrjs.set_json_backend(None)
+        self.assertEqual(xmrjs.json_dumps(plain), json.dumps(plain))
+
+    def test_escape(self):
+        """
+        String escaping as in rapidjson
+        :return:
+        """
+        data = bytes(range(256)) * 2 + b'/plain run/'
+        escaped = xmrjs.escape_string_json(data)
+        self.assertTrue(escaped.startswith(b'\\u0000\\u0001'))
+        self.assertIn(b'\\u001E\\u001F !', escaped)
+        self.assertIn(b'\\b\\t\\n\\u000B\\f\\r', escaped)
+        self.assertIn(b'!\\"#', escaped)
+        self.assertIn(b'[\\\\]', escaped)
+        self.assertTrue(escaped.endswith(b'/plain run/'))
+        self.assertEqual(len(escaped), len(data) + 2 * (5 * 27 + 7))
+        self.assertEqual(xmrjs.unescape_json_str(escaped), data)
+        self.assertEqual(json.loads(b'"%s"' % escaped[:escaped.index(b'\x7f')]), data[:0x7f].decode('ascii'))
+
+        plain = b'nothing to escape here'
+        self.assertIs(xmrjs.escape_string_json(plain), plain)
+        self.assertIs(xmrjs.unescape_json_str(plain), plain)
+        self.assertEqual(xmrjs.unescape_json_str(b'a\\/b\\u00ff'), b'a/b\xff')
+
+        for data in [b'\\', b'\\x', b'\\u12']:
+            with self.assertRaises(ValueError):
+                xmrjs.unescape_json_str(data)
 
 if __name__ == "__main__":
     unittest.main()  # pragma: no cover
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+import aiounittest
+
+from .. import xmrserialize as x
+from .. import xmrrpc
+from .. import xmrpsjson
+
+
+__author__ = 'dusanklinec'
+
+
+class XmrPsJsonTest(aiounittest.AsyncTestCase):
+    """Portable storage <-> JSON transcoding tests"""
+
+    def __init__(self, *args, **kwargs):
+        super(XmrPsJsonTest, self).__init__(*args, **kwargs)
+
+    async def dump_section(self, section):
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(section)
+        return bytes(writer.buffer)
+
+    async def test_roundtrip(self):
+        """
+        Portable storage to JSON and back
+        :return:
+        """
+        data_bin = await self.dump_section({
+            'status': b'OK',
+            'blob': bytes(range(256)),
+            'height': xmrrpc.IntegerModel(123456, xmrrpc.SerializeType.UINT64),
+            'delta': xmrrpc.IntegerModel(2 ** 64 - 5, xmrrpc.SerializeType.INT64),
+            'untrusted': xmrrpc.IntegerModel(1, xmrrpc.SerializeType.BOOL),
+            'o_indexes': xmrrpc.ArrayModel([1, 2, 2 ** 63], xmrrpc.SerializeType.UINT64),
+            'blocks': [{'height': xmrrpc.IntegerModel(i, xmrrpc.SerializeType.UINT64), 'blob': b'"\\'}
+                       for i in range(3)],
+            'txs': [],
+            'hashes': xmrrpc.ArrayModel([b'\x01' * 32, b'\x02' * 32], xmrrpc.SerializeType.STRING),
+            'nested': {'empty': {}},
+        })
+
+        writer = x.MemoryReaderWriter()
+        await xmrpsjson.ps_to_json(x.BufferReader(data_bin), writer)
+        data_json = bytes(writer.buffer)
+        self.assertIn(b'"delta":-5', data_json)
+        self.assertIn(b'"untrusted":true', data_json)
+        self.assertIn(b'"o_indexes":[1,2,9223372036854775808]', data_json)
+
+        js = json.loads(data_json.replace(bytes(range(128, 256)), b'').decode('utf8'))
+        self.assertEqual(js['status'], 'OK')
+        self.assertEqual(js['blocks'][2], {'height': 2, 'blob': '"\\'})
+        self.assertEqual(js['txs'], [])
+
+        writer = x.MemoryReaderWriter()
+        await xmrpsjson.json_to_ps(data_json, writer)
+        self.assertEqual(bytes(writer.buffer), data_bin)
+
+    async def test_json_types(self):
+        """
+        JSON values mapped to the portable storage types
+        :return:
+        """
+        writer = x.MemoryReaderWriter()
+        await xmrpsjson.json_to_ps(b' {"a": [-1, 2], "b" : [[true], ["x"]], "c": {"d": "\\u0001"}} ', writer)
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(writer.buffer)), False)
+        await ar.root()
+        section = await ar.section()
+        self.assertEqual(section['a'].type, xmrrpc.SerializeType.INT64)
+        self.assertEqual(list(section['a'].val), [-1, 2])
+        self.assertEqual(section['b'].val[0].type, xmrrpc.SerializeType.BOOL)
+        self.assertEqual(section['b'].val[1].val, [b'x'])
+        self.assertEqual(section['c']['d'], b'\x01')
+
+        for data in [b'[1]', b'{}{}', b'{"a": 1.5}', b'{"a": null}', b'{"a": [1, "x"]}', b'{"a": 1', b'{"a": @}']:
+            with self.assertRaises(ValueError):
+                await xmrpsjson.json_to_ps(data, x.MemoryReaderWriter())
+
+    async def test_storage_limits(self):
+        """
+        Decode limits apply to the transcoded storage
+        :return:
+        """
+        data_bin = await self.dump_section({'a': b'\x01' * 100})
+        with self.assertRaises(x.LimitExceeded):
+            await xmrpsjson.ps_to_json(x.BufferReader(data_bin), x.MemoryReaderWriter(),
+                                       limits=x.DecodeLimits(max_blob_size=10))
+
+        data_bin = await self.dump_section({
+            'a': [{'b': xmrrpc.ArrayModel([b'\x01', b'\x02' * 100], xmrrpc.SerializeType.STRING)}],
+        })
+        for limit in (x.DecodeLimits(max_blob_size=10), x.DecodeLimits(max_container_size=1)):
+            transcoder = xmrpsjson.PortableStorageToJson(x.BufferReader(data_bin), x.MemoryReaderWriter(), limits=limit)
+            with self.assertRaises(x.LimitExceeded):
+                await transcoder.transcode()
+            self.assertEqual(transcoder.ar.limits.depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()  # pragma: no cover
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import random
 import binascii
+import collections
 import unittest
 import json
 import pkg_resources
@@ -14,6 +15,7 @@ from .. import xmrtypes as xmr
 from .. import xmrobj as xmro
 from .. import xmrjson as xmrjs
 from .. import xmrrpc
+from .. import helpers
 
 
 __author__ = 'dusanklinec'
@@ -59,6 +61,189 @@ class XmrRpcTest(aiounittest.AsyncTestCase):
         self.assertEqual(section['m_creation_timestamp'], section2['m_creation_timestamp'])
         self.assertDictEqual(section, section2)
 
+    async def test_section_limits(self):
+        """
+        Portable storage decode limits
+        :return:
+        """
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section({'a': b'\x01' * 100, 'b': {'c': b'\x02' * 10}})
+        data_bin = bytearray(writer.buffer)
+
+        limits = [
+            x.DecodeLimits(max_blob_size=99),
+            x.DecodeLimits(max_container_size=1),
+            x.DecodeLimits(max_depth=1),
+            x.DecodeLimits(max_total_size=109),
+        ]
+        for limit in limits:
+            ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False, limits=limit)
+            await ar.root()
+            with self.assertRaises(x.LimitExceeded):
+                await ar.section()
+            self.assertEqual(ar.limits.depth, 0)
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False, modeled=False,
+                            limits=x.DecodeLimits(max_blob_size=100, max_container_size=2, max_depth=2,
+                                                  max_total_size=110))
+        await ar.root()
+        section = await ar.section()
+        self.assertEqual(section['b']['c'], b'\x02' * 10)
+
+    async def test_pod_arrays(self):
+        """
+        Integer arrays encoded and decoded in bulk
+        :return:
+        """
+        indices = list(range(0, 2 ** 40, 2 ** 30))
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section({
+            'o_indexes': xmrrpc.ArrayModel(indices, xmrrpc.SerializeType.UINT64),
+            'heights': xmrrpc.ArrayModel([1, 2, 2 ** 32 - 1], xmrrpc.SerializeType.UINT32),
+            'status': xmrrpc.IntegerModel(7, xmrrpc.SerializeType.UINT32),
+        })
+        data_bin = bytearray(writer.buffer)
+        self.assertIn(b'\x00\x00\x00\x40\x00\x00\x00\x00', data_bin)
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False, modeled=False)
+        await ar.root()
+        section = await ar.section()
+        self.assertEqual(list(section['o_indexes']), indices)
+        self.assertEqual(list(section['heights']), [1, 2, 2 ** 32 - 1])
+        self.assertEqual(section['status'], 7)
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False)
+        await ar.root()
+        section = await ar.section()
+        self.assertEqual(section['o_indexes'].type, xmrrpc.SerializeType.UINT64)
+
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(section)
+        self.assertEqual(bytearray(writer.buffer), data_bin)
+
+    async def test_pod_arrays_signed(self):
+        """
+        Signed and bool arrays in bulk, two's complement on the wire
+        :return:
+        """
+        st = xmrrpc.SerializeType
+        values = collections.OrderedDict([
+            ('i8', ([-1, 2, -128, 127], st.INT8)),
+            ('i32', ([-1, 2, -2 ** 31, 2 ** 31 - 1], st.INT32)),
+            ('i64', ([-1, 2, -2 ** 63, 2 ** 63 - 1], st.INT64)),
+            ('flags', ([True, False, True], st.BOOL)),
+        ])
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section({k: xmrrpc.ArrayModel(v[0], v[1]) for k, v in values.items()})
+        data_bin = bytearray(writer.buffer)
+        self.assertIn(b'\xff\x02\x80\x7f', data_bin)
+        self.assertIn(b'\xff\xff\xff\xff\x02\x00\x00\x00', data_bin)
+
+        # Out of the signed range is written as dump_uint does
+        writer = x.MemoryReaderWriter()
+        await xmrrpc.dump_pod_array(writer, st.INT32, [2 ** 32 - 1, 2])
+        self.assertEqual(bytearray(writer.buffer), b'\xff\xff\xff\xff\x02\x00\x00\x00')
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False, modeled=False)
+        await ar.root()
+        section = await ar.section()
+        for k, v in values.items():
+            self.assertEqual(list(section[k]), v[0])
+        self.assertTrue(all(isinstance(i, bool) for i in section['flags']))
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False)
+        await ar.root()
+        section = await ar.section()
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(section)
+        self.assertEqual(bytearray(writer.buffer), data_bin)
+
+    async def test_lazy_section(self):
+        """
+        Lazy section decodes only the accessed entries
+        :return:
+        """
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section({
+            'blocks': [{'height': xmrrpc.IntegerModel(i, xmrrpc.SerializeType.UINT64), 'blob': b'\x01' * i}
+                       for i in range(10)],
+            'o_indexes': xmrrpc.ArrayModel([1, 2, 3], xmrrpc.SerializeType.UINT32),
+            'names': xmrrpc.ArrayModel([b'ab', b'cde'], xmrrpc.SerializeType.STRING),
+            'status': b'OK',
+        })
+        data_bin = bytes(writer.buffer)
+
+        section = xmrrpc.load_lazy(data_bin, modeled=False)
+        self.assertIsInstance(section, xmrrpc.LazySection)
+        self.assertEqual(list(section), ['blocks', 'o_indexes', 'names', 'status'])
+        self.assertIn('status', section)
+        self.assertEqual(section['status'], b'OK')
+        self.assertEqual(list(section.cache), ['status'])
+
+        self.assertEqual(len(section['blocks']), 10)
+        self.assertIsInstance(section['blocks'][3], xmrrpc.LazySection)
+        self.assertEqual(section['blocks'][3]['blob'], b'\x01' * 3)
+        self.assertEqual(list(section['o_indexes']), [1, 2, 3])
+
+        ar = xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False, modeled=False)
+        await ar.root()
+        eager = await ar.section()
+        self.assertEqual(section.to_dict()['blocks'][9]['height'], eager['blocks'][9]['height'])
+
+        section = xmrrpc.load_lazy(data_bin)
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(section)
+        self.assertEqual(bytes(writer.buffer), data_bin)
+
+        with self.assertRaises(EOFError):
+            xmrrpc.load_lazy(data_bin[:-1])
+
+        limits = [
+            x.DecodeLimits(max_container_size=3),
+            x.DecodeLimits(max_container_size=5),
+            x.DecodeLimits(max_blob_size=5),
+        ]
+        for limit in limits:
+            ar = xmrrpc.Archive(x.BufferReader(data_bin), False, lazy=True, limits=limit)
+            await ar.root()
+            with self.assertRaises(x.LimitExceeded):
+                await ar.section()
+            self.assertEqual(ar.limits.depth, 0)
+
+        # Accesses share the limits state, nested entries keep the section depth
+        for max_depth in (1, 2):
+            with self.assertRaises(x.LimitExceeded):
+                xmrrpc.load_lazy(data_bin, limits=x.DecodeLimits(max_depth=max_depth)).to_dict()
+        section = xmrrpc.load_lazy(data_bin, modeled=False, limits=x.DecodeLimits(max_depth=3))
+        self.assertEqual(section.to_dict()['blocks'][9]['blob'], b'\x01' * 9)
+        self.assertEqual(section.limits.depth, 0)
+
+        section = xmrrpc.load_lazy(data_bin, modeled=False, limits=x.DecodeLimits(max_total_size=51))
+        self.assertEqual(section['status'], b'OK')
+        self.assertEqual(list(section['names']), [b'ab', b'cde'])
+        self.assertEqual(section.limits.total_size, 7)
+        with self.assertRaises(x.LimitExceeded):
+            for block in section['blocks']:
+                self.assertEqual(block['blob'], b'\x01' * block['height'])
+        self.assertEqual(section.limits.depth, 0)
+
+        with self.assertRaises(ValueError):
+            xmrrpc.Archive(x.MemoryReaderWriter(bytearray(data_bin)), False, lazy=True)
+
     async def test_modeler(self):
         msg = xmr.AccountPublicAddress()
         msg.m_spend_public_key = b'\xff'*32
@@ -78,6 +263,129 @@ class XmrRpcTest(aiounittest.AsyncTestCase):
         obj = await mdl.message(msg=m2)
         self.assertIsNotNone(obj)
 
+        m2.m_multisig_keys = [b'\x19'*32, b'\x22'*32]
+        obj = await mdl.message(msg=m2)
+        self.assertEqual(obj['m_multisig_keys'], b'\x19'*32 + b'\x22'*32)
+
+        m3 = await xmrrpc.Modeler(False).message(None, msg_type=xmr.AccountKeys, obj=obj)
+        self.assertEqual(m3, m2)
+
+    async def test_modeler_compact(self):
+        """
+        Compact models typed by the schema
+        :return:
+        """
+        k_image = b'\x11' * 32
+        msg = xmr.TxinToKey(amount=123, key_offsets=[1, 2, 2 ** 40], k_image=k_image)
+        obj = await xmrrpc.Modeler(True, compact=True).message(msg)
+        self.assertEqual(obj, {'amount': 123, 'key_offsets': [1, 2, 2 ** 40], 'k_image': k_image})
+        self.assertIs(obj['k_image'], k_image)
+
+        schema = xmrrpc.kv_schema(xmr.TxinToKey)
+        self.assertEqual(schema['key_offsets'], [xmrrpc.SerializeType.UINT64])
+
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(obj, schema=schema)
+
+        writer2 = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer2, msg)
+        self.assertEqual(writer.buffer, writer2.buffer)
+
+        js = xmrjs.json_dumps(obj, hexlify=True)
+        self.assertEqual(json.loads(js)['k_image'], '11' * 32)
+        obj_hex = await xmrrpc.Modeler(True, hexlify=True).message(msg)
+        self.assertEqual(json.loads(js), json.loads(xmrjs.json_dumps(obj_hex)))
+
+        msg2 = await xmrrpc.Modeler(False, compact=True).message(None, msg_type=xmr.TxinToKey, obj=json.loads(js))
+        self.assertEqual(msg2, msg)
+
+        m2 = xmr.AccountKeys(m_account_address=xmr.AccountPublicAddress(m_spend_public_key=k_image,
+                                                                        m_view_public_key=k_image),
+                             m_spend_secret_key=k_image, m_view_secret_key=k_image, m_multisig_keys=[k_image])
+        obj = await xmrrpc.Modeler(True, compact=True).message(m2)
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(obj, schema=xmrrpc.kv_schema(xmr.AccountKeys))
+
+        writer2 = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer2, m2)
+        self.assertEqual(writer.buffer, writer2.buffer)
+
+    async def test_blobber_pod(self):
+        """
+        Plain old data containers blobbed in bulk
+        :return:
+        """
+        keys = [bytes([i]) * 32 for i in range(5)]
+        data = await xmrrpc.Blobber(writing=True).blobize(keys, xmr.KeyV)
+        self.assertEqual(data, b''.join(keys))
+        self.assertEqual(await xmrrpc.Blobber(writing=False, data=data).blobize(elem_type=xmr.KeyV), keys)
+
+        ct_keys = [xmr.CtKey(dest=keys[i], mask=keys[i + 1]) for i in range(4)]
+        data = await xmrrpc.Blobber(writing=True).blobize(ct_keys, x.ContainerType, params=(xmr.CtKey, ))
+        self.assertEqual(data, b''.join(keys[i] + keys[i + 1] for i in range(4)))
+        res = await xmrrpc.Blobber(writing=False, data=data).blobize(elem_type=x.ContainerType, params=(xmr.CtKey, ))
+        self.assertEqual(res, ct_keys)
+
+        data = await xmrrpc.Blobber(writing=True).blobize([1, 2 ** 64 - 1], x.ContainerType, params=(x.UInt64, ))
+        self.assertEqual(data, b'\x01' + b'\x00' * 7 + b'\xff' * 8)
+        self.assertEqual(xmrrpc.blob_pod_size(xmr.CtKey), 64)
+        self.assertIsNone(xmrrpc.blob_pod_size(xmr.TxinToKey))
+
+        with self.assertRaises(helpers.ArchiveException):
+            await xmrrpc.Blobber(writing=False, data=data[:-1]).blobize(elem_type=xmr.KeyV)
+
+    async def test_kv_archive(self):
+        """
+        Direct portable storage serialization of messages
+        :return:
+        """
+        data = b'01110101010102010108146d5f6372656174696f6e5f74696d657374616d70057099935300000000066d5f6b6579730c0c116d5f6163636f756e745f616464726573730c08126d5f7370656e645f7075626c69635f6b65790a805a10cca900ee47a7f412cd661b29f5ab356d6a1951884593bb170b5ec8b6f2e8116d5f766965775f7075626c69635f6b65790a803b1da411527d062c9fedeb2dad669f2f5585a00a88462b8c95c809a630e5734c126d5f7370656e645f7365637265745f6b65790a80f2644a3dd97d43e87887e74d1691d52baa0614206ad1b0c239ff4aa3b501750a116d5f766965775f7365637265745f6b65790a804ce88c168e0f5f8d6524f712d5f8d7d83233b1e7a2a60b5aba5206cc0ea2bc08'
+        data_bin = binascii.unhexlify(data)
+
+        msg = await xmrrpc.load_kv(x.MemoryReaderWriter(bytearray(data_bin)), xmr.WalletKeyData)
+        self.assertEqual(msg.m_creation_timestamp, 1402182000)
+        self.assertEqual(msg.m_keys.m_account_address.m_spend_public_key[:2], b'\x5a\x10')
+
+        writer = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer, msg)
+        self.assertEqual(bytes(writer.buffer), data_bin)
+
+        msg.m_keys.m_multisig_keys = [b'\x19'*32, b'\x22'*32]
+        writer = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer, msg)
+
+        obj = await xmrrpc.Modeler(True).message(msg)
+        writer2 = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer2, True)
+        await arw.root()
+        await arw.section(obj)
+        self.assertEqual(writer.buffer, writer2.buffer)
+
+        msg2 = await xmrrpc.load_kv(x.MemoryReaderWriter(writer.buffer), xmr.WalletKeyData)
+        self.assertEqual(msg2, msg)
+
+        # Unknown entries are skipped
+        obj['m_keys']['m_unknown'] = [{'a': b'\x01'}]
+        writer = x.MemoryReaderWriter()
+        arw = xmrrpc.Archive(writer, True)
+        await arw.root()
+        await arw.section(obj)
+        msg3 = await xmrrpc.load_kv(x.MemoryReaderWriter(writer.buffer), xmr.WalletKeyData)
+        self.assertEqual(msg3, msg)
+
+        writer = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer, msg)
+        data_bin = bytes(writer.buffer)
+        for limit in (x.DecodeLimits(max_blob_size=16), x.DecodeLimits(max_container_size=3)):
+            ar = xmrrpc.KVArchive(x.MemoryReaderWriter(bytearray(data_bin)), False, limits=limit)
+            with self.assertRaises(helpers.ArchiveException):
+                await ar.root_message(None, msg_type=xmr.WalletKeyData)
+            self.assertEqual(ar.limits.depth, 0)
+
 
 if __name__ == "__main__":
     unittest.main()  # pragma: no cover
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import unittest
+
+import aiounittest
+
+from .test_data import XmrTestData
+from .. import xmrserialize as x
+from .. import xmrtypes as xmr
+from .. import xmrboost
+from .. import xmrrpc
+from .. import xmrstats
+
+
+__author__ = 'dusanklinec'
+
+
+class XmrStatsTest(aiounittest.AsyncTestCase):
+    """Archive instrumentation tests"""
+
+    def __init__(self, *args, **kwargs):
+        super(XmrStatsTest, self).__init__(*args, **kwargs)
+        self.test_data = XmrTestData()
+
+    def setUp(self):
+        self.test_data.reset()
+
+    async def test_binary(self):
+        """
+        Binary archive, field paths of the plain messages and the custom serializers
+        :return:
+        """
+        tx = self.test_data.gen_transaction(inputs=2, outputs=3, ring_size=4, rct_type=xmr.RctType.Simple)
+        blobs = self.test_data.gen_blobs(tx, formats=['xmrserialize'])
+
+        ar = x.Archive(x.MemoryReaderWriter(), True)
+        self.assertIs(ar.field.__func__, x.Archive.field)
+
+        stats = xmrstats.ArchiveStats()
+        writer = x.MemoryReaderWriter()
+        await x.Archive(writer, True, stats=stats).message(tx)
+        self.assertEqual(bytes(writer.buffer), blobs['xmrserialize'])
+        self.assertEqual(stats.nbytes, len(writer.buffer))
+
+        stats = xmrstats.ArchiveStats()
+        reader = x.BufferReader(blobs['xmrserialize'])
+        tx2 = await x.Archive(reader, False, stats=stats).message(None, xmr.Transaction)
+        self.assertEqual(len(tx2.rct_signatures.p.MGs), 2)
+        self.assertEqual(stats.nbytes, len(blobs['xmrserialize']))
+
+        root = stats.paths[('Transaction', )]
+        self.assertEqual(root.calls, 1)
+        self.assertEqual(root.bytes, len(blobs['xmrserialize']))
+        self.assertEqual(sum(e.self_bytes for e in stats.paths.values()), root.bytes)
+
+        offsets = stats.paths[('Transaction', 'Transaction.vin', 'TxinToKey.key_offsets')]
+        self.assertEqual(offsets.calls, 2)
+        mg_ss = stats.paths[('Transaction', 'rctsig_prunable', 'MGs', 'ss')]
+        self.assertEqual(mg_ss.bytes, 2 * 4 * 2 * 32)
+        self.assertEqual(stats.types['ECKey'].calls, stats.types['ECKey'].bytes // 32)
+        self.assertIn('ContainerType[TxInV]', stats.types)
+        self.assertFalse(stats.path or stats.path_frames or stats.type_frames or stats.brackets)
+
+        table = stats.table('path', limit=5).splitlines()
+        self.assertEqual(len(table), 6)
+        self.assertIn('Transaction', table[1])
+
+        fh = io.StringIO()
+        stats.write_folded(fh, 'bytes')
+        folded = dict(line.rsplit(' ', 1) for line in fh.getvalue().splitlines())
+        self.assertEqual(folded['Transaction;rctsig_prunable;MGs;ss'], str(mg_ss.self_bytes))
+        self.assertEqual(sum(int(v) for v in folded.values()), root.bytes)
+
+    async def test_boost_kv(self):
+        """
+        Boost and portable storage archives
+        :return:
+        """
+        tx = self.test_data.gen_transaction(inputs=2, outputs=2, ring_size=3)
+        blobs = self.test_data.gen_blobs(tx, formats=['xmrboost', 'xmrrpc'])
+
+        stats = xmrstats.ArchiveStats()
+        ar = xmrboost.Archive(x.BufferReader(blobs['xmrboost']), False, stats=stats)
+        await ar.root()
+        tx2 = await ar.message(None, xmr.Transaction)
+        self.assertEqual(len(tx2.rct_signatures.p.bulletproofs), 2)
+        self.assertEqual(stats.paths[('Transaction', 'RctSigPrunable.MGs', 'MgSig.ss')].calls, 2)
+        self.assertEqual(stats.types['Bulletproof'].calls, 2)
+
+        stats = xmrstats.ArchiveStats()
+        writer = x.MemoryReaderWriter()
+        await xmrrpc.dump_kv(writer, tx, stats=stats)
+        self.assertEqual(bytes(writer.buffer), blobs['xmrrpc'])
+        self.assertEqual(stats.nbytes, len(writer.buffer))
+        path = ('Transaction', 'Transaction.rct_signatures', 'RctSig.p', 'RctSigPrunable.bulletproofs')
+        self.assertEqual(stats.paths[path].calls, 1)
+        self.assertIn('Transaction', stats.to_dict()['paths'])
+
+
+if __name__ == "__main__":
+    unittest.main()  # pragma: no cover
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import binascii
+import os
+import unittest
+import pkg_resources
+
+import aiounittest
+
+from .test_data import XmrTestData
+from .. import xmrserialize as x
+from .. import xmrtypes as xmr
+from .. import xmrboost as xmrb
+from .. import xmrtranscode as xmrt
+
+
+__author__ = 'dusanklinec'
+
+
+class XmrTranscodeTest(aiounittest.AsyncTestCase):
+    """Boost <-> binary transcoding tests"""
+
+    def __init__(self, *args, **kwargs):
+        super(XmrTranscodeTest, self).__init__(*args, **kwargs)
+        self.test_data = XmrTestData()
+
+    def setUp(self):
+        self.test_data.reset()
+
+    async def to_binary(self, data, msg_type):
+        """
+        Reference conversion through the object graph
+        """
+        ar = xmrb.Archive(x.MemoryReaderWriter(bytearray(data)), False)
+        await ar.root()
+        msg = await ar.message(None, msg_type)
+
+        writer = x.MemoryReaderWriter()
+        await x.Archive(writer, True).message(msg)
+        return bytearray(writer.buffer)
+
+    async def round_trip(self, fname, msg_type):
+        data_hex = pkg_resources.resource_string(__name__, os.path.join('data', fname))
+        data_bin = binascii.unhexlify(data_hex)
+        binary = await self.to_binary(data_bin, msg_type)
+
+        writer = x.MemoryReaderWriter()
+        await xmrt.boost_to_binary(x.MemoryReaderWriter(bytearray(data_bin)), writer, msg_type)
+        self.assertEqual(bytearray(writer.buffer), binary)
+
+        writer = x.MemoryReaderWriter()
+        await xmrt.binary_to_boost(x.MemoryReaderWriter(bytearray(binary)), writer, msg_type)
+        self.assertEqual(bytearray(writer.buffer), data_bin)
+
+    async def test_tx_prefix(self):
+        """
+        Transaction prefix, both directions
+        :return:
+        """
+        await self.round_trip('tx_prefix_01.txt', xmr.TransactionPrefix)
+
+    async def test_tx(self):
+        """
+        RingCT transaction, both directions
+        :return:
+        """
+        await self.round_trip('tx_01.txt', xmr.Transaction)
+
+    async def test_generated_prefix(self):
+        """
+        Generated prefix transcoded to boost and back
+        :return:
+        """
+        msg = self.test_data.gen_transaction_prefix()
+        msg.vin[0].key_offsets[3] = 2 ** 60  # boost integers have at most 8 bytes
+        writer = x.MemoryReaderWriter()
+        await x.dump_message(writer, msg)
+        binary = bytearray(writer.buffer)
+
+        boost = x.MemoryReaderWriter()
+        await xmrt.binary_to_boost(x.MemoryReaderWriter(bytearray(binary)), boost, xmr.TransactionPrefix)
+
+        ar = xmrb.Archive(x.MemoryReaderWriter(bytearray(boost.buffer)), False)
+        await ar.root()
+        self.assertEqual(await ar.message(None, xmr.TransactionPrefix), msg)
+
+        writer = x.MemoryReaderWriter()
+        await xmrt.boost_to_binary(x.MemoryReaderWriter(bytearray(boost.buffer)), writer, xmr.TransactionPrefix)
+        self.assertEqual(bytearray(writer.buffer), binary)
+
+    async def test_archive_kinds(self):
+        """
+        Transcoding between archives of the same kind is refused
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            xmrt.Transcoder(x.Archive(x.MemoryReaderWriter(), False), x.Archive(x.MemoryReaderWriter(), True))
+        with self.assertRaises(ValueError):
+            xmrt.Transcoder(xmrb.Archive(x.MemoryReaderWriter(), True), x.Archive(x.MemoryReaderWriter(), True))
+
+
+if __name__ == "__main__":
+    unittest.main()  # pragma: no cover
@@ -10,7 +10,42 @@ from . import xmrserialize as x
 from . import helpers
 
 
-_UVARINT_BUFFER = bytearray(1)
+# Read buffers indexed by length, the integer has at most 8 value bytes + next size byte
+_UVARINT_BUFFERS = [bytearray(i) for i in range(10)]
+
+
+def uvarint_size_mark(size, negative):
+    """
+    Size byte of the boost integer, signed char in the portable archive
+    :param size:
+    :param negative:
+    :return:
+    """
+    return (256 - size) if negative else size
+
+
+def dump_uvarint_b(n):
+    """
+    Serializes the boost portable_binary_archive integer to bytes
+    :param n:
+    :return:
+    """
+    if 0 <= n < 256:
+        return _UVARINT_SMALL[n]
+
+    negative = n < 0
+    ll = -n if negative else n
+    size = (ll.bit_length() + 7) // 8
+    return bytes([uvarint_size_mark(size, negative)]) + ll.to_bytes(size, 'little')
+
+
+def _uvarint_b(n):
+    if n == 0:
+        return b'\x00'
+    return bytes([1, n])
+
+
+_UVARINT_SMALL = [_uvarint_b(i) for i in range(256)]
 
 
 async def load_uvarint(reader):
@@ -19,25 +54,21 @@ async def load_uvarint(reader):
     :param reader:
     :return:
     """
-    buffer = _UVARINT_BUFFER
+    buffer = _UVARINT_BUFFERS[1]
     await reader.areadinto(buffer)
     size = buffer[0]
     if size == 0:
         return 0
 
-    negative = size < 0
-    size = -size if negative else size
-    result = 0
-    shift = 0
-
+    negative = size > 127
+    size = 256 - size if negative else size
     if size > 8:
         raise ValueError('Varint size too big')
 
     # TODO: endianity, rev bytes if needed
-    for _ in range(size):
-        await reader.areadinto(buffer)
-        result += buffer[0] << shift
-        shift += 8
+    buffer = _UVARINT_BUFFERS[size]
+    await reader.areadinto(buffer)
+    result = int.from_bytes(buffer, 'little')
     return result if not negative else -result
 
 
@@ -48,41 +79,125 @@ async def dump_uvarint(writer, n):
     :param n:
     :return:
     """
-    buffer = _UVARINT_BUFFER
-    if n == 0:
-        buffer[0] = 0
-        return await writer.awrite(buffer)
+    return await writer.awrite(dump_uvarint_b(n))
 
-    negative = n < 0
-    ll = -n if negative else n
 
-    size = 0
-    while ll != 0:
-        ll >>= 8
-        size += 1
+async def load_uvarint_array(reader, count):
+    """
+    Loads count boost integers, e.g., a container of integers.
+    Size byte of the next integer is read together with the current value
+    so each element costs a single read.
+
+    :param reader:
+    :param count:
+    :return:
+    """
+    res = []
+    if count == 0:
+        return res
+
+    buffers = _UVARINT_BUFFERS
+    buffer = buffers[1]
+    await reader.areadinto(buffer)
+    size = buffer[0]
+    last = count - 1
 
-    buffer[0] = size
-    await writer.awrite(buffer)
+    for idx in range(count):
+        negative = size > 127
+        size = 256 - size if negative else size
+        if size > 8:
+            raise ValueError('Varint size too big')
 
-    ll = -n if negative else n
+        ln = size + 1 if idx < last else size
+        if ln == 0:
+            res.append(0)
+            break
+
+        buffer = buffers[ln]
+        await reader.areadinto(buffer)
+        result = int.from_bytes(buffer, 'little')
+        if idx < last:
+            shift = size << 3
+            nsize = result >> shift
+            result &= (1 << shift) - 1
+            size = nsize
+
+        res.append(result if not negative else -result)
+    return res
+
+
+async def dump_uvarint_array(writer, values):
+    """
+    Dumps boost integers with a single write
+    :param writer:
+    :param values:
+    :return:
+    """
+    return await writer.awrite(b''.join([dump_uvarint_b(n) for n in values]))
+
+
+def is_bulk_int_type(elem_type):
+    """
+    Returns True if the container of the given integers is processed in bulk.
+    UInt8 elements are raw bytes, other integers are boost integers, Int8 is left
+    to the generic per-element path.
+    :param elem_type:
+    :return:
+    """
+    if not isinstance(elem_type, type) or not issubclass(elem_type, (x.UVarintType, x.IntType)):
+        return False
+    return not issubclass(elem_type, x.Int8)
 
-    # TODO: endianity, rev bytes if needed
-    for _ in range(size):
-        buffer[0] = ll & 0xff
-        await writer.awrite(buffer)
-        ll >>= 8
+
+_TYPE_WRAPPERS = {}
 
 
 class TypeWrapper(object):
     """
     Boost serialization type wrapper - versioning.
     Primitive types not versioned.
+
+    Versioning metadata is resolved in the constructor, use TypeWrapper.get()
+    to obtain the cached wrapper for (tp, params).
     """
     ELEMENTARY_RES = 0, 0
 
     def __init__(self, tp, params=None):
         self.tp = tp
         self.params = TypeWrapper.wrap_params(params)
+        self.key = (self.tp, self.params)
+        self.elementary = TypeWrapper.is_elementary_type(tp)
+        self.versioned = self.is_versioned()
+        self.current_version = self.get_current_version()
+        try:
+            self._hash = hash(self.key)
+        except TypeError:
+            self._hash = hash(tp)
+
+    @staticmethod
+    def get(tp, params=None):
+        """
+        Returns cached type wrapper for (tp, params).
+        Equal wrappers are represented by a single instance.
+
+        :param tp:
+        :param params:
+        :return:
+        """
+        try:
+            return _TYPE_WRAPPERS[(tp, params)]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable params, e.g., list
+            pass
+
+        tw = TypeWrapper(tp, params)
+        try:
+            tw = _TYPE_WRAPPERS.setdefault(tw.key, tw)
+            _TYPE_WRAPPERS[(tp, params)] = tw
+        except TypeError:
+            pass
+        return tw
 
     @staticmethod
     def is_elementary_type(elem_type):
@@ -105,7 +220,7 @@ class TypeWrapper(object):
             return None
         if not isinstance(params, (tuple, list)):
             params = (params, )
-        return params
+        return tuple(params)
 
     def is_elementary(self):
         return TypeWrapper.is_elementary_type(self.tp)
@@ -116,7 +231,7 @@ class TypeWrapper(object):
         if hasattr(self.tp, 'boost_versioned'):
             return self.tp.boost_versioned()
         if hasattr(self.tp, 'VERSIONED'):
-            return self.VERSIONED
+            return self.tp.VERSIONED
         else:
             return True
 
@@ -129,12 +244,14 @@ class TypeWrapper(object):
             return 0
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if self.__class__ != other.__class__:
             return False
         return self.tp == other.tp and self.params == other.params
 
     def __hash__(self):
-        return hash(self.tp) ^ hash(self.params)
+        return self._hash
 
     def __repr__(self):
         return 'Type<%r:%r>' % (self.tp, self.params)
@@ -142,10 +259,12 @@ class TypeWrapper(object):
 
 class VersionDatabase(object):
     """
-    Boost version database - singletons
+    Boost version database - singletons.
+    Records only which type versions were emitted / read in the archive,
+    the type metadata itself is cached in the TypeWrapper.
     """
     def __init__(self):
-        self.db = {}  # type: dict[type -> tuple[int, int]]
+        self.db = {}  # type: dict[TypeWrapper -> tuple[int, int]]
 
     def is_versioned(self, twrap):
         """
@@ -164,15 +283,200 @@ class VersionDatabase(object):
         self.db[twrap] = (track, version)
 
 
+class VersionTemplate(object):
+    """
+    Precomputed version headers of the types reachable from the root type.
+
+    The boost archive emits (tracking, version) header of each versioned type
+    when the type is encountered for the first time. The template walks the schema
+    of the root type once and stores the encoded headers in the first encounter order.
+    Archives created with the template stamp the headers when writing and
+    compare the headers with the expected ones when reading.
+
+    Types serialized by custom boost_serialize contribute the types of their MFIELDS.
+    Types not covered by the template are processed as usual.
+    """
+
+    def __init__(self, root_type, params=None, versions=None):
+        """
+        :param root_type:
+        :param params:
+        :param versions: {type: version} overrides of the current versions
+        """
+        self.root = TypeWrapper.get(root_type, params)
+        self.overrides = versions if versions else {}
+        self.order = []  # type: list[TypeWrapper]
+        self.versions = {}  # type: dict[TypeWrapper -> int]
+        self.headers = {}  # type: dict[TypeWrapper -> bytes]
+        self._walk(root_type, params)
+
+    @staticmethod
+    def get(root_type, params=None):
+        """
+        Returns cached template of the root type with the current versions
+        :param root_type:
+        :param params:
+        :return:
+        """
+        key = TypeWrapper.get(root_type, params)
+        tpl = _VERSION_TEMPLATES.get(key)
+        if tpl is None:
+            tpl = VersionTemplate(root_type, params)
+            _VERSION_TEMPLATES[key] = tpl
+        return tpl
+
+    def _add(self, tp, params):
+        tw = TypeWrapper.get(tp, params)
+        if not tw.versioned or tw in self.versions:
+            return False
+
+        version = self.overrides.get(tp, tw.current_version)
+        self.order.append(tw)
+        self.versions[tw] = version
+        self.headers[tw] = dump_uvarint_b(0) + dump_uvarint_b(version)
+        return True
+
+    def _walk(self, elem_type, params=None):
+        if TypeWrapper.get(elem_type).elementary:
+            return
+
+        if issubclass(elem_type, x.ContainerType):
+            if container_is_versioned(elem_type, params):
+                self._add(elem_type, params)
+            c_elem = x.container_elem_type(elem_type, params)
+            return self._walk(c_elem, params[1:] if params else None)
+
+        if issubclass(elem_type, x.BlobType):
+            self._add(elem_type, params)
+            return
+
+        if not self._add(elem_type, params):
+            return  # visited
+
+        if issubclass(elem_type, x.TupleType):
+            elem_fields = params[0] if params else None
+            for ftype in (elem_fields if elem_fields is not None else elem_type.MFIELDS):
+                self._walk(ftype, params[1:] if params else None)
+
+        elif issubclass(elem_type, x.VariantType):
+            for field in elem_type.MFIELDS:
+                self._walk(field[1], field[2:])
+
+        elif issubclass(elem_type, x.MessageType):
+            fields = elem_type.MFIELDS
+            if not hasattr(elem_type, 'boost_serialize'):
+                fields = get_boost_plan(elem_type).fields_for(self.versions[TypeWrapper.get(elem_type)])
+            for field in fields:
+                self._walk(field[1], field[2:])
+
+    def sequence(self):
+        """
+        Returns [(type wrapper, version)] in the first encounter order
+        :return:
+        """
+        return [(tw, self.versions[tw]) for tw in self.order]
+
+    def check(self, version_db):
+        """
+        Bulk check of the versions recorded in the version database
+        against the template, raises ValueError on mismatch.
+        :param version_db:
+        :return:
+        """
+        for tw, rec in version_db.db.items():
+            expected = self.versions.get(tw)
+            if expected is not None and rec[1] != expected:
+                raise ValueError('Unexpected version of %s: %s, expected %s' % (tw, rec[1], expected))
+        return True
+
+
+_VERSION_TEMPLATES = {}
+
+
+class BoostPlan(object):
+    """
+    Compiled boost field order of the message type.
+
+    By default the boost archive serializes MFIELDS in the declared order.
+    Message types may declare the boost specifics as data:
+     - BOOST_FIELDS: field order, MFIELDS names or full field definitions,
+     - BOOST_FIELDS_SINCE: {field name: version}, field is present since the version,
+     - BOOST_MIN_VERSION: the oldest version supported.
+
+    The declaration is resolved once, field lists are cached per version.
+    """
+    __slots__ = ('msg_type', 'fields', 'min_version', 'gated', 'versions')
+
+    def __init__(self, msg_type):
+        self.msg_type = msg_type
+        self.min_version = getattr(msg_type, 'BOOST_MIN_VERSION', None)
+        self.versions = {}
+
+        declared = getattr(msg_type, 'BOOST_FIELDS', None)
+        since = getattr(msg_type, 'BOOST_FIELDS_SINCE', None) or {}
+        if declared is None:
+            declared = msg_type.MFIELDS
+
+        index = msg_type._field_index() if declared is not msg_type.MFIELDS else None
+        self.fields = []
+        for fld in declared:
+            if isinstance(fld, str):
+                fld = index[fld]
+            self.fields.append((fld, since.get(fld[0])))
+        self.gated = len(since) > 0
+
+        unknown = set(since.keys()) - set(fld[0] for fld, _ in self.fields)
+        if unknown:
+            raise ValueError('Unknown gated fields: %s' % sorted(unknown))
+
+    def fields_for(self, version=None):
+        """
+        Field definitions to serialize in the given version
+        :param version:
+        :return:
+        """
+        res = self.versions.get(version)
+        if res is not None:
+            return res
+
+        if version is not None and self.min_version is not None and version < self.min_version:
+            raise ValueError('%s v%s+ supported only' % (self.msg_type.__name__, self.min_version))
+
+        if not self.gated or version is None:
+            res = [fld for fld, _ in self.fields]
+        else:
+            res = [fld for fld, fsince in self.fields if fsince is None or version >= fsince]
+        self.versions[version] = res
+        return res
+
+
+_BOOST_PLANS = {}
+
+
+def get_boost_plan(msg_type):
+    """
+    Returns cached boost plan of the message type
+    :param msg_type:
+    :return:
+    """
+    plan = _BOOST_PLANS.get(msg_type)
+    if plan is None:
+        plan = BoostPlan(msg_type)
+        _BOOST_PLANS[msg_type] = plan
+    return plan
+
+
 class Archive(x.Archive):
     """
     Boost symmetric serialization archive
     """
 
-    def __init__(self, iobj, writing=True, **kwargs):
+    def __init__(self, iobj, writing=True, tracking=False, template=None, **kwargs):
         super().__init__(iobj, writing, **kwargs)
         self.version_db = VersionDatabase()
-        self.tracker = helpers.Tracker()
+        self.template = template
+        self.tracking = tracking
+        self.tracker = helpers.Tracker(tracking)
 
     def type_in_db(self, tp, params):
         """
@@ -180,7 +484,7 @@ class Archive(x.Archive):
         :param tp:
         :return:
         """
-        tw = TypeWrapper(tp, params)
+        tw = TypeWrapper.get(tp, params)
         return self.version_db.is_versioned(tw)
 
     async def get_version(self, tp, params):
@@ -192,12 +496,16 @@ class Archive(x.Archive):
         :param params:
         :return:
         """
-        tw = TypeWrapper(tp, params)
-        if not tw.is_versioned():
+        tw = TypeWrapper.get(tp, params)
+        if not tw.versioned:
             return TypeWrapper.ELEMENTARY_RES
 
         # If not in the DB, load from archive at current position
-        if not self.version_db.is_versioned(tw):
+        rec = self.version_db.db.get(tw)
+        if rec is None and self.template is not None and tw in self.template.headers:
+            return await self._check_template_version(tw)
+
+        if rec is None:
             tr = await load_uvarint(self.iobj)
             if tr != 0:
                 raise ValueError('Unsupported tracking for %s, tr: %s' % (tw, tr))
@@ -205,8 +513,9 @@ class Archive(x.Archive):
             ver = await load_uvarint(self.iobj)
 
             self.version_db.set_version(tw, tr, ver)
+            return ver
 
-        return self.version_db.get_version(tw)[1]
+        return rec[1]
 
     async def set_version(self, tp, params, version=None):
         """
@@ -217,19 +526,44 @@ class Archive(x.Archive):
         :param version:
         :return:
         """
-        tw = TypeWrapper(tp, params)
-        if not tw.is_versioned():
+        tw = TypeWrapper.get(tp, params)
+        if not tw.versioned:
             return TypeWrapper.ELEMENTARY_RES
 
         # If not in the DB, store to the archive at the current position
-        if not self.version_db.is_versioned(tw):
+        rec = self.version_db.db.get(tw)
+        if rec is None and version is None and self.template is not None and tw in self.template.headers:
+            version = self.template.versions[tw]
+            await self.iobj.awrite(self.template.headers[tw])
+            self.version_db.set_version(tw, 0, version)
+            return version
+
+        if rec is None:
             if version is None:
-                version = tw.get_current_version()
+                version = tw.current_version
             await dump_uvarint(self.iobj, 0)
             await dump_uvarint(self.iobj, version)
             self.version_db.set_version(tw, 0, version)
+            return version
+
+        return rec[1]
+
+    async def _check_template_version(self, tw):
+        """
+        Reads the version header expected by the template
+        :param tw:
+        :return:
+        """
+        expected = self.template.headers[tw]
+        hdr = bytearray(len(expected))
+        await self.iobj.areadinto(hdr)
+        if hdr != expected:
+            raise ValueError('Unexpected version header of %s: %s, expected %s'
+                             % (tw, binascii.hexlify(hdr), binascii.hexlify(expected)))
 
-        return self.version_db.get_version(tw)[1]
+        version = self.template.versions[tw]
+        self.version_db.set_version(tw, 0, version)
+        return version
 
     async def version(self, tp, params):
         """
@@ -283,9 +617,10 @@ class Archive(x.Archive):
             ivalue = await load_uvarint(self.iobj)
             if ivalue == 0:
                 return ''
+            if self.limits is not None:
+                self.limits.check_blob(ivalue)
 
-            fvalue = bytearray(ivalue)
-            await self.iobj.areadinto(fvalue)
+            fvalue = await x.load_bytes(self.iobj, ivalue)
             return str(fvalue, 'utf8')
 
     async def blob(self, elem=None, elem_type=None, params=None):
@@ -338,8 +673,9 @@ class Archive(x.Archive):
         :return:
         """
         ivalue = await load_uvarint(self.iobj)
-        fvalue = bytearray(ivalue)
-        await self.iobj.areadinto(fvalue)
+        if self.limits is not None:
+            self.limits.check_blob(ivalue)
+        fvalue = await x.load_bytes(self.iobj, ivalue)
 
         if elem is None:
             return fvalue  # array by default
@@ -359,11 +695,7 @@ class Archive(x.Archive):
         :return:
         """
         # Container versioning is a bit tricky, primitive type containers are not versioned.
-        elem_type = x.container_elem_type(container_type, params)
-        raw_container = container_is_raw(container_type, params)
-        elem_elementary = TypeWrapper.is_elementary_type(elem_type)
-        is_versioned = not elem_elementary and not raw_container
-
+        is_versioned = container_is_versioned(container_type, params)
         version = await self.version(container_type, params) if is_versioned else None
         if hasattr(container_type, 'boost_serialize'):
             container = container_type() if container is None else container
@@ -390,14 +722,19 @@ class Archive(x.Archive):
             await dump_uvarint(self.iobj, container_len)
             if not container_is_raw(container_type, params):
                 c_elem = x.container_elem_type(container_type, params)
-                c_ver = TypeWrapper(c_elem)
-                await dump_uvarint(self.iobj, c_ver.get_current_version())  # element version
+                c_ver = TypeWrapper.get(c_elem)
+                await dump_uvarint(self.iobj, c_ver.current_version)  # element version
 
             if container_type.FIX_SIZE and container_len != container_type.SIZE:
                 raise ValueError('Fixed size container has not defined size: %s' % container_type.SIZE)
 
         else:
-            raise ValueError('Not supported')
+            c_len = await load_uvarint(self.iobj)
+            if self.limits is not None:
+                self.limits.check_container(c_len)
+            if not container_is_raw(container_type, params):
+                await load_uvarint(self.iobj)  # element version
+            return c_len
 
     async def container_val(self, elem, container_type, params=None):
         """
@@ -435,13 +772,23 @@ class Archive(x.Archive):
         await self.container_size(len(container), container_type, params)
 
         elem_type = x.container_elem_type(container_type, params)
+        if is_bulk_int_type(elem_type):
+            try:
+                if issubclass(elem_type, x.UInt8):
+                    return await self.iobj.awrite(bytes(container))
+                return await dump_uvarint_array(self.iobj, container)
+            except Exception as e:
+                raise helpers.track_exception(e, self.tracker) from e
+
         for idx, elem in enumerate(container):
             try:
-                self.tracker.push_index(idx)
+                if self.tracking:
+                    self.tracker.push_index(idx)
                 await self._dump_field(elem, elem_type, params[1:] if params else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, idx) from e
 
     async def container_load(self, container_type, params=None, container=None):
         """
@@ -456,6 +803,8 @@ class Archive(x.Archive):
         """
         raw_container = container_is_raw(container_type, params)
         c_len = await load_uvarint(self.iobj)
+        if self.limits is not None:
+            self.limits.check_container(c_len)
         elem_ver = await load_uvarint(self.iobj) if not raw_container else 0
 
         # if container and c_len != len(container):
@@ -463,20 +812,40 @@ class Archive(x.Archive):
 
         elem_type = x.container_elem_type(container_type, params)
         res = container if container else []
+        if is_bulk_int_type(elem_type):
+            try:
+                res[0:c_len] = await self._load_int_array(elem_type, c_len)
+            except Exception as e:
+                raise helpers.track_exception(e, self.tracker) from e
+            return res
+
         for i in range(c_len):
             try:
-                self.tracker.push_index(i)
+                if self.tracking:
+                    self.tracker.push_index(i)
                 fvalue = await self._load_field(elem_type,
                                                 params[1:] if params else None,
                                                 x.eref(res, i) if container else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, i) from e
 
             if not container:
                 res.append(fvalue)
         return res
 
+    async def _load_int_array(self, elem_type, c_len):
+        """
+        Loads c_len integers of the container at once
+        :param elem_type:
+        :param c_len:
+        :return:
+        """
+        if issubclass(elem_type, x.UInt8):
+            return list(await x.load_bytes(self.iobj, c_len))
+        return await load_uvarint_array(self.iobj, c_len)
+
     async def tuple(self, elem=None, elem_type=None, params=None):
         """
         Loads/dumps tuple
@@ -509,12 +878,14 @@ class Archive(x.Archive):
             elem_fields = elem_type.MFIELDS
         for idx, elem in enumerate(elem):
             try:
-                self.tracker.push_index(idx)
+                if self.tracking:
+                    self.tracker.push_index(idx)
                 await self._dump_field(elem, elem_fields[idx], params[1:] if params else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, idx) from e
 
     async def load_tuple(self, elem_type, params=None, elem=None):
         """
@@ -536,17 +907,19 @@ class Archive(x.Archive):
         res = elem if elem else []
         for i in range(len(elem_fields)):
             try:
-                self.tracker.push_index(i)
+                if self.tracking:
+                    self.tracker.push_index(i)
                 fvalue = await self._load_field(elem_fields[i],
                                                 params[1:] if params else None,
                                                 x.eref(res, i) if elem else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
                 if not elem:
                     res.append(fvalue)
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, i) from e
 
         return res
 
@@ -589,8 +962,7 @@ class Archive(x.Archive):
 
         else:
             fdef = elem_type.find_fdef(elem_type.MFIELDS, elem)
-            vcode = fdef[1].BOOST_VARIANT_CODE if hasattr(fdef[1], 'BOOST_VARIANT_CODE') else fdef[1].VARIANT_CODE
-            await dump_uvarint(self.iobj, vcode)
+            await dump_uvarint(self.iobj, variant_code(fdef[1]))
             await self._dump_field(elem, fdef[1])
 
     async def load_variant(self, elem_type, params=None, elem=None, wrapped=None):
@@ -612,8 +984,7 @@ class Archive(x.Archive):
         tag = await load_uvarint(self.iobj)
         for field in elem_type.MFIELDS:
             ftype = field[1]
-            vcode = ftype.BOOST_VARIANT_CODE if hasattr(ftype, 'BOOST_VARIANT_CODE') else ftype.VARIANT_CODE
-            if vcode != tag:
+            if variant_code(ftype) != tag:
                 continue
 
             fvalue = await self._load_field(ftype, field[2:], elem if not is_wrapped else None)
@@ -623,6 +994,93 @@ class Archive(x.Archive):
 
         raise ValueError('Unknown tag: %s' % tag)
 
+    async def skip_field(self, elem_type, params=None):
+        """
+        Reads the field without building the object.
+        Version headers are processed so the version state stays consistent.
+        Types with custom boost_serialize are loaded and dropped.
+
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        if self.writing:
+            raise ValueError('Skipping is supported only when reading')
+
+        if issubclass(elem_type, (x.UVarintType, x.IntType, x.BlobType, x.UnicodeType)):
+            await self.field(None, elem_type, params)
+
+        elif hasattr(elem_type, 'boost_serialize'):
+            await self.field(None, elem_type, params)
+
+        elif issubclass(elem_type, x.ContainerType):
+            c_elem = x.container_elem_type(elem_type, params)
+            if TypeWrapper.get(c_elem).elementary:
+                return await self.field(None, elem_type, params)
+
+            if container_is_versioned(elem_type, params):
+                await self.version(elem_type, params)
+            c_len = await self.container_size(None, elem_type, params)
+            for _ in range(c_len):
+                await self.skip_field(c_elem, params[1:] if params else None)
+
+        elif issubclass(elem_type, x.TupleType):
+            await self.version(elem_type, params)
+            elem_fields = params[0] if params else None
+            for ftype in (elem_fields if elem_fields is not None else elem_type.MFIELDS):
+                await self.skip_field(ftype, params[1:] if params else None)
+
+        elif issubclass(elem_type, x.VariantType):
+            await self.version(elem_type, params)
+            tag = await load_uvarint(self.iobj)
+            for field in elem_type.MFIELDS:
+                if variant_code(field[1]) == tag:
+                    return await self.skip_field(field[1], field[2:])
+            raise ValueError('Unknown tag: %s' % tag)
+
+        elif issubclass(elem_type, x.MessageType):
+            version = await self.version(elem_type, None)
+            for field in get_boost_plan(elem_type).fields_for(version):
+                await self.skip_field(field[1], field[2:])
+
+        else:
+            raise TypeError
+
+    async def load_message_projection(self, msg_type, fields=None, skip=None):
+        """
+        Loads the message, only the selected fields are set, the rest is skipped.
+
+        :param msg_type:
+        :param fields: names of the fields to load, None = all
+        :param skip: names of the fields to skip
+        :return:
+        """
+        if hasattr(msg_type, 'boost_serialize'):
+            raise ValueError('Projection is not supported for custom serialized %s' % msg_type.__name__)
+
+        version = await self.version(msg_type, None)
+        msg = msg_type()
+        for field in get_boost_plan(msg_type).fields_for(version):
+            fname = field[0]
+            if (fields is not None and fname not in fields) or (skip is not None and fname in skip):
+                await self.skip_field(field[1], field[2:])
+            else:
+                await self.message_field(msg, field)
+        return msg
+
+    def iter_container(self, container_type, params=None, fields=None, skip=None):
+        """
+        Returns async iterator over the container of messages,
+        elements are loaded one at a time.
+
+        :param container_type:
+        :param params:
+        :param fields: message fields to load, None = all
+        :param skip: message fields to skip
+        :return:
+        """
+        return ContainerIterator(self, container_type, params, fields=fields, skip=skip)
+
     async def root(self):
         """
         Root level init
@@ -673,9 +1131,9 @@ class Archive(x.Archive):
             return await msg.boost_serialize(self, version=version)
 
         if self.writing:
-            return await self.dump_message(msg, msg_type=msg_type)
+            return await self.dump_message(msg, msg_type=msg_type, version=version)
         else:
-            return await self.load_message(msg_type, msg=msg)
+            return await self.load_message(msg_type, msg=msg, version=version)
 
     async def message_field(self, msg, field, fvalue=None):
         """
@@ -687,7 +1145,8 @@ class Archive(x.Archive):
         """
         fname, ftype, params = field[0], field[1], field[2:]
         try:
-            self.tracker.push_field(fname)
+            if self.tracking:
+                self.tracker.push_field(fname)
             if self.writing:
                 fvalue = getattr(msg, fname, None) if fvalue is None else fvalue
                 await self._dump_field(fvalue, ftype, params)
@@ -695,10 +1154,11 @@ class Archive(x.Archive):
             else:
                 await self._load_field(ftype, params, x.eref(msg, fname))
 
-            self.tracker.pop()
+            if self.tracking:
+                self.tracker.pop()
 
         except Exception as e:
-            raise helpers.ArchiveException(e, tracker=self.tracker) from e
+            raise helpers.track_exception(e, self.tracker, helpers.TrackField, fname) from e
 
     async def message_fields(self, msg, fields):
         """
@@ -710,39 +1170,43 @@ class Archive(x.Archive):
         """
         for field in fields:
             try:
-                self.tracker.push_field(field[0])
+                if self.tracking:
+                    self.tracker.push_field(field[0])
                 await self.message_field(msg, field)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackField, field[0]) from e
 
         return msg
 
-    async def dump_message(self, msg, msg_type=None):
+    async def dump_message(self, msg, msg_type=None, version=None):
         """
         Dumps message to the writer.
 
         :param msg:
         :param msg_type:
+        :param version: message version, fields gated by the version
         :return:
         """
         mtype = msg.__class__ if msg_type is None else msg_type
-        fields = mtype.MFIELDS
+        fields = get_boost_plan(mtype).fields_for(version)
         for field in fields:
             await self.message_field(msg=msg, field=field)
 
-    async def load_message(self, msg_type, msg=None):
+    async def load_message(self, msg_type, msg=None, version=None):
         """
         Loads message if the given type from the reader.
         Supports reading directly to existing message.
 
         :param msg_type:
         :param msg:
+        :param version: message version, fields gated by the version
         :return:
         """
         msg = msg_type() if msg is None else msg
-        fields = msg_type.MFIELDS if msg_type else msg.__class__.MFIELDS
+        fields = get_boost_plan(msg_type if msg_type else msg.__class__).fields_for(version)
         for field in fields:
             await self.message_field(msg, field)
 
@@ -757,34 +1221,41 @@ class Archive(x.Archive):
         :return:
         """
         elem_type = elem_type if elem_type else elem.__class__
-        fvalue = None
-        if issubclass(elem_type, x.UVarintType):
-            fvalue = await self.uvarint(x.get_elem(elem))
+        limits = self.limits if not self.writing else None
+        if limits is not None:
+            limits.enter()
 
-        elif issubclass(elem_type, x.IntType):
-            fvalue = await self.uint(elem=x.get_elem(elem), elem_type=elem_type, params=params)
+        try:
+            fvalue = None
+            if issubclass(elem_type, x.UVarintType):
+                fvalue = await self.uvarint(x.get_elem(elem))
 
-        elif issubclass(elem_type, x.BlobType):
-            fvalue = await self.blob(elem=x.get_elem(elem), elem_type=elem_type, params=params)
+            elif issubclass(elem_type, x.IntType):
+                fvalue = await self.uint(elem=x.get_elem(elem), elem_type=elem_type, params=params)
 
-        elif issubclass(elem_type, x.UnicodeType):
-            fvalue = await self.unicode_type(x.get_elem(elem))
+            elif issubclass(elem_type, x.BlobType):
+                fvalue = await self.blob(elem=x.get_elem(elem), elem_type=elem_type, params=params)
 
-        elif issubclass(elem_type, x.VariantType):
-            fvalue = await self.variant(elem=x.get_elem(elem), elem_type=elem_type, params=params)
+            elif issubclass(elem_type, x.UnicodeType):
+                fvalue = await self.unicode_type(x.get_elem(elem))
 
-        elif issubclass(elem_type, x.ContainerType):  # container ~ simple list
-            fvalue = await self.container(container=x.get_elem(elem), container_type=elem_type, params=params)
+            elif issubclass(elem_type, x.VariantType):
+                fvalue = await self.variant(elem=x.get_elem(elem), elem_type=elem_type, params=params)
 
-        elif issubclass(elem_type, x.TupleType):  # tuple ~ simple list
-            fvalue = await self.tuple(elem=x.get_elem(elem), elem_type=elem_type, params=params)
+            elif issubclass(elem_type, x.ContainerType):  # container ~ simple list
+                fvalue = await self.container(container=x.get_elem(elem), container_type=elem_type, params=params)
 
-        elif issubclass(elem_type, x.MessageType):
-            fvalue = await self.message(x.get_elem(elem), msg_type=elem_type)
+            elif issubclass(elem_type, x.TupleType):  # tuple ~ simple list
+                fvalue = await self.tuple(elem=x.get_elem(elem), elem_type=elem_type, params=params)
 
-        else:
-            raise TypeError
+            elif issubclass(elem_type, x.MessageType):
+                fvalue = await self.message(x.get_elem(elem), msg_type=elem_type)
 
+            else:
+                raise TypeError
+        finally:
+            if limits is not None:
+                limits.leave()
         return fvalue if self.writing else x.set_elem(elem, fvalue)
 
     async def dump_field(self, writer, elem, elem_type, params=None):
@@ -802,6 +1273,55 @@ class Archive(x.Archive):
         return await self.field(elem=elem, elem_type=elem_type, params=params)
 
 
+class ContainerIterator(object):
+    """
+    Async iterator over the boost container of messages.
+    Elements are loaded one at a time so the whole container is never held in the memory.
+
+    >>> async for td in ar.iter_container(x.ContainerType, (xmr.TransferDetails, ), skip=('m_tx', )):
+    >>>     process(td)
+    """
+
+    def __init__(self, ar, container_type, params=None, fields=None, skip=None):
+        self.ar = ar
+        self.container_type = container_type
+        self.params = params
+        self.elem_type = x.container_elem_type(container_type, params)
+        self.fields = frozenset(fields) if fields is not None else None
+        self.skip = frozenset(skip) if skip is not None else None
+        self.size = None
+        self.idx = 0
+
+    async def begin(self):
+        """
+        Reads the container header, returns the number of elements
+        :return:
+        """
+        if self.size is None:
+            if container_is_versioned(self.container_type, self.params):
+                await self.ar.version(self.container_type, self.params)
+            self.size = await self.ar.container_size(None, self.container_type, self.params)
+        return self.size
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.begin()
+        if self.idx >= self.size:
+            raise StopAsyncIteration
+
+        idx = self.idx
+        self.idx += 1
+        try:
+            if self.fields is None and self.skip is None:
+                return await self.ar.message(None, self.elem_type)
+            return await self.ar.load_message_projection(self.elem_type, fields=self.fields, skip=self.skip)
+
+        except Exception as e:
+            raise helpers.track_exception(e, self.ar.tracker, helpers.TrackIndex, idx) from e
+
+
 def container_is_raw(container_type, params):
     """
     Returns true if container is statically allocated array
@@ -811,3 +1331,23 @@ def container_is_raw(container_type, params):
     """
     return container_type.BOOST_RAW_ARRAY if hasattr(container_type, 'BOOST_RAW_ARRAY') else False
 
+
+def container_is_versioned(container_type, params):
+    """
+    Returns true if the container carries the version, i.e.,
+    elements are not primitive and the container is not a raw array
+    :param container_type:
+    :param params:
+    :return:
+    """
+    elem_type = x.container_elem_type(container_type, params)
+    return not TypeWrapper.get(elem_type).elementary and not container_is_raw(container_type, params)
+
+
+def variant_code(elem_type):
+    """
+    Returns boost variant code of the variant element type
+    :param elem_type:
+    :return:
+    """
+    return elem_type.BOOST_VARIANT_CODE if hasattr(elem_type, 'BOOST_VARIANT_CODE') else elem_type.VARIANT_CODE
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Sans-IO incremental decoding.
+
+All archives read through the `AsyncReader` interface and assume `areadinto`
+can wait until the requested data arrives. Protocol handlers receiving the data
+in fragments cannot wait, so the decoder here drives the archive coroutine by hand.
+When the buffered data is not sufficient the coroutine is suspended inside `areadinto`
+and it is resumed from the very same point once more data is fed.
+Nothing is decoded twice and no per-message framing copies are needed.
+
+>>> decoder = binary_decoder(xmr.Transaction)
+>>> for chunk in socket_chunks:
+>>>     for tx in decoder.feed(chunk):
+>>>         process(tx)
+>>> decoder.close()
+'''
+
+from . import xmrserialize as x
+from . import xmrboost as xmrb
+from . import xmrrpc
+
+
+class NeedMoreData(object):
+    """
+    Awaitable suspending the decoding coroutine until more data is fed.
+    """
+    def __await__(self):
+        yield self
+
+
+_NEED_MORE_DATA = NeedMoreData()
+
+
+class FeedReader(object):
+    """
+    AsyncReader over the data pushed by feed().
+    Suspends the reading coroutine when the requested amount is not buffered yet.
+    """
+
+    def __init__(self, data=None):
+        self.buffer = bytearray(data) if data else bytearray()
+        self.offset = 0
+        self.nread = 0
+        self.eof = False
+
+    def feed(self, data):
+        self.buffer += data
+
+    def available(self):
+        """
+        Number of buffered bytes not read yet
+        :return:
+        """
+        return len(self.buffer) - self.offset
+
+    def remaining(self):
+        """
+        Number of bytes left to read, None until the end of the data is known
+        :return:
+        """
+        return self.available() if self.eof else None
+
+    def compact(self):
+        """
+        Drops already consumed data from the buffer
+        :return:
+        """
+        if self.offset:
+            del self.buffer[:self.offset]
+            self.offset = 0
+
+    async def areadinto(self, buf):
+        ln = len(buf)
+        while len(self.buffer) - self.offset < ln:
+            if self.eof:
+                raise EOFError('Unexpected end of data, %s bytes missing' % (ln - self.available()))
+            await _NEED_MORE_DATA
+
+        with memoryview(self.buffer) as mv:
+            with mv[self.offset:self.offset + ln] as chunk:
+                buf[:] = chunk
+
+        self.offset += ln
+        self.nread += ln
+        return ln
+
+
+class IncrementalDecoder(object):
+    """
+    Push-style decoder. Data is passed in with feed(), completed messages
+    are returned as soon as they are fully buffered.
+
+    The decode callable is an async function taking an AsyncReader and returning
+    a single decoded message, it is called repeatedly while there is data in the buffer.
+    """
+
+    def __init__(self, decode, reader=None):
+        self.decode = decode
+        self.reader = reader if reader is not None else FeedReader()
+        self.coro = None
+
+    @property
+    def needs_data(self):
+        """
+        True if the decoder cannot make any progress without more data,
+        i.e., a message is decoded partially or the buffer is empty.
+        :return:
+        """
+        return self.coro is not None or self.reader.available() == 0
+
+    @property
+    def in_message(self):
+        """
+        True if a message is decoded partially
+        :return:
+        """
+        return self.coro is not None
+
+    def feed(self, data):
+        """
+        Adds data to the buffer and decodes as much as possible.
+        Returns list of messages completed by the data.
+
+        :param data:
+        :return:
+        """
+        self.reader.feed(data)
+        return self._run()
+
+    def close(self):
+        """
+        Signals end of the input. Returns list of the remaining messages,
+        raises EOFError if a message is left incomplete.
+        :return:
+        """
+        self.reader.eof = True
+        return self._run()
+
+    def _run(self):
+        res = []
+        while True:
+            if self.coro is None:
+                if self.reader.available() == 0:
+                    break
+                self.coro = self.decode(self.reader)
+
+            try:
+                yielded = self.coro.send(None)
+
+            except StopIteration as e:
+                self.coro = None
+                self.reader.compact()
+                res.append(e.value)
+                continue
+
+            except Exception:
+                self.coro = None
+                raise
+
+            if yielded is not _NEED_MORE_DATA:
+                self.coro.close()
+                self.coro = None
+                raise ValueError('Decoder awaited unsupported object: %r' % (yielded, ))
+            break
+
+        return res
+
+
+def binary_decoder(msg_type, **kwargs):
+    """
+    Incremental decoder of the Monero binary serialization, xmrserialize.Archive
+    :param msg_type:
+    :param kwargs: archive arguments
+    :return:
+    """
+    async def decode(reader):
+        msg = msg_type()
+        ar = x.Archive(reader, False, **kwargs)
+        await ar.message(msg)
+        return msg
+    return IncrementalDecoder(decode)
+
+
+def boost_decoder(msg_type, **kwargs):
+    """
+    Incremental decoder of the boost portable binary archives, one archive per message.
+    :param msg_type:
+    :param kwargs: archive arguments
+    :return:
+    """
+    async def decode(reader):
+        msg = msg_type()
+        ar = xmrb.Archive(reader, False, **kwargs)
+        await ar.root_message(msg)
+        return msg
+    return IncrementalDecoder(decode)
+
+
+def portable_storage_decoder(modeled=True, **kwargs):
+    """
+    Incremental decoder of the portable storage sections, xmrrpc.Archive
+    :param modeled:
+    :param kwargs: archive arguments
+    :return:
+    """
+    async def decode(reader):
+        ar = xmrrpc.Archive(reader, False, modeled=modeled, **kwargs)
+        await ar.root()
+        return await ar.section()
+    return IncrementalDecoder(decode)
@@ -3,15 +3,70 @@
 '''
 Monero JSON codec.
 
-Note: This is not optimized for memory usage.
-Used for debugging.
+Archive streams the messages to JSON and back, see Archive.
+json_dumps() on the xmrobj dumps is not optimized for memory usage, used for debugging.
 '''
 
+import array
 import base64
+import binascii
 import collections
 import json
+import re
 
 from . import xmrserialize as x
+from . import helpers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import rapidjson
+except ImportError:
+    rapidjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+_UNESCAPE_CHMAP = {
+    b'b': b'\b',
+    b'f': b'\f',
+    b'n': b'\n',
+    b'r': b'\r',
+    b't': b'\t',
+    b'\\': b'\\',
+    b'"': b'"',
+    b'/': b'/',
+}
+
+_ESCAPE_CHMAP = {
+    b'\b': b'\\b',
+    b'\f': b'\\f',
+    b'\n': b'\\n',
+    b'\r': b'\\r',
+    b'\t': b'\\t',
+    b'\\': b'\\\\',
+    b'"': b'\\"',
+}
+_ESCAPE_CHMAP.update({bytes([i]): b'\\u%04X' % i for i in range(0x20) if bytes([i]) not in _ESCAPE_CHMAP})
+
+_UNESCAPE_RE = re.compile(rb'\\(?:u([0-9a-fA-F]{4})|(.)|$)', re.DOTALL)
+_ESCAPE_RE = re.compile(rb'[\x00-\x1f"\\]')
+
+
+def _unescape_char(m):
+    if m.group(1) is not None:
+        return bytes([int(m.group(1), 16)])
+
+    ch = _UNESCAPE_CHMAP.get(m.group(2))
+    if ch is None:
+        raise ValueError('Invalid escape sequence: %r' % m.group(0))
+    return ch
 
 
 def unescape_json_str(st):
@@ -19,84 +74,759 @@ def unescape_json_str(st):
     Unescape Monero json encoded string
     /monero/external/rapidjson/reader.h
 
+    Runs without escape sequences are copied as whole slices,
+    the input is returned unchanged if there is nothing to unescape.
+
     :param st:
     :return:
     """
-    c = 0
-    ln = len(st)
-    escape_chmap = {
-        b'b': b'\b',
-        b'f': b'\f',
-        b'n': b'\n',
-        b'r': b'\r',
-        b't': b'\t',
-        b'\\': b'\\',
-        b'"': b'\"',
-        b'/': b'\/'
-    }
-
-    ret = []
-
-    def at(i):
-        return st[i:i+1]
-
-    while c < ln:
-        if at(c) == b'\\':
-            if at(c+1) == b'u':
-                ret.append(bytes([int(st[c+2:c+6], 16)]))
-                # ret.append(st[c:c+6].decode('unicode_escape').encode('utf8'))
-                c += 6
-
-            else:
-                ret.append(escape_chmap[at(c+1)])
-                c += 2
-
-        else:
-            ret.append(at(c))
-            c += 1
-
-    df = (b''.join(ret))
-    return df
+    if b'\\' not in st:
+        return st
+    return _UNESCAPE_RE.sub(_unescape_char, st)
 
 
 def escape_string_json(st):
     """
     Escaping string for json
     /Users/dusanklinec/workspace/monero/external/rapidjson/writer.h
+
+    Runs without characters to escape are copied as whole slices,
+    the input is returned unchanged if there is nothing to escape.
+
     :param st:
     :return:
     """
-    ret = []
-    c = 0
-    ln = len(st)
-
-    escape_chmap = {
-        b'\b': b'b',
-        b'\f': b'f',
-        b'\n': b'n',
-        b'\r': b'r',
-        b'\t': b't',
-        b'\\': b'\\',
-        b'\"': b'"',
-        b'\/': b'/'
-    }
-
-    while c < ln:
-        ch = st[c:c+1]
-        if ch in escape_chmap:
-            ret.append(b'\\' + escape_chmap[ch])
-        elif ord(ch) < 0x20:
-            ret.append(b'\\u%04X' % ord(ch))
-        else:
-            ret.append(ch)
-        c += 1
-    return b''.join(ret)
+    if _ESCAPE_RE.search(st) is None:
+        return st
+    return _ESCAPE_RE.sub(lambda m: _ESCAPE_CHMAP[m.group(0)], st)
+
+
+class JsonToken:
+    PUNCT = 1
+    STRING = 2
+    INT = 3
+    LITERAL = 4
+    FLOAT = 5
+
+
+_JSON_TOKEN = re.compile(
+    rb'[ \t\r\n]*(?:([{}\[\]:,])|"([^"\\]*(?:\\.[^"\\]*)*)"|(-?[0-9]+)(?![.eE0-9])|(true|false|null)'
+    rb'|(-?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?))', re.DOTALL)
+
+_JSON_WHITESPACE = re.compile(rb'[ \t\r\n]*')
+
+_JSON_INT_ARRAY = re.compile(rb'[ \t\r\n]*(?:-?[0-9]+[ \t\r\n]*(?:,[ \t\r\n]*-?[0-9]+[ \t\r\n]*)*)?')
+_JSON_HEX_ARRAY = re.compile(
+    rb'[ \t\r\n]*(?:"[0-9a-fA-F]*"[ \t\r\n]*(?:,[ \t\r\n]*"[0-9a-fA-F]*"[ \t\r\n]*)*)?')
+_JSON_INT = re.compile(rb'-?[0-9]+')
+_JSON_HEX = re.compile(rb'"([0-9a-fA-F]*)"')
+
+_FLUSH_SIZE = 64 * 1024
+
+
+def _match_token(data, offset, final=True):
+    """
+    Matches the next token, returns (token match, end of the whitespace).
+    With final=False the token touching the end of the data may be incomplete and None is returned.
+    :param data:
+    :param offset:
+    :param final:
+    :return:
+    """
+    m = _JSON_TOKEN.match(data, offset)
+    if m is not None and not final and m.end() == len(data) and m.lastindex in (JsonToken.INT, JsonToken.FLOAT):
+        m = None
+    if m is not None:
+        return m, m.end()
+    return None, _JSON_WHITESPACE.match(data, offset).end()
+
+
+def _token(m):
+    kind = m.lastindex
+    val = m.group(kind)
+    return kind, val if kind != JsonToken.INT else int(val)
+
+
+class JsonTokenizer(object):
+    """
+    Iterates (token type, value) over the JSON text.
+    Punctuation and literals are returned as bytes, strings are returned still escaped,
+    integers as int.
+    """
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        m, end = _match_token(self.data, self.offset)
+        if m is None:
+            if end == len(self.data):
+                self.offset = end
+                raise StopIteration
+            raise ValueError('Invalid JSON at %s' % end)
+
+        self.offset = end
+        return _token(m)
+
+
+class JsonTokenReader(object):
+    """
+    Tokenizes JSON text read from the AsyncReader in chunks.
+    The stream ends with a short read, as with MemoryReaderWriter, or with EOFError
+    raised by readers which cannot fill the whole buffer, as BufferReader or FeedReader.
+    After EOFError the read is retried with smaller chunks, the remainder is not lost.
+    Without the reader the whole JSON text is given as data, tokens never suspend.
+    """
+
+    def __init__(self, reader, chunk_size=_FLUSH_SIZE, data=b''):
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self.data = data
+        self.offset = 0
+        self.eof = reader is None
+        self.cur = None
+
+    async def fill(self):
+        while True:
+            chunk = bytearray(self.chunk_size)
+            try:
+                nread = await self.reader.areadinto(chunk)
+                break
+            except EOFError:
+                if self.chunk_size <= 1:
+                    nread = 0
+                    break
+                # Less than the chunk left, the chunk is not grown back
+                self.chunk_size //= 2
+
+        self.eof = nread < len(chunk)
+        self.data = self.data[self.offset:] + chunk[:nread]
+        self.offset = 0
+
+    async def peek(self):
+        """
+        Returns the next token without consuming it
+        :return:
+        """
+        while self.cur is None:
+            m, end = _match_token(self.data, self.offset, self.eof)
+            if m is not None:
+                self.offset = end
+                self.cur = _token(m)
+            elif not self.eof:
+                await self.fill()
+            elif end == len(self.data):
+                raise EOFError('Unexpected end of JSON')
+            else:
+                raise ValueError('Invalid JSON: %r' % bytes(self.data[end:end + 16]))
+        return self.cur
+
+    async def next(self):
+        """
+        Returns the next token
+        :return:
+        """
+        tok = await self.peek()
+        self.cur = None
+        return tok
+
+    async def raw_until(self, stop):
+        """
+        Returns the raw JSON text up to the stop character, the stop character is consumed.
+        Only for values which cannot contain the stop character.
+        :param stop:
+        :return:
+        """
+        if self.cur is not None:
+            raise ValueError('Token already peeked')
+
+        searched = self.offset
+        while True:
+            end = self.data.find(stop, searched)
+            if end >= 0:
+                break
+            if self.eof:
+                raise EOFError('Unexpected end of JSON')
+            searched = len(self.data) - self.offset
+            await self.fill()
+
+        raw = self.data[self.offset:end]
+        self.offset = end + 1
+        return raw
 
 
 class Archive(x.Archive):
+    """
+    Streaming JSON archive, resembles json_archive from the Monero codebase.
+
+    The JSON text is written to the writer as the fields are archived, tag(), begin_object(),
+    begin_array() and their counterparts emit the structure. No intermediate object tree is built.
+    Blobs are hex-encoded strings, integers are numbers, messages are objects,
+    containers and tuples are arrays and variants are {"variant field name": value} objects.
+
+    Reading consumes the tokens in the same order, the tags have to match the fields.
+    """
 
-    def __init__(self, iobj, writing=True, **kwargs):
+    def __init__(self, iobj, writing=True, indent=None, **kwargs):
         super().__init__(iobj, writing, **kwargs)
+        self.indent = indent
+        self.out = bytearray()
+        self.tokens = JsonTokenReader(iobj) if not writing else None
+        self.stack = []  # open objects and arrays, [is object, has items]
+        self.msgs = []  # messages with custom serialization
+
+    def data_left(self):
+        """
+        Not known, the tokenizer reads the JSON text ahead
+        :return:
+        """
+        return None
+
+    async def flush(self):
+        """
+        Writes buffered JSON text to the writer
+        :return:
+        """
+        if self.out:
+            await self.iobj.awrite(self.out)
+            self.out = bytearray()
+
+    async def _emit(self, data):
+        self.out += data
+        if not self.stack or len(self.out) >= _FLUSH_SIZE:
+            await self.flush()
+
+    def _newline(self):
+        return b'\n' + b' ' * (self.indent * len(self.stack)) if self.indent else b''
+
+    async def _expect(self, punct):
+        kind, val = await self.tokens.next()
+        if kind != JsonToken.PUNCT or val != punct:
+            raise ValueError('Expected %r, got %r' % (punct, val))
+
+    async def _at_end(self, punct):
+        kind, val = await self.tokens.peek()
+        return kind == JsonToken.PUNCT and val == punct
+
+    async def _delimit(self):
+        top = self.stack[-1]
+        if top[1]:
+            if self.writing:
+                self.out += b', '
+            else:
+                await self._expect(b',')
+        top[1] = True
+
+    async def _value(self):
+        """
+        Array values are delimited, object values follow the tag
+        :return:
+        """
+        if self.stack and not self.stack[-1][0]:
+            await self._delimit()
+
+    async def _scalar(self, kind):
+        await self._value()
+        tkind, val = await self.tokens.next()
+        if tkind != kind:
+            raise ValueError('Unexpected JSON token: %r' % (val, ))
+        return val
+
+    async def _key(self):
+        """
+        Reads an object key
+        :return:
+        """
+        await self._delimit()
+        kind, val = await self.tokens.next()
+        if kind != JsonToken.STRING:
+            raise ValueError('Expected object key, got %r' % (val, ))
+        await self._expect(b':')
+        return unescape_json_str(val).decode('utf8')
+
+    async def tag(self, tag):
+        """
+        Object key
+        :param tag:
+        :return:
+        """
+        if self.writing:
+            await self._delimit()
+            self.out += b'%s"%s": ' % (self._newline(), escape_string_json(tag.encode('utf8')))
+        elif await self._key() != tag:
+            raise ValueError('Expected tag: %s' % tag)
+
+    async def begin_array(self):
+        await self._value()
+        self.stack.append([False, False])
+        if self.writing:
+            await self._emit(b'[')
+        else:
+            await self._expect(b'[')
+
+    async def end_array(self):
+        self.stack.pop()
+        if self.writing:
+            await self._emit(b']')
+        else:
+            await self._expect(b']')
+
+    async def begin_object(self):
+        await self._value()
+        self.stack.append([True, False])
+        if self.writing:
+            await self._emit(b'{')
+        else:
+            await self._expect(b'{')
+
+    async def end_object(self):
+        self.stack.pop()
+        if self.writing:
+            await self._emit(self._newline() + b'}')
+        else:
+            await self._expect(b'}')
+
+    async def uvarint(self, elem):
+        if self.writing:
+            await self._value()
+            return await self._emit(b'%d' % elem)
+        else:
+            return await self._scalar(JsonToken.INT)
+
+    async def uint(self, elem, elem_type, params=None):
+        return await self.uvarint(elem)
+
+    async def unicode_type(self, elem):
+        if self.writing:
+            await self._value()
+            return await self._emit(b'"%s"' % escape_string_json(elem.encode('utf8')))
+        else:
+            fvalue = unescape_json_str(await self._scalar(JsonToken.STRING))
+            if self.limits is not None:
+                self.limits.check_blob(len(fvalue))
+            return str(fvalue, 'utf8')
+
+    async def blob(self, elem=None, elem_type=None, params=None):
+        elem_type = elem_type if elem_type else elem.__class__
+        if hasattr(elem_type, 'serialize_archive'):
+            return await super().blob(elem=elem, elem_type=elem_type, params=params)
+
+        if self.writing:
+            elem_is_blob = isinstance(elem, x.BlobType)
+            elem_params = elem if elem_is_blob else elem_type
+            data = getattr(elem, x.BlobType.DATA_ATTR) if elem_is_blob else elem
+            if elem_params.FIX_SIZE and len(data) != elem_params.SIZE:
+                raise ValueError('Fixed size blob has not defined size: %s' % elem_params.SIZE)
+            await self._value()
+            return await self._emit(b'"%s"' % binascii.hexlify(bytes(data)))
+
+        fvalue = await self._scalar(JsonToken.STRING)
+        if self.limits is not None:
+            self.limits.check_blob(len(fvalue) // 2)
+        fvalue = bytearray(binascii.unhexlify(fvalue))
+        if elem_type.FIX_SIZE and len(fvalue) != elem_type.SIZE:
+            raise ValueError('Fixed size blob has not defined size: %s' % elem_type.SIZE)
+
+        if elem is None:
+            return fvalue
+        elif isinstance(elem, x.BlobType):
+            setattr(elem, elem_type.DATA_ATTR, fvalue)
+            return elem
+        else:
+            elem.extend(fvalue)
+        return elem
+
+    async def container(self, container=None, container_type=None, params=None):
+        if hasattr(container_type, 'serialize_archive'):
+            return await super().container(container=container, container_type=container_type, params=params)
+
+        elem_type = x.container_elem_type(container_type, params)
+        eparams = params[1:] if params else None
+        await self.begin_array()
+
+        if self.writing:
+            if container_type.FIX_SIZE and len(container) != container_type.SIZE:
+                raise ValueError('Fixed size container has not defined size: %s' % container_type.SIZE)
+            for elem in container:
+                await self.field(elem, elem_type, eparams)
+            return await self.end_array()
+
+        res = container if container else []
+        c_len = 0
+        while not await self._at_end(b']'):
+            if self.limits is not None:
+                self.limits.check_container(c_len + 1)
+            if c_len < len(res):
+                await self.field(x.eref(res, c_len), elem_type, eparams)
+            else:
+                res.append(await self.field(None, elem_type, eparams))
+            c_len += 1
+
+        if c_len != len(res) or (container_type.FIX_SIZE and c_len != container_type.SIZE):
+            raise ValueError('Size mismatch')
+        await self.end_array()
+        return res
+
+    async def container_size(self, container_len=None, container_type=None, params=None):
+        raise ValueError('Not supported')
+
+    async def container_val(self, elem, container_type, params=None):
+        raise ValueError('Not supported')
+
+    async def tuple(self, elem=None, elem_type=None, params=None):
+        if hasattr(elem_type, 'serialize_archive'):
+            return await super().tuple(elem=elem, elem_type=elem_type, params=params)
+
+        elem_fields = params[0] if params else None
+        if elem_fields is None:
+            elem_fields = elem_type.MFIELDS
+        eparams = params[1:] if params else None
+
+        if self.writing and len(elem) != len(elem_fields):
+            raise ValueError('Fixed size tuple has not defined size: %s' % len(elem_fields))
+
+        await self.begin_array()
+        res = elem if elem or self.writing else []
+        for i in range(len(elem_fields)):
+            if self.writing:
+                await self.field(elem[i], elem_fields[i], eparams)
+            elif elem:
+                await self.field(x.eref(res, i), elem_fields[i], eparams)
+            else:
+                res.append(await self.field(None, elem_fields[i], eparams))
+        await self.end_array()
+        return res if not self.writing else None
+
+    async def variant(self, elem=None, elem_type=None, params=None):
+        elem_type = elem_type if elem_type else elem.__class__
+        if hasattr(elem_type, 'serialize_archive'):
+            return await super().variant(elem=elem, elem_type=elem_type, params=params)
+
+        is_wrapped = isinstance(elem, x.VariantType) or elem_type.WRAPS_VALUE
+        await self.begin_object()
+        if self.writing:
+            if is_wrapped:
+                fdef = [fld for fld in elem_type.MFIELDS if fld[0] == elem.variant_elem][0]
+                fvalue = getattr(elem, elem.variant_elem)
+            else:
+                fdef = elem_type.find_fdef(elem_type.MFIELDS, elem)
+                fvalue = elem
+            await self.tag(fdef[0])
+            await self.field(fvalue, fdef[1], fdef[2:])
+            return await self.end_object()
+
+        fname = await self._key()
+        for field in elem_type.MFIELDS:
+            if field[0] != fname:
+                continue
+            fvalue = await self.field(None, field[1], field[2:])
+            await self.end_object()
+            if not is_wrapped:
+                return fvalue
+
+            elem = elem_type() if elem is None else elem
+            elem.set_variant(field[0], fvalue)
+            return elem
+        raise ValueError('Unknown variant: %s' % fname)
+
+    async def message(self, msg, msg_type=None):
+        """
+        Message is archived as an object.
+        Message archived again from its own serialize_archive() is inlined to the open object,
+        as the transaction prefix fields in the transaction.
+        :param msg:
+        :param msg_type:
+        :return:
+        """
+        elem_type = msg_type if msg_type is not None else msg.__class__
+        msg = elem_type() if msg is None else msg
+        inline = self.msgs and self.msgs[-1] is msg
+        if not inline:
+            await self.begin_object()
+
+        if hasattr(elem_type, 'serialize_archive') and not inline:
+            self.msgs.append(msg)
+            await msg.serialize_archive(self)
+            self.msgs.pop()
+        else:
+            for field in elem_type.MFIELDS:
+                await self.message_field(msg, field)
+
+        if not inline:
+            await self.end_object()
+        return msg
+
+    async def message_field(self, msg, field, fvalue=None):
+        fname, ftype, params = field[0], field[1], field[2:]
+        await self.tag(fname)
+        if self.writing:
+            fvalue = getattr(msg, fname, None) if fvalue is None else fvalue
+            await self.field(fvalue, ftype, params)
+        else:
+            await self.field(x.eref(msg, fname), ftype, params)
+
+
+class ObjLoader(object):
+    """
+    Loads messages from the JSON object representation, as produced by xmrobj + json_dumps().
+    Message fields are filled directly as the tokens arrive, driven by MFIELDS,
+    the JSON tree is not built.
+
+    Object keys may come in any order, unknown keys are skipped, missing fields are left untouched.
+    """
+
+    def __init__(self, tokens, limits=None):
+        self.tokens = tokens
+        self.limits = limits.new_state() if limits is not None else None
+
+    async def _expect(self, punct):
+        kind, val = await self.tokens.next()
+        if kind != JsonToken.PUNCT or val != punct:
+            raise ValueError('Expected %r, got %r' % (punct, val))
+
+    async def _next_item(self, close, idx):
+        """
+        Consumes the delimiter, returns False at the end of the object / array
+        :param close:
+        :param idx:
+        :return:
+        """
+        kind, val = await self.tokens.peek()
+        if kind == JsonToken.PUNCT and val == close:
+            await self.tokens.next()
+            return False
+        if idx:
+            await self._expect(b',')
+        return True
+
+    async def _key(self):
+        kind, val = await self.tokens.next()
+        if kind != JsonToken.STRING:
+            raise ValueError('Expected object key, got %r' % (val, ))
+        await self._expect(b':')
+        return unescape_json_str(val).decode('utf8')
+
+    async def skip(self):
+        """
+        Skips one JSON value
+        :return:
+        """
+        kind, val = await self.tokens.next()
+        if kind != JsonToken.PUNCT:
+            return
+        if val not in (b'{', b'['):
+            raise ValueError('Unexpected JSON token: %r' % (val, ))
+
+        close = b'}' if val == b'{' else b']'
+        idx = 0
+        while await self._next_item(close, idx):
+            if close == b'}':
+                await self._key()
+            await self.skip()
+            idx += 1
+
+    async def field(self, elem_type, params=None, elem=None):
+        """
+        Loads the value of the given type, elem is the existing value to load into
+        :param elem_type:
+        :param params:
+        :param elem:
+        :return:
+        """
+        kind, val = await self.tokens.next()
+        if kind == JsonToken.LITERAL and val == b'null':
+            return None
+
+        if issubclass(elem_type, (x.UVarintType, x.IntType)):
+            if kind == JsonToken.LITERAL:
+                return val == b'true'
+            elif kind != JsonToken.INT:
+                raise ValueError('Unexpected JSON token: %r' % (val, ))
+            return val
+
+        elif issubclass(elem_type, (x.BlobType, x.UnicodeType)):
+            if kind != JsonToken.STRING:
+                raise ValueError('Unexpected JSON token: %r' % (val, ))
+            if issubclass(elem_type, x.UnicodeType):
+                val = unescape_json_str(val)
+            if self.limits is not None:
+                self.limits.check_blob(len(val) // 2 if issubclass(elem_type, x.BlobType) else len(val))
+            return bytearray.fromhex(val.decode('ascii')) if issubclass(elem_type, x.BlobType) else str(val, 'utf8')
+
+        is_array = issubclass(elem_type, (x.ContainerType, x.TupleType))
+        if kind != JsonToken.PUNCT or val != (b'[' if is_array else b'{'):
+            raise ValueError('Unexpected JSON token: %r' % (val, ))
+
+        limits = self.limits
+        if limits is not None:
+            limits.enter()
+
+        try:
+            if issubclass(elem_type, x.VariantType):
+                fvalue = await self.variant(elem_type, elem)
+            elif is_array:
+                fvalue = await self.container(elem_type, params, elem)
+            elif issubclass(elem_type, x.MessageType):
+                fvalue = await self.message(elem_type, elem)
+            else:
+                raise TypeError
+        finally:
+            if limits is not None:
+                limits.leave()
+        return fvalue
+
+    async def variant(self, elem_type, elem=None):
+        """
+        Variant object, the opening brace is already consumed
+        :param elem_type:
+        :param elem:
+        :return:
+        """
+        fname = await self._key()
+        field = [fld for fld in elem_type.MFIELDS if fld[0] == fname]
+        if not field:
+            raise ValueError('Unknown tag: %s' % fname)
+
+        fvalue = await self.field(field[0][1], field[0][2:])
+        await self._expect(b'}')
+        if not elem_type.WRAPS_VALUE:
+            return fvalue
+
+        elem = elem_type() if elem is None else elem
+        elem.set_variant(fname, fvalue)
+        return elem
+
+    async def container(self, elem_type, params=None, elem=None):
+        """
+        Container or tuple array, the opening bracket is already consumed
+        :param elem_type:
+        :param params:
+        :param elem:
+        :return:
+        """
+        if issubclass(elem_type, x.TupleType):
+            elem_fields = params[0] if params else elem_type.MFIELDS
+        else:
+            elem_fields = None
+            etype = x.container_elem_type(elem_type, params)
+        eparams = params[1:] if params else None
+
+        if not elem and elem_fields is None and issubclass(etype, (x.UVarintType, x.IntType, x.BlobType)):
+            return await self.scalar_array(etype)
+
+        res = elem if elem else []
+        idx = 0
+        while await self._next_item(b']', idx):
+            if self.limits is not None:
+                self.limits.check_container(idx + 1)
+            ftype = elem_fields[idx] if elem_fields is not None else etype
+            if idx < len(res):
+                res[idx] = await self.field(ftype, eparams, res[idx])
+            else:
+                res.append(await self.field(ftype, eparams))
+            idx += 1
+        del res[idx:]
+        return res
+
+    async def scalar_array(self, elem_type):
+        """
+        Array of integers or blobs, the opening bracket is already consumed.
+        Parsed at once, the values cannot contain the closing bracket.
+        :param elem_type:
+        :return:
+        """
+        raw = await self.tokens.raw_until(b']')
+        is_blob = issubclass(elem_type, x.BlobType)
+        if (_JSON_HEX_ARRAY if is_blob else _JSON_INT_ARRAY).fullmatch(raw) is None:
+            raise ValueError('Invalid JSON array: %r' % bytes(raw[:16]))
+
+        res = _JSON_HEX.findall(raw) if is_blob else _JSON_INT.findall(raw)
+        if self.limits is not None:
+            self.limits.check_container(len(res))
+            if is_blob:
+                for val in res:
+                    self.limits.check_blob(len(val) // 2)
+        if is_blob:
+            return [bytearray.fromhex(val.decode('ascii')) for val in res]
+        return [int(val) for val in res]
+
+    async def message(self, msg_type, msg=None):
+        """
+        Message object, the opening brace is already consumed
+        :param msg_type:
+        :param msg:
+        :return:
+        """
+        msg = msg_type() if msg is None else msg
+        index = msg_type._field_index()
+
+        idx = 0
+        while await self._next_item(b'}', idx):
+            field = index.get(await self._key())
+            if field is None:
+                await self.skip()
+            else:
+                fname = field[0]
+                setattr(msg, fname, await self.field(field[1], field[2:], getattr(msg, fname, None)))
+            idx += 1
+        return msg
+
+
+async def load_message(reader, msg_type, msg=None, limits=None):
+    """
+    Loads the message from the JSON object representation read from the reader
+    :param reader:
+    :param msg_type:
+    :param msg:
+    :param limits:
+    :return:
+    """
+    return await ObjLoader(JsonTokenReader(reader), limits=limits).field(msg_type, elem=msg)
+
+
+def loads_message(data, msg_type, msg=None, limits=None):
+    """
+    Loads the message from the JSON object representation
+    :param data: JSON bytes
+    :param msg_type:
+    :param msg:
+    :param limits:
+    :return:
+    """
+    if isinstance(data, str):
+        data = data.encode('utf8')
+    loader = ObjLoader(JsonTokenReader(None, data=data), limits=limits)
+    return helpers.run_sync(loader.field(msg_type, elem=msg))
+
+
+async def dump_json(writer, msg, msg_type=None, **kwargs):
+    """
+    Streams the message to JSON
+    :param writer:
+    :param msg:
+    :param msg_type:
+    :param kwargs: archive arguments
+    :return:
+    """
+    ar = Archive(writer, True, **kwargs)
+    return await ar.message(msg, msg_type=msg_type)
+
+
+async def load_json(reader, msg_type, msg=None, **kwargs):
+    """
+    Loads the message from JSON streamed by dump_json()
+    :param reader:
+    :param msg_type:
+    :param msg:
+    :param kwargs: archive arguments
+    :return:
+    """
+    ar = Archive(reader, False, **kwargs)
+    return await ar.message(msg, msg_type=msg_type)
 
 
 class AutoJSONEncoder(json.JSONEncoder):
@@ -110,20 +840,178 @@ class AutoJSONEncoder(json.JSONEncoder):
             return self.default_classic(obj)
 
     def default_classic(self, o):
-        if isinstance(o, set):
+        if isinstance(o, (set, array.array)):
             return list(o)
-        elif isinstance(o, bytes):
+        elif isinstance(o, (bytes, bytearray, memoryview)):
             return str(o, 'utf8')
         else:
             return super(AutoJSONEncoder, self).default(o)
 
 
-def json_dumps(obj, **kwargs):
+class HexJSONEncoder(AutoJSONEncoder):
+    """
+    JSON encoder hex-encoding the blobs as they are emitted
+    """
+    def default_classic(self, o):
+        if isinstance(o, (bytes, bytearray, memoryview)):
+            return binascii.hexlify(o).decode('ascii')
+        return super(HexJSONEncoder, self).default_classic(o)
+
+
+_JSON_SCALARS = frozenset([str, int, float, bool, type(None)])
+_JSON_BLOBS = (bytes, bytearray, memoryview)
+
+
+def to_native(obj, hexlify=False):
     """
-    Uses auto encoder to serialize the object
+    Converts the object tree to JSON native types in one pass, as AutoJSONEncoder / HexJSONEncoder would.
+    Models are replaced by to_json() values, blobs by strings, sets and arrays by lists.
     :param obj:
-    :param kwargs:
+    :param hexlify: blobs are hex-encoded
     :return:
     """
-    return json.dumps(obj, cls=AutoJSONEncoder, **kwargs)
+    tp = type(obj)
+    if tp in _JSON_SCALARS:
+        return obj
+
+    elif tp is dict or tp is collections.OrderedDict:
+        res = {}
+        for k, v in obj.items():
+            res[k] = v if type(v) in _JSON_SCALARS else to_native(v, hexlify)
+        return res
+
+    elif tp is list or tp is tuple:
+        return [v if type(v) in _JSON_SCALARS else to_native(v, hexlify) for v in obj]
+
+    elif tp in _JSON_BLOBS:
+        return bytes(obj).hex() if hexlify else str(obj, 'utf8')
+
+    to_json = getattr(obj, 'to_json', None)
+    if to_json is not None:
+        return to_native(to_json(), hexlify)
+    elif isinstance(obj, (set, array.array, list, tuple)):
+        return [to_native(v, hexlify) for v in obj]
+    elif isinstance(obj, dict):
+        return {k: to_native(v, hexlify) for k, v in obj.items()}
+    elif isinstance(obj, (str, int, float)):
+        return obj
+    raise TypeError('Object of type %s is not JSON serializable' % tp.__name__)
+
+
+class JsonBackend(object):
+    """
+    JSON encoder backend, the standard library json module.
+    Other backends encode the to_native() pre-pass result, no Python callbacks per node.
+    Backends are optional and opt-in, backend='auto' picks the fastest importable one, see get_json_backend().
+    The standard library stays the default, other backends may differ in separators and non-ASCII escaping.
+    """
+    name = 'json'
+    module = json
+    KWARGS = None
+
+    def available(self):
+        return self.module is not None
+
+    def supports(self, kwargs):
+        """
+        Returns true if the backend honours the json.dumps() arguments
+        :param kwargs:
+        :return:
+        """
+        return self.KWARGS is None or (set(kwargs.keys()) <= self.KWARGS and kwargs.get('indent') in (None, 2))
+
+    def dumps(self, obj, hexlify=False, **kwargs):
+        return json.dumps(obj, cls=AutoJSONEncoder if not hexlify else HexJSONEncoder, **kwargs)
+
+
+class OrjsonBackend(JsonBackend):
+    """
+    orjson traverses the native types itself, to_native() is called only on the models and blobs
+    """
+    name = 'orjson'
+    module = orjson
+    KWARGS = {'indent', 'sort_keys'}
+
+    def dumps(self, obj, hexlify=False, indent=None, sort_keys=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=lambda o: to_native(o, hexlify), option=option).decode('utf8')
+
 
+class RapidjsonBackend(JsonBackend):
+    name = 'rapidjson'
+    module = rapidjson
+    KWARGS = {'indent', 'sort_keys', 'ensure_ascii'}
+
+    def dumps(self, obj, hexlify=False, **kwargs):
+        return rapidjson.dumps(to_native(obj, hexlify), **kwargs)
+
+
+class UjsonBackend(JsonBackend):
+    name = 'ujson'
+    module = ujson
+    KWARGS = {'indent', 'sort_keys', 'ensure_ascii'}
+
+    def dumps(self, obj, hexlify=False, indent=None, **kwargs):
+        return ujson.dumps(to_native(obj, hexlify), indent=indent or 0, escape_forward_slashes=False, **kwargs)
+
+
+JSON_BACKENDS = collections.OrderedDict([
+    (OrjsonBackend.name, OrjsonBackend()),
+    (RapidjsonBackend.name, RapidjsonBackend()),
+    (UjsonBackend.name, UjsonBackend()),
+    (JsonBackend.name, JsonBackend()),
+])
+
+_json_backend = None
+
+
+def get_json_backend(name=None):
+    """
+    Returns the JSON backend by name, auto is the fastest importable one.
+    Without the name the default set by set_json_backend(), the standard library if not set.
+    :param name:
+    :return:
+    """
+    if name is None:
+        return _json_backend if _json_backend is not None else JSON_BACKENDS[JsonBackend.name]
+
+    if name == 'auto':
+        return [bck for bck in JSON_BACKENDS.values() if bck.available()][0]
+
+    backend = JSON_BACKENDS.get(name)
+    if backend is None or not backend.available():
+        raise ValueError('JSON backend not available: %s' % name)
+    return backend
+
+
+def set_json_backend(name=None):
+    """
+    Sets the default JSON backend, auto for the fastest one, None restores the standard library
+    :param name:
+    :return:
+    """
+    global _json_backend
+    _json_backend = get_json_backend(name) if name is not None else None
+
+
+def json_dumps(obj, hexlify=False, backend=None, **kwargs):
+    """
+    Uses auto encoder to serialize the object.
+    Falls back to the standard library if the backend does not support the arguments or the values.
+    :param obj:
+    :param hexlify: blobs are hex-encoded
+    :param backend: backend name, see JSON_BACKENDS, auto for the fastest one
+    :param kwargs: json.dumps() arguments
+    :return:
+    """
+    bck = get_json_backend(backend)
+    if bck.KWARGS is not None and bck.supports(kwargs):
+        try:
+            return bck.dumps(obj, hexlify=hexlify, **kwargs)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return JSON_BACKENDS[JsonBackend.name].dumps(obj, hexlify=hexlify, **kwargs)
@@ -3,12 +3,15 @@
 '''
 Monero serialization to object representation.
 
-Note: This is not optimized for memory usage. No streaming support.
-Used for debugging.
+Note: No streaming support.
+
+Blobs are uppercase hex bytes, messages are dicts, variants are {variant field name: value}.
+Conversion functions are compiled once per (type, params) to a plan, see dump_plan() and load_plan().
 '''
 
-import base64
+import binascii
 import collections
+import sys
 
 from . import xmrserialize as x
 from .xmrserialize import eref, get_elem, set_elem
@@ -67,6 +70,206 @@ class Archive(x.Archive):
         """
 
 
+# Dicts keep the insertion order since 3.7
+_OBJ_DICT = dict if sys.version_info >= (3, 7) else collections.OrderedDict
+
+_DUMP_PLANS = {}
+_LOAD_PLANS = {}
+_MSG_DUMP_FIELDS = {}
+_MSG_LOAD_FIELDS = {}
+
+
+def _plan_key(elem_type, params):
+    return elem_type, tuple(params) if params else ()
+
+
+def dump_plan(elem_type, params=None):
+    """
+    Returns cached function dumping the element of the given type to the popo representation
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    key = _plan_key(elem_type, params)
+    plan = _DUMP_PLANS.get(key)
+    if plan is None:
+        plan = _compile_dump(*key)
+        _DUMP_PLANS[key] = plan
+    return plan
+
+
+def load_plan(elem_type, params=None):
+    """
+    Returns cached function loading the element of the given type from the popo representation.
+    The function is called as plan(obj, elem=None), elem is the existing element to load into.
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    key = _plan_key(elem_type, params)
+    plan = _LOAD_PLANS.get(key)
+    if plan is None:
+        plan = _compile_load(*key)
+        _LOAD_PLANS[key] = plan
+    return plan
+
+
+def _message_dump_fields(msg_type):
+    fields = _MSG_DUMP_FIELDS.get(msg_type)
+    if fields is None:
+        fields = [(fld[0], dump_plan(fld[1], fld[2:])) for fld in msg_type.MFIELDS]
+        _MSG_DUMP_FIELDS[msg_type] = fields
+    return fields
+
+
+def _message_load_fields(msg_type):
+    fields = _MSG_LOAD_FIELDS.get(msg_type)
+    if fields is None:
+        fields = [(fld[0], load_plan(fld[1], fld[2:])) for fld in msg_type.MFIELDS]
+        _MSG_LOAD_FIELDS[msg_type] = fields
+    return fields
+
+
+def _dump_value(elem):
+    return elem
+
+
+def _load_value(obj, elem=None):
+    return obj
+
+
+def _dump_blob(elem):
+    data = getattr(elem, x.BlobType.DATA_ATTR) if isinstance(elem, x.BlobType) else elem
+    if data is None or len(data) == 0:
+        return b''
+    if isinstance(data, (bytes, bytearray)):
+        return binascii.hexlify(data).upper()  # as base64.b16encode
+    elif isinstance(data, list):
+        return binascii.hexlify(bytes(data)).upper()
+    else:
+        raise ValueError('Unknown blob type')
+
+
+def _load_blob(obj, elem=None):
+    if obj is None:
+        return b''
+    if isinstance(obj, (bytes, bytearray)):
+        obj = obj.decode('ascii')
+    return bytearray.fromhex(obj)
+
+
+def _dump_message(elem):
+    if elem is None:
+        return None
+    res = _OBJ_DICT()
+    for fname, plan in _message_dump_fields(elem.__class__):
+        res[fname] = plan(getattr(elem, fname, None))
+    return res
+
+
+def _compile_dump(elem_type, params):
+    if issubclass(elem_type, (x.UVarintType, x.IntType, x.UnicodeType)):
+        return _dump_value
+
+    elif issubclass(elem_type, x.BlobType):
+        return _dump_blob
+
+    elif issubclass(elem_type, x.VariantType):
+        fields = {fld[0]: fld for fld in elem_type.MFIELDS}
+
+        def dump_variant(elem):
+            if elem is None:
+                return None
+            if isinstance(elem, x.VariantType) or elem_type.WRAPS_VALUE:
+                fdef = fields[elem.variant_elem]
+                fvalue = getattr(elem, elem.variant_elem)
+            else:
+                fdef = elem_type.find_fdef(elem_type.MFIELDS, elem)
+                fvalue = elem
+            return {fdef[0]: dump_plan(fdef[1], fdef[2:])(fvalue)}
+        return dump_variant
+
+    elif issubclass(elem_type, (x.ContainerType, x.TupleType)):
+        if issubclass(elem_type, x.TupleType):
+            elem_fields = params[0] if params else elem_type.MFIELDS
+            eplans = [dump_plan(ftype, params[1:]) for ftype in elem_fields]
+            return lambda elem: None if elem is None else [plan(e) for plan, e in zip(eplans, elem)]
+
+        eplan = dump_plan(x.container_elem_type(elem_type, params), params[1:])
+        if eplan is _dump_value:
+            return lambda elem: None if elem is None else list(elem)
+        return lambda elem: None if elem is None else [eplan(e) for e in elem]
+
+    elif issubclass(elem_type, x.MessageType):
+        return _dump_message
+
+    else:
+        raise TypeError
+
+
+def _compile_load(elem_type, params):
+    if issubclass(elem_type, (x.UVarintType, x.IntType, x.UnicodeType)):
+        return _load_value
+
+    elif issubclass(elem_type, x.BlobType):
+        return _load_blob
+
+    elif issubclass(elem_type, x.VariantType):
+        fields = {fld[0]: fld for fld in elem_type.MFIELDS}
+
+        def load_variant(obj, elem=None):
+            if obj is None:
+                return None
+            fname = next(iter(obj))
+            field = fields.get(fname)
+            if field is None:
+                raise ValueError('Unknown tag: %s' % fname)
+
+            fvalue = load_plan(field[1], field[2:])(obj[fname])
+            if not elem_type.WRAPS_VALUE:
+                return fvalue
+            elem = elem_type() if elem is None else elem
+            elem.set_variant(fname, fvalue)
+            return elem
+        return load_variant
+
+    elif issubclass(elem_type, (x.ContainerType, x.TupleType)):
+        if issubclass(elem_type, x.TupleType):
+            elem_fields = params[0] if params else elem_type.MFIELDS
+            eplans = [load_plan(ftype, params[1:]) for ftype in elem_fields]
+        else:
+            eplan = load_plan(x.container_elem_type(elem_type, params), params[1:])
+            eplans = None
+
+        def load_container(obj, elem=None):
+            if obj is None:
+                return None
+            plans = eplans if eplans is not None else [eplan] * len(obj)
+            if not elem:
+                return [plan(e) for plan, e in zip(plans, obj)]
+            del elem[len(obj):]
+            for i, e in enumerate(obj):
+                if i < len(elem):
+                    elem[i] = plans[i](e, elem[i])
+                else:
+                    elem.append(plans[i](e))
+            return elem
+        return load_container
+
+    elif issubclass(elem_type, x.MessageType):
+        def load_message(obj, elem=None):
+            if obj is None:
+                return None
+            msg = elem_type() if elem is None else elem
+            for fname, plan in _message_load_fields(elem_type):
+                setattr(msg, fname, plan(obj[fname], getattr(msg, fname, None)))
+            return msg
+        return load_message
+
+    else:
+        raise TypeError
+
+
 async def dump_blob(elem, elem_type=None):
     """
     Dumps blob message.
@@ -78,14 +281,7 @@ async def dump_blob(elem, elem_type=None):
     :param params:
     :return:
     """
-    elem_is_blob = isinstance(elem, x.BlobType)
-    data = getattr(elem, x.BlobType.DATA_ATTR) if elem_is_blob else elem
-    if data is None or len(data) == 0:
-        return b''
-    if isinstance(data, (bytes, bytearray, list)):
-        return base64.b16encode(bytes(data))
-    else:
-        raise ValueError('Unknown blob type')
+    return _dump_blob(elem)
 
 
 async def load_blob(elem, elem_type=None):
@@ -94,9 +290,7 @@ async def load_blob(elem, elem_type=None):
     :param elem:
     :return:
     """
-    if elem is None:
-        return b''
-    return bytearray(base64.b16decode(elem))
+    return _load_blob(elem)
 
 
 async def dump_container(obj, container, container_type, params=None, field_archiver=None):
@@ -110,14 +304,14 @@ async def dump_container(obj, container, container_type, params=None, field_arch
     :param field_archiver:
     :return:
     """
-    field_archiver = field_archiver if field_archiver else dump_field
-    elem_type = params[0] if params else None
-    if elem_type is None:
-        elem_type = container_type.ELEM_TYPE
-
-    obj = [] if obj is None else get_elem(obj)
     if container is None:
         return None
+    if field_archiver is None and obj is None:
+        return dump_plan(container_type, params)(container)
+
+    field_archiver = field_archiver if field_archiver else dump_field
+    elem_type = x.container_elem_type(container_type, params)
+    obj = [] if obj is None else get_elem(obj)
     for elem in container:
         fvalue = await field_archiver(None, elem, elem_type, params[1:] if params else None)
         obj.append(fvalue)
@@ -136,17 +330,14 @@ async def load_container(obj, container_type, params=None, container=None, field
     :param field_archiver:
     :return:
     """
-    field_archiver = field_archiver if field_archiver else load_field
+    if field_archiver is None:
+        return load_plan(container_type, params)(obj, container)
     if obj is None:
         return None
 
-    c_len = len(obj)
-    elem_type = params[0] if params else None
-    if elem_type is None:
-        elem_type = container_type.ELEM_TYPE
-
+    elem_type = x.container_elem_type(container_type, params)
     res = container if container else []
-    for i in range(c_len):
+    for i in range(len(obj)):
         fvalue = await field_archiver(obj[i], elem_type,
                                       params[1:] if params else None,
                                       eref(res, i) if container else None)
@@ -167,7 +358,9 @@ async def dump_message_field(obj, msg, field, field_archiver=None):
     """
     fname, ftype, params = field[0], field[1], field[2:]
     fvalue = getattr(msg, fname, None)
-    field_archiver = field_archiver if field_archiver else dump_field
+    if field_archiver is None:
+        obj[fname] = dump_plan(ftype, params)(fvalue)
+        return obj[fname]
     return await field_archiver(eref(obj, fname, True), fvalue, ftype, params)
 
 
@@ -183,7 +376,8 @@ async def load_message_field(obj, msg, field, field_archiver=None):
     :return:
     """
     fname, ftype, params = field[0], field[1], field[2:]
-    field_archiver = field_archiver if field_archiver else load_field
+    if field_archiver is None:
+        return set_elem(eref(msg, fname), load_plan(ftype, params)(obj[fname], getattr(msg, fname, None)))
     await field_archiver(obj[fname], ftype, params, eref(msg, fname))
 
 
@@ -197,11 +391,11 @@ async def dump_message(obj, msg, field_archiver=None):
     :param field_archiver:
     :return:
     """
-    mtype = msg.__class__
-    fields = mtype.MFIELDS
+    if obj is None and field_archiver is None:
+        return _dump_message(msg)
 
-    obj = collections.OrderedDict() if obj is None else get_elem(obj)
-    for field in fields:
+    obj = _OBJ_DICT() if obj is None else get_elem(obj)
+    for field in msg.__class__.MFIELDS:
         await dump_message_field(obj, msg=msg, field=field, field_archiver=field_archiver)
     return obj
 
@@ -217,12 +411,13 @@ async def load_message(obj, msg_type, msg=None, field_archiver=None):
     :param field_archiver:
     :return:
     """
-    msg = msg_type() if msg is None else msg
+    msg_type = msg_type if msg_type else msg.__class__
+    if field_archiver is None:
+        return load_plan(msg_type)(obj, msg)
 
-    fields = msg_type.MFIELDS if msg_type else msg.__class__.MFIELDS
-    for field in fields:
+    msg = msg_type() if msg is None else msg
+    for field in msg_type.MFIELDS:
         await load_message_field(obj, msg, field, field_archiver=field_archiver)
-
     return msg
 
 
@@ -237,7 +432,10 @@ async def dump_variant(obj, elem, elem_type=None, params=None, field_archiver=No
     :param field_archiver:
     :return:
     """
-    field_archiver = field_archiver if field_archiver else dump_field
+    elem_type = elem_type if elem_type else elem.__class__
+    if field_archiver is None:
+        return dump_plan(elem_type, params)(elem)
+
     if isinstance(elem, x.VariantType) or elem_type.WRAPS_VALUE:
         return {
             elem.variant_elem: await field_archiver(None, getattr(elem, elem.variant_elem), elem.variant_elem_type)
@@ -261,13 +459,15 @@ async def load_variant(obj, elem, elem_type=None, params=None, field_archiver=No
     :param wrapped:
     :return:
     """
-    field_archiver = field_archiver if field_archiver else load_field
     is_wrapped = elem_type.WRAPS_VALUE if wrapped is None else wrapped
+    if field_archiver is None and is_wrapped == elem_type.WRAPS_VALUE:
+        return load_plan(elem_type, params)(obj, elem)
 
+    field_archiver = field_archiver if field_archiver else load_field
     if is_wrapped:
         elem = elem_type() if elem is None else elem
 
-    fname = list(obj.keys())[0]
+    fname = next(iter(obj))
     for field in elem_type.MFIELDS:
         if field[0] != fname:
             continue
@@ -291,26 +491,9 @@ async def dump_field(obj, elem, elem_type, params=None):
     :param params:
     :return:
     """
-    if isinstance(elem, (int, bool)) or issubclass(elem_type, x.UVarintType) or issubclass(elem_type, x.IntType):
+    if isinstance(elem, (int, bool, str)):
         return set_elem(obj, elem)
-
-    elif issubclass(elem_type, x.BlobType) or isinstance(obj, bytes) or isinstance(obj, bytearray):
-        return set_elem(obj, await dump_blob(elem))
-
-    elif issubclass(elem_type, x.UnicodeType) or isinstance(elem, str):
-        return set_elem(obj, elem)
-
-    elif issubclass(elem_type, x.VariantType):
-        return set_elem(obj, await dump_variant(None, elem, elem_type, params))
-
-    elif issubclass(elem_type, x.ContainerType):  # container ~ simple list
-        return set_elem(obj, await dump_container(None, elem, elem_type, params))
-
-    elif issubclass(elem_type, x.MessageType):
-        return set_elem(obj, await dump_message(None, elem))
-
-    else:
-        raise TypeError
+    return set_elem(obj, dump_plan(elem_type, params)(elem))
 
 
 async def load_field(obj, elem_type, params=None, elem=None):
@@ -323,29 +506,6 @@ async def load_field(obj, elem_type, params=None, elem=None):
     :param elem:
     :return:
     """
-    if issubclass(elem_type, x.UVarintType) or issubclass(elem_type, x.IntType) or isinstance(obj, (int, bool)):
+    if isinstance(obj, (int, bool)):
         return set_elem(elem, obj)
-
-    elif issubclass(elem_type, x.BlobType):
-        fvalue = await load_blob(obj, elem_type)
-        return set_elem(elem, fvalue)
-
-    elif issubclass(elem_type, x.UnicodeType) or isinstance(elem, str):
-        return set_elem(elem, obj)
-
-    elif issubclass(elem_type, x.VariantType):
-        fvalue = await load_variant(obj, elem=get_elem(elem), elem_type=elem_type, params=params)
-        return set_elem(elem, fvalue)
-
-    elif issubclass(elem_type, x.ContainerType):  # container ~ simple list
-        fvalue = await load_container(obj, elem_type, params=params, container=get_elem(elem))
-        return set_elem(elem, fvalue)
-
-    elif issubclass(elem_type, x.MessageType):
-        fvalue = await load_message(obj, msg_type=elem_type, msg=get_elem(elem))
-        return set_elem(elem, fvalue)
-
-    else:
-        raise TypeError
-
-
+    return set_elem(elem, load_plan(elem_type, params)(obj, get_elem(elem)))
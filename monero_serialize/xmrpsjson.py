@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Streaming transcoding between the portable storage (xmrrpc) and JSON.
+
+Portable storage to JSON reads the entries from the AsyncReader and writes the JSON
+text right away, no sections or models are built. Output is buffered and flushed
+to the AsyncWriter in chunks.
+
+JSON to portable storage has to know the number of entries before a section or an array
+is written. The JSON text is tokenized twice, the first pass collects only the entry counts
+and array element types, the second pass writes the portable storage.
+
+Monero conventions are followed, i.e., blobs are JSON strings with raw bytes escaped
+by escape_string_json(), integers are numbers. Non-negative JSON integers are stored as uint64,
+negative as int64.
+
+>>> await ps_to_json(reader, writer)
+>>> await json_to_ps(json_data, writer)
+'''
+
+from . import xmrserialize as x
+from . import xmrrpc
+from .xmrrpc import SerializeType, SerializeTypeSize, SignedTypes
+from .xmrjson import escape_string_json, unescape_json_str, JsonToken, JsonTokenizer
+
+
+_FLUSH_SIZE = 64 * 1024
+
+
+def to_signed(val, width):
+    """
+    Two's complement of the unsigned integer
+    :param val:
+    :param width:
+    :return:
+    """
+    return val - (1 << (8 * width)) if val >= (1 << (8 * width - 1)) else val
+
+
+class PortableStorageToJson(object):
+    """
+    Reads portable storage, writes JSON
+    """
+
+    def __init__(self, reader, writer, limits=None, separators=(b',', b':')):
+        self.ar = xmrrpc.Archive(reader, False, modeled=False, limits=limits)
+        self.reader = reader
+        self.writer = writer
+        self.item_sep, self.key_sep = separators
+        self.out = bytearray()
+
+    async def flush(self):
+        if self.out:
+            await self.writer.awrite(self.out)
+            self.out = bytearray()
+
+    async def write(self, data):
+        self.out += data
+        if len(self.out) >= _FLUSH_SIZE:
+            await self.flush()
+
+    async def transcode(self):
+        """
+        Transcodes the whole storage
+        :return:
+        """
+        await self.ar.root()
+        await self.section()
+        await self.flush()
+
+    async def section(self):
+        limits = self.ar.limits
+        if limits is not None:
+            limits.enter()
+
+        try:
+            count = await xmrrpc.load_varint(self.reader)
+            if limits is not None:
+                limits.check_container(count)
+
+            await self.write(b'{')
+            for idx in range(count):
+                sec_name = await self.ar.section_name()
+                if idx:
+                    self.out += self.item_sep
+                self.out += b'"%s"%s' % (escape_string_json(sec_name.encode('ascii')), self.key_sep)
+
+                ent_type = await x.load_uint(self.reader, 1)
+                await self.entry(ent_type)
+
+            await self.write(b'}')
+        finally:
+            if limits is not None:
+                limits.leave()
+
+    async def entry(self, ent_type):
+        if ent_type in SerializeTypeSize:
+            width = SerializeTypeSize[ent_type]
+            fval = await x.load_uint(self.reader, width)
+            await self.write(self.scalar(fval, ent_type, width))
+        elif ent_type == SerializeType.STRING:
+            fval = await xmrrpc.load_string(self.reader, limits=self.ar.limits)
+            await self.write(b'"%s"' % escape_string_json(fval))
+        elif ent_type == SerializeType.OBJECT:
+            await self.section()
+        elif ent_type == SerializeType.ARRAY:
+            await self.array(await x.load_uint(self.reader, 1))
+        elif ent_type & SerializeType.ARRAY_FLAG:
+            await self.array(ent_type)
+        else:
+            raise ValueError('Unrecognized type 0x%x' % ent_type)
+
+    async def array(self, container_type):
+        container_type &= ~SerializeType.ARRAY_FLAG
+        limits = self.ar.limits
+        if limits is not None:
+            limits.enter()
+
+        try:
+            c_len = await xmrrpc.load_varint(self.reader)
+            if limits is not None:
+                limits.check_container(c_len)
+
+            await self.write(b'[')
+            if container_type in SerializeTypeSize:
+                width = SerializeTypeSize[container_type]
+                res = await xmrrpc.load_pod_array(self.reader, container_type, c_len)
+                await self.write(self.item_sep.join([self.scalar(i, container_type, width) for i in res]))
+
+            else:
+                for i in range(c_len):
+                    if i:
+                        self.out += self.item_sep
+                    await self.entry(container_type)
+
+            await self.write(b']')
+        finally:
+            if limits is not None:
+                limits.leave()
+
+    @staticmethod
+    def scalar(val, ent_type, width):
+        if ent_type == SerializeType.BOOL:
+            return b'true' if val else b'false'
+        elif ent_type in SignedTypes:
+            val = to_signed(val, width)
+        return b'%d' % val
+
+
+class JsonToPortableStorage(object):
+    """
+    Reads JSON text, writes portable storage
+    """
+
+    def __init__(self, data, writer):
+        self.data = data
+        self.writer = writer
+        self.out = bytearray()
+        self.containers = None
+
+    async def flush(self):
+        if self.out:
+            await self.writer.awrite(self.out)
+            self.out = bytearray()
+
+    async def transcode(self):
+        """
+        Transcodes the whole JSON document, the root has to be an object
+        :return:
+        """
+        self.containers = self.scan()
+        await self.emit()
+        await self.flush()
+
+    @staticmethod
+    def token_type(kind, val):
+        """
+        Portable storage type of the value token
+        :param kind:
+        :param val:
+        :return:
+        """
+        if kind == JsonToken.STRING:
+            return SerializeType.STRING
+        elif kind == JsonToken.INT:
+            return SerializeType.INT64 if val < 0 else SerializeType.UINT64
+        elif kind == JsonToken.LITERAL and val != b'null':
+            return SerializeType.BOOL
+        elif kind == JsonToken.PUNCT and val == b'{':
+            return SerializeType.OBJECT
+        elif kind == JsonToken.PUNCT and val == b'[':
+            return SerializeType.ARRAY
+        else:
+            raise ValueError('Unsupported JSON value: %r' % (val, ))
+
+    def scan(self):
+        """
+        First pass, collects [count, element type] of all objects and arrays in the order of opening
+        :return:
+        """
+        containers = []
+        stack = []
+        expect_key = False
+        for kind, val in JsonTokenizer(self.data):
+            if kind == JsonToken.PUNCT and val in (b'}', b']'):
+                stack.pop()
+                continue
+            elif kind == JsonToken.PUNCT and val in (b',', b':'):
+                expect_key = val == b','
+                continue
+
+            cur = containers[stack[-1]] if stack else None
+            if cur is not None and cur[2]:  # object
+                if expect_key:
+                    cur[0] += 1
+                    expect_key = False
+                    continue
+
+            elif cur is not None:  # array
+                ent_type = self.token_type(kind, val)
+                if cur[1] is None or cur[1] == ent_type:
+                    cur[1] = ent_type
+                elif {cur[1], ent_type} == {SerializeType.INT64, SerializeType.UINT64}:
+                    cur[1] = SerializeType.INT64
+                else:
+                    raise ValueError('Heterogeneous JSON array')
+                cur[0] += 1
+
+            if cur is None and (containers or val != b'{'):
+                raise ValueError('JSON root has to be a single object')
+
+            if kind == JsonToken.PUNCT and val in (b'{', b'['):
+                stack.append(len(containers))
+                containers.append([0, None, val == b'{'])
+                expect_key = True
+
+        if stack or not containers:
+            raise ValueError('Unexpected end of JSON')
+        return containers
+
+    async def emit(self):
+        """
+        Second pass, writes the portable storage
+        :return:
+        """
+        out = self.out
+        containers = iter(self.containers)
+        stack = []
+        expect_key = False
+
+        out += (xmrrpc.PortableStorageConsts.SIGNATUREA.to_bytes(4, 'little')
+                + xmrrpc.PortableStorageConsts.SIGNATUREB.to_bytes(4, 'little')
+                + xmrrpc.PortableStorageConsts.FORMAT_VER.to_bytes(1, 'little'))
+
+        for kind, val in JsonTokenizer(self.data):
+            if kind == JsonToken.PUNCT and val in (b'}', b']'):
+                stack.pop()
+                continue
+            elif kind == JsonToken.PUNCT and val in (b',', b':'):
+                expect_key = val == b','
+                continue
+
+            cur = stack[-1] if stack else None
+            if cur is not None and cur[2] and expect_key:
+                sec_name = unescape_json_str(val)
+                out += bytes([len(sec_name)]) + sec_name
+                expect_key = False
+                continue
+
+            if cur is None or cur[2]:  # object entry, typed
+                ent_type = self.token_type(kind, val) if cur is not None else None
+                if ent_type is not None and ent_type != SerializeType.ARRAY:
+                    out.append(ent_type)
+            else:
+                ent_type = cur[1]
+
+            if kind == JsonToken.PUNCT:
+                ncur = next(containers)
+                stack.append(ncur)
+                expect_key = True
+                if val == b'[':
+                    out.append((ncur[1] if ncur[1] is not None else SerializeType.OBJECT) | SerializeType.ARRAY_FLAG)
+                out += xmrrpc.dump_varint_b(ncur[0])
+
+            elif ent_type == SerializeType.STRING:
+                fval = unescape_json_str(val)
+                out += xmrrpc.dump_varint_b(len(fval)) + fval
+            elif ent_type == SerializeType.BOOL:
+                out.append(1 if val == b'true' else 0)
+            else:
+                out += val.to_bytes(8, 'little', signed=ent_type == SerializeType.INT64)
+
+            if len(out) >= _FLUSH_SIZE:
+                await self.flush()
+                out = self.out
+
+
+async def ps_to_json(reader, writer, **kwargs):
+    """
+    Transcodes portable storage read from the reader to JSON written to the writer
+    :param reader:
+    :param writer:
+    :param kwargs:
+    :return:
+    """
+    return await PortableStorageToJson(reader, writer, **kwargs).transcode()
+
+
+async def json_to_ps(data, writer):
+    """
+    Transcodes JSON text to portable storage written to the writer
+    :param data: JSON bytes
+    :param writer:
+    :return:
+    """
+    return await JsonToPortableStorage(data, writer).transcode()
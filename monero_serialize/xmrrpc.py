@@ -25,8 +25,11 @@ Mainly related to:
 WARNING: Not finished yet
 '''
 
+import array
 import binascii
 import collections
+import collections.abc
+import sys
 
 from . import xmrserialize as x
 from . import helpers
@@ -69,17 +72,31 @@ class SerializeType:
 
 SerializeTypeSize = {
     SerializeType.INT64: 8,
-    SerializeType.INT32: 2,
+    SerializeType.INT32: 4,
     SerializeType.INT16: 2,
     SerializeType.INT8: 1,
     SerializeType.UINT64: 8,
-    SerializeType.UINT32: 2,
+    SerializeType.UINT32: 4,
     SerializeType.UINT16: 2,
     SerializeType.UINT8: 1,
     SerializeType.BOOL: 1,
 }
 
 
+SignedTypes = {
+    SerializeType.INT64,
+    SerializeType.INT32,
+    SerializeType.INT16,
+    SerializeType.INT8,
+}
+
+
+# array.array typecodes of the unsigned / signed integers by the width
+ArrayTypeCodes = {array.array(tc).itemsize: tc for tc in reversed('BHILQ')}
+SignedArrayTypeCodes = {array.array(tc).itemsize: tc for tc in reversed('bhilq')}
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
 XmrTypeMap = {
     x.UVarintType: SerializeType.UINT64,
     x.Int64: SerializeType.INT64,
@@ -165,6 +182,16 @@ def type_to_size(obj_type):
     return SerializeTypeSize[obj_type]
 
 
+def pod_typecode(ent_type):
+    """
+    array.array typecode of the fixed width type
+    :param ent_type:
+    :return:
+    """
+    width = type_to_size(ent_type)
+    return SignedArrayTypeCodes[width] if ent_type in SignedTypes else ArrayTypeCodes[width]
+
+
 def xmr_type_to_type(elem_type):
     if isinstance(elem_type, int):
         return elem_type
@@ -221,6 +248,26 @@ async def dump_varint(writer, val):
         return await dump_varint_t(writer, PortableRawSizeMark.INT64, val)
 
 
+def dump_varint_b(val):
+    """
+    Serializes the variable size integer to bytes
+
+    :param val:
+    :return:
+    """
+    if val <= 63:
+        type_or = PortableRawSizeMark.BYTE
+    elif val <= 16383:
+        type_or = PortableRawSizeMark.WORD
+    elif val <= 1073741823:
+        type_or = PortableRawSizeMark.DWORD
+    elif val <= 4611686018427387903:
+        type_or = PortableRawSizeMark.INT64
+    else:
+        raise ValueError('Int too big')
+    return ((val << 2) | type_or).to_bytes(int_mark_to_size(type_or), 'little')
+
+
 async def load_varint(reader):
     """
     Binary load of variable size integer serialized by dump_varint
@@ -254,16 +301,18 @@ async def dump_string(writer, val):
     await writer.awrite(val)
 
 
-async def load_string(reader):
+async def load_string(reader, limits=None):
     """
     Loads string from binary stream
 
     :param reader:
+    :param limits:
     :return:
     """
     ivalue = await load_varint(reader)
-    fvalue = bytearray(ivalue)
-    await reader.areadinto(fvalue)
+    if limits is not None:
+        limits.check_blob(ivalue)
+    fvalue = await x.load_bytes(reader, ivalue)
     return bytes(fvalue)
 
 
@@ -283,7 +332,7 @@ async def dump_blob(writer, elem, elem_type, params=None):
     await writer.awrite(data)
 
 
-async def load_blob(reader, elem_type, params=None, elem=None):
+async def load_blob(reader, elem_type, params=None, elem=None, limits=None):
     """
     Loads blob from reader to the element. Returns the loaded blob.
 
@@ -291,11 +340,13 @@ async def load_blob(reader, elem_type, params=None, elem=None):
     :param elem_type:
     :param params:
     :param elem:
+    :param limits:
     :return:
     """
     ivalue = await load_varint(reader)
-    fvalue = bytearray(ivalue)
-    await reader.areadinto(fvalue)
+    if limits is not None:
+        limits.check_blob(ivalue)
+    fvalue = await x.load_bytes(reader, ivalue)
 
     if elem is None:
         return fvalue  # array by default
@@ -310,15 +361,93 @@ async def load_blob(reader, elem_type, params=None, elem=None):
     return elem
 
 
+async def load_pod_array(reader, ent_type, count):
+    """
+    Loads array of fixed width integers with a single read.
+    Returns array.array of the signed / unsigned integers, list of bools for BOOL.
+
+    :param reader:
+    :param ent_type:
+    :param count:
+    :return:
+    """
+    width = type_to_size(ent_type)
+    data = await x.load_bytes(reader, count * width)
+    res = array.array(pod_typecode(ent_type))
+    res.frombytes(data)
+    if _BIG_ENDIAN and width > 1:
+        res.byteswap()
+    if ent_type == SerializeType.BOOL:
+        return [bool(i) for i in res]
+    return res
+
+
+async def dump_pod_array(writer, ent_type, container):
+    """
+    Dumps array of fixed width integers with a single write
+
+    :param writer:
+    :param ent_type:
+    :param container: array.array or iterable of integers / IModel
+    :return:
+    """
+    width = type_to_size(ent_type)
+    if not isinstance(container, array.array) \
+            or container.typecode not in (ArrayTypeCodes[width], SignedArrayTypeCodes[width]):
+        vals = [i.val if isinstance(i, IModel) else i for i in container]
+        try:
+            container = array.array(pod_typecode(ent_type), vals)
+        except OverflowError:  # out of the type range, truncated two's complement as dump_uint writes
+            mask = (1 << (8 * width)) - 1
+            container = array.array(ArrayTypeCodes[width], [i & mask for i in vals])
+    elif _BIG_ENDIAN:
+        container = array.array(container.typecode, container)  # byteswap a copy
+
+    if _BIG_ENDIAN and container.itemsize > 1:
+        container.byteswap()
+    return await writer.awrite(container.tobytes())
+
+
+async def skip_bytes(reader, size):
+    """
+    Skips size bytes of the input. Readers with skip() are not read at all.
+
+    :param reader:
+    :param size:
+    :return:
+    """
+    if hasattr(reader, 'skip'):
+        return reader.skip(size)
+    await x.load_bytes(reader, size)
+
+
+def schema_entry_type(schema):
+    """
+    Storage entry type described by the schema, see kv_schema()
+
+    :param schema:
+    :return:
+    """
+    if isinstance(schema, dict):
+        return SerializeType.OBJECT
+    elif isinstance(schema, list):
+        elem_type = schema_entry_type(schema[0])
+        return (elem_type if not elem_type & SerializeType.ARRAY_FLAG else SerializeType.ARRAY) | SerializeType.ARRAY_FLAG
+    return schema
+
+
 #
 # Archive
 #
 
 
 class Archive(x.Archive):
-    def __init__(self, iobj, writing=True, modeled=True, **kwargs):
+    def __init__(self, iobj, writing=True, modeled=True, lazy=False, **kwargs):
         super().__init__(iobj, writing, **kwargs)
         self.modeled = modeled
+        if lazy and not writing and not isinstance(iobj, x.BufferReader):
+            raise ValueError('Lazy sections require BufferReader, got %s' % type(iobj).__name__)
+        self.lazy = lazy and not writing
 
     async def root(self):
         """
@@ -342,27 +471,119 @@ class Archive(x.Archive):
             if ver != PortableStorageConsts.FORMAT_VER:
                 raise ValueError('Unsupported version')
 
-    async def section(self, sec=None):
+    async def section(self, sec=None, schema=None):
         """
         Section / dict serialization
+        :param sec:
+        :param schema: storage types of the plain values, see kv_schema()
         :return:
         """
         if self.writing:
             await dump_varint(self.iobj, len(sec))
             for key in sec:
                 await self.section_name(key)
-                await self.storage_entry(sec[key])
+                await self.storage_entry(sec[key], schema=schema.get(key) if schema is not None else None)
+
+        elif self.lazy and sec is None:
+            return await self.lazy_section()
 
         else:
             sec = {} if sec is None else sec
+            limits = self.limits
+            if limits is not None:
+                limits.enter()
+
+            try:
+                count = await load_varint(self.iobj)
+                if limits is not None:
+                    limits.check_container(count)
+
+                for idx in range(count):
+                    sec_name = await self.section_name()
+                    val = await self.storage_entry()
+                    sec[sec_name] = val
+            finally:
+                if limits is not None:
+                    limits.leave()
+            return sec
+
+    async def lazy_section(self):
+        """
+        Scans the section, only the entry names and offsets are recorded, values are skipped.
+        Values are decoded on access, see LazySection.
+        :return:
+        """
+        limits = self.limits
+        if limits is not None:
+            limits.enter()
 
+        try:
             count = await load_varint(self.iobj)
+            if limits is not None:
+                limits.check_container(count)
+
+            index = collections.OrderedDict()
             for idx in range(count):
                 sec_name = await self.section_name()
-                val = await self.storage_entry()
-                sec[sec_name] = val
+                ent_type = await x.load_uint(self.iobj, 1)
+                index[sec_name] = (ent_type, self.iobj.offset)
+                await self.skip_entry(ent_type)
+            return LazySection(self.iobj.buffer, index, modeled=self.modeled, limits=limits)
+        finally:
+            if limits is not None:
+                limits.leave()
 
-            return sec
+    async def skip_section(self):
+        """
+        Skips the whole section
+        :return:
+        """
+        limits = self.limits
+        if limits is not None:
+            limits.enter()
+
+        try:
+            count = await load_varint(self.iobj)
+            if limits is not None:
+                limits.check_container(count)
+
+            for idx in range(count):
+                ivalue = await x.load_uint(self.iobj, 1)
+                await skip_bytes(self.iobj, ivalue)
+                ent_type = await x.load_uint(self.iobj, 1)
+                await self.skip_entry(ent_type)
+        finally:
+            if limits is not None:
+                limits.leave()
+
+    async def skip_entry(self, ent_type):
+        """
+        Skips the entry of the given type using the type tags and length prefixes only
+        :param ent_type:
+        :return:
+        """
+        if ent_type in SerializeTypeSize:
+            return await skip_bytes(self.iobj, type_to_size(ent_type))
+        elif ent_type == SerializeType.STRING:
+            ivalue = await load_varint(self.iobj)
+            if self.limits is not None:
+                self.limits.check_blob(ivalue, skipped=True)
+            return await skip_bytes(self.iobj, ivalue)
+        elif ent_type == SerializeType.OBJECT:
+            return await self.skip_section()
+        elif ent_type == SerializeType.ARRAY or ent_type & SerializeType.ARRAY_FLAG:
+            container_type = ent_type if ent_type != SerializeType.ARRAY else await x.load_uint(self.iobj, 1)
+            container_type &= ~SerializeType.ARRAY_FLAG
+            c_len = await load_varint(self.iobj)
+            if self.limits is not None:
+                self.limits.check_container(c_len)
+
+            if container_type in SerializeTypeSize:
+                return await skip_bytes(self.iobj, c_len * type_to_size(container_type))
+            for i in range(c_len):
+                await self.skip_entry(container_type)
+        else:
+            raise ValueError('Unrecognized type 0x%x' % ent_type)
 
     async def section_name(self, sec_name=None):
         """
@@ -381,24 +602,26 @@ class Archive(x.Archive):
             await self.iobj.areadinto(fvalue)
             return bytes(fvalue).decode('ascii')
 
-    async def storage_entry(self, entry=None, ent_type=None):
+    async def storage_entry(self, entry=None, ent_type=None, schema=None):
         if self.writing:
             oentry = entry
-            if ent_type is None:
+            if ent_type is None and schema is not None and not isinstance(entry, IModel):
+                ent_type = schema_entry_type(schema)
+            elif ent_type is None:
                 ent_type, entry = self.det_entry_model(entry)
 
             if ent_type & SerializeType.ARRAY_FLAG:
-                return await self.entry(ent_type=ent_type, elem=oentry)
+                return await self.entry(ent_type=ent_type, elem=oentry, schema=schema)
 
             else:
                 await x.dump_uint(self.iobj, ent_type, 1)
-                return await self.entry(ent_type=ent_type, elem=entry)
+                return await self.entry(ent_type=ent_type, elem=entry, schema=schema)
 
         else:
             ent_type = await x.load_uint(self.iobj, 1)
             return await self.entry(ent_type)
 
-    async def array(self, container=None, container_type=None, params=None):
+    async def array(self, container=None, container_type=None, params=None, schema=None):
         if self.writing:
             if container_type is None and not isinstance(container, ArrayModel):
                 raise ValueError('Unknown container type serialization')
@@ -411,25 +634,41 @@ class Archive(x.Archive):
 
             await x.dump_uint(self.iobj, container_type, 1)
             await dump_varint(self.iobj, len(container))
+            if entry_type in SerializeTypeSize:
+                return await dump_pod_array(self.iobj, entry_type, container)
+
+            eschema = schema[0] if schema is not None else None
             for i in container:
-                await self.entry(entry_type, elem=i)
+                await self.entry(entry_type, elem=i, schema=eschema)
 
         else:
             if container_type is None:
                 container_type = await x.load_uint(self.iobj, 1)
 
             container_type &= ~SerializeType.ARRAY_FLAG
+            limits = self.limits
+            if limits is not None:
+                limits.enter()
 
-            c_len = await load_varint(self.iobj)
-            res = container if container else []
-            for i in range(c_len):
-                fval = await self.entry(container_type, x.eref(res, i) if container else None)
-                if not container:
-                    res.append(fval)
-
+            try:
+                c_len = await load_varint(self.iobj)
+                if limits is not None:
+                    limits.check_container(c_len)
+
+                if container_type in SerializeTypeSize and not container:
+                    res = await load_pod_array(self.iobj, container_type, c_len)
+                else:
+                    res = container if container else []
+                    for i in range(c_len):
+                        fval = await self.entry(container_type, x.eref(res, i) if container else None)
+                        if not container:
+                            res.append(fval)
+            finally:
+                if limits is not None:
+                    limits.leave()
             return res if not self.modeled else ArrayModel(res, container_type)
 
-    async def entry(self, ent_type, elem=None):
+    async def entry(self, ent_type, elem=None, schema=None):
         if self.writing:
             oelem = elem
             elem = elem if not isinstance(elem, IModel) else elem.val
@@ -441,11 +680,15 @@ class Archive(x.Archive):
             elif ent_type == SerializeType.STRING:
                 return await self.unicode_type(elem)
             elif ent_type == SerializeType.OBJECT:
-                return await self.section(elem)
+                return await self.section(elem, schema=schema if isinstance(schema, dict) else None)
+            elif ent_type == SerializeType.ARRAY and isinstance(schema, list) and not isinstance(oelem, IModel):
+                container_type = schema_entry_type(schema) & (~SerializeType.ARRAY_FLAG)
+                return await self.array(elem, container_type=container_type, schema=schema)
             elif ent_type == SerializeType.ARRAY:
                 return await self.array(oelem)
             elif ent_type & SerializeType.ARRAY_FLAG:
-                return await self.array(elem, container_type=ent_type & (~SerializeType.ARRAY_FLAG))
+                return await self.array(elem, container_type=ent_type & (~SerializeType.ARRAY_FLAG),
+                                        schema=schema if isinstance(schema, list) else None)
             else:
                 raise ValueError('Unrecognized type 0x%x' % ent_type)
 
@@ -471,7 +714,7 @@ class Archive(x.Archive):
             return await dump_string(self.iobj, elem)
 
         else:
-            return await load_string(self.iobj)
+            return await load_string(self.iobj, limits=self.limits)
 
     @staticmethod
     def det_entry_model(entry):
@@ -485,7 +728,7 @@ class Archive(x.Archive):
             return SerializeType.STRING, entry
         elif isinstance(entry, bytearray):
             return SerializeType.STRING, bytes(entry)
-        elif isinstance(entry, (dict, x.MessageType)):
+        elif isinstance(entry, (collections.abc.Mapping, x.MessageType)):
             return SerializeType.OBJECT, entry
         elif isinstance(entry, (list, tuple)):
             return SerializeType.OBJECT | SerializeType.ARRAY_FLAG, entry  # fallback to obj
@@ -493,20 +736,240 @@ class Archive(x.Archive):
             raise ValueError('Unknown: %r' % entry)
 
 
+class LazySection(collections.abc.Mapping):
+    """
+    Read-only portable storage section decoded on demand.
+    Holds the source buffer and the entry name -> (type, offset) index built
+    by a single scan, values are decoded on the first access and cached.
+
+    All accesses share the decode limits state of the scan, the decoded sizes
+    add up and the entries are decoded at the nesting depth of the section.
+    """
+
+    def __init__(self, buffer, index, modeled=True, limits=None):
+        self.buffer = buffer
+        self.index = index
+        self.modeled = modeled
+        self.limits = limits
+        self.depth = limits.depth if limits is not None else 0
+        self.cache = {}
+
+    def __getitem__(self, key):
+        if key in self.cache:
+            return self.cache[key]
+
+        ent_type, offset = self.index[key]
+        limits = self.limits
+        ar = Archive(x.BufferReader(self.buffer, offset), False, modeled=self.modeled, lazy=True)
+        ar.limits = limits  # the state of the scan, not a fresh one
+        if limits is not None:
+            depth, limits.depth = limits.depth, self.depth
+        try:
+            val = helpers.run_sync(ar.entry(ent_type))
+        finally:
+            if limits is not None:
+                limits.depth = depth
+
+        self.cache[key] = val
+        return val
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return '<LazySection %s>' % list(self.index)
+
+    def to_dict(self):
+        """
+        Decodes all entries recursively to dictionaries
+        :return:
+        """
+        res = {}
+        for key in self.index:
+            val = self[key]
+            res[key] = val.to_dict() if isinstance(val, LazySection) else val
+        return res
+
+
+def load_lazy(data, modeled=True, **kwargs):
+    """
+    Scans the portable storage in the buffer, returns LazySection of the root
+    :param data:
+    :param modeled:
+    :param kwargs:
+    :return:
+    """
+    ar = Archive(x.BufferReader(data), False, modeled=modeled, lazy=True, **kwargs)
+    helpers.run_sync(ar.root())
+    return helpers.run_sync(ar.section())
+
+
 #
 # Blob serializer
 #
 
+
+_BLOB_POD_SIZES = {}
+
+
+def blob_pod_size(elem_type, params=None):
+    """
+    Blob serialized size of the plain old data type, None if the size is not fixed.
+    Cached per type.
+
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    params = tuple(params) if params else None
+    try:
+        return _BLOB_POD_SIZES[(elem_type, params)]
+    except KeyError:
+        pass
+    except TypeError:  # unhashable params
+        return _blob_pod_size(elem_type, params)
+
+    size = _blob_pod_size(elem_type, params)
+    _BLOB_POD_SIZES[(elem_type, params)] = size
+    return size
+
+
+def _blob_pod_size(elem_type, params=None):
+    if hasattr(elem_type, 'blob_size') or hasattr(elem_type, 'blob_serialize'):
+        return None
+
+    elif issubclass(elem_type, x.UVarintType):
+        return None
+
+    elif issubclass(elem_type, x.IntType):
+        return elem_type.WIDTH
+
+    elif issubclass(elem_type, x.BlobType):
+        return elem_type.SIZE if elem_type.FIX_SIZE else None
+
+    elif issubclass(elem_type, x.ContainerType):
+        if not elem_type.FIX_SIZE:
+            return None
+        size = blob_pod_size(x.container_elem_type(elem_type, params), params[1:] if params else None)
+        return None if size is None else elem_type.SIZE * size
+
+    elif issubclass(elem_type, (x.TupleType, x.MessageType)):
+        fields = elem_type.MFIELDS if issubclass(elem_type, x.MessageType) else [(None, t) for t in elem_type.MFIELDS]
+        acc = 0
+        for field in fields:
+            size = blob_pod_size(field[1], field[2:])
+            if size is None:
+                return None
+            acc += size
+        return acc
+
+    return None
+
+
+def blob_pod_load(data, offset, elem_type, params=None):
+    """
+    Decodes plain old data element from the buffer at the offset.
+    Returns the element and the offset after it.
+
+    :param data:
+    :param offset:
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    if issubclass(elem_type, x.IntType):
+        end = offset + elem_type.WIDTH
+        return int.from_bytes(data[offset:end], 'little'), end
+
+    elif issubclass(elem_type, x.BlobType):
+        end = offset + elem_type.SIZE
+        return data[offset:end], end
+
+    elif issubclass(elem_type, x.ContainerType):
+        celem_type = x.container_elem_type(elem_type, params)
+        cparams = params[1:] if params else None
+        res = []
+        for _ in range(elem_type.SIZE):
+            fvalue, offset = blob_pod_load(data, offset, celem_type, cparams)
+            res.append(fvalue)
+        return res, offset
+
+    elif issubclass(elem_type, x.TupleType):
+        res = []
+        for ftype in elem_type.MFIELDS:
+            fvalue, offset = blob_pod_load(data, offset, ftype)
+            res.append(fvalue)
+        return res, offset
+
+    else:
+        msg = elem_type()
+        for field in elem_type.MFIELDS:
+            fvalue, offset = blob_pod_load(data, offset, field[1], field[2:])
+            setattr(msg, field[0], fvalue)
+        return msg, offset
+
+
+def blob_pod_dump(buffer, elem, elem_type, params=None):
+    """
+    Appends blob serialization of the plain old data element to the buffer
+
+    :param buffer:
+    :param elem:
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    if issubclass(elem_type, x.IntType):
+        buffer += (elem & ((1 << (8 * elem_type.WIDTH)) - 1)).to_bytes(elem_type.WIDTH, 'little')
+
+    elif issubclass(elem_type, x.BlobType):
+        data = getattr(elem, x.BlobType.DATA_ATTR) if isinstance(elem, x.BlobType) else elem
+        if len(data) != elem_type.SIZE:
+            raise ValueError('Fixed size blob has not defined size: %s' % elem_type.SIZE)
+        buffer += data
+
+    elif issubclass(elem_type, x.ContainerType):
+        if len(elem) != elem_type.SIZE:
+            raise ValueError('Fixed size container has not defined size: %s' % elem_type.SIZE)
+        celem_type = x.container_elem_type(elem_type, params)
+        cparams = params[1:] if params else None
+        for celem in elem:
+            blob_pod_dump(buffer, celem, celem_type, cparams)
+
+    elif issubclass(elem_type, x.TupleType):
+        for celem, ftype in zip(elem, elem_type.MFIELDS):
+            blob_pod_dump(buffer, celem, ftype)
+
+    else:
+        for field in elem_type.MFIELDS:
+            blob_pod_dump(buffer, getattr(elem, field[0]), field[1], field[2:])
+    return buffer
+
+
 class Blobber(object):
     """
     Serializing structures to Blob for KV_SERIALIZE.
     """
-    def __init__(self, iobj=None, writing=True, data=None, **kwargs):
+    def __init__(self, iobj=None, writing=True, data=None, tracking=False, **kwargs):
         self.writing = writing
-        self.tracker = helpers.Tracker()
-        self.iobj = x.MemoryReaderWriter() if iobj is not None else iobj
+        self.tracking = tracking
+        self.tracker = helpers.Tracker(tracking)
+        self.iobj = x.MemoryReaderWriter() if iobj is None else iobj
         if data is not None:
-            self.iobj = x.MemoryReaderWriter(bytearray(data))
+            self.iobj = x.BufferReader(bytearray(data))
+
+    def data_left(self):
+        """
+        Number of bytes not read yet
+        :return:
+        """
+        return len(self.iobj.buffer) - getattr(self.iobj, 'offset', 0)
 
     async def uvarint(self, elem):
         """
@@ -587,6 +1050,11 @@ class Blobber(object):
             elem = elem_type() if elem is None else elem
             return await elem.blob_size(self)
 
+        if elem is None:
+            size = blob_pod_size(elem_type, params)
+            if size is not None:
+                return size
+
         if issubclass(elem_type, x.UVarintType):
             raise helpers.ArchiveException('Unknown size for varint')
 
@@ -644,13 +1112,22 @@ class Blobber(object):
         if container is None:
             return
 
+        eparams = params[1:] if params else None
+        if len(container) > 0 and blob_pod_size(elem_type, eparams) is not None:
+            buffer = bytearray()
+            for elem in container:
+                blob_pod_dump(buffer, elem, elem_type, eparams)
+            return await self.iobj.awrite(buffer)
+
         for idx, elem in enumerate(container):
             try:
-                self.tracker.push_index(idx)
+                if self.tracking:
+                    self.tracker.push_index(idx)
                 await self._dump_field(elem, elem_type, params[1:] if params else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, idx) from e
 
     async def container_load(self, container_type, params=None, container=None, obj=None):
         """
@@ -665,11 +1142,12 @@ class Blobber(object):
         :return:
         """
         elem_type = x.container_elem_type(container_type, params)
-        elem_size = await self.get_element_size(elem_type=elem_type, params=params)
+        eparams = params[1:] if params else None
+        elem_size = await self.get_element_size(elem_type=elem_type, params=eparams)
 
         # If container is of fixed size we know the size to load from the input.
         # Otherwise we have to read to the end
-        data_left = len(self.iobj.buffer)
+        data_left = self.data_left()
         c_len = container_type.SIZE
         if not container_type.FIX_SIZE:
             if data_left == 0:
@@ -678,16 +1156,25 @@ class Blobber(object):
                 raise helpers.ArchiveException('Container size mod elem size not 0')
             c_len = data_left // elem_size
 
+        # Plain old data elements are sliced from a single read
+        if not container and blob_pod_size(elem_type, eparams) is not None:
+            data = await x.load_bytes(self.iobj, c_len * elem_size)
+            if issubclass(elem_type, x.BlobType):
+                return [data[i:i + elem_size] for i in range(0, len(data), elem_size)]
+            return [blob_pod_load(data, i, elem_type, eparams)[0] for i in range(0, len(data), elem_size)]
+
         res = container if container else []
         for i in range(c_len):
             try:
-                self.tracker.push_index(i)
+                if self.tracking:
+                    self.tracker.push_index(i)
                 fvalue = await self._load_field(elem_type,
-                                                params[1:] if params else None,
+                                                eparams,
                                                 x.eref(res, i) if container else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, i) from e
 
             if not container:
                 res.append(fvalue)
@@ -791,6 +1278,7 @@ class Blobber(object):
         """
         elem_type = msg_type if msg_type is not None else msg.__class__
 
+        msg = elem_type() if msg is None and not self.writing else msg
         if hasattr(elem_type, 'blob_serialize'):
             msg = elem_type() if msg is None else msg
             return await msg.blob_serialize(self)
@@ -812,7 +1300,8 @@ class Blobber(object):
         """
         fname, ftype, params = field[0], field[1], field[2:]
         try:
-            self.tracker.push_field(fname)
+            if self.tracking:
+                self.tracker.push_field(fname)
             if self.writing:
                 fvalue = getattr(msg, fname, None) if fvalue is None else fvalue
                 await self._dump_field(fvalue, ftype, params)
@@ -820,10 +1309,11 @@ class Blobber(object):
             else:
                 await self._load_field(ftype, params, x.eref(msg, fname))
 
-            self.tracker.pop()
+            if self.tracking:
+                self.tracker.pop()
 
         except Exception as e:
-            raise helpers.ArchiveException(e, tracker=self.tracker) from e
+            raise helpers.track_exception(e, self.tracker, helpers.TrackField, fname) from e
 
     async def message_fields(self, msg, fields, obj=None):
         """
@@ -904,14 +1394,21 @@ class Modeler(object):
     Converting message classes to models and vice versa.
     Writing  = transforming message to model.
     !Writing = transforming model to message.
+
+    Compact mode produces plain dicts, lists, integers and blobs without copying.
+    Storage types are kept by the schema, see kv_schema(), blobs are hex-encoded
+    only when the JSON is emitted, see xmrjson.json_dumps(hexlify=True).
     """
 
-    def __init__(self, writing=True, hexlify=False, modelize=True, strict_load=False, **kwargs):
+    def __init__(self, writing=True, hexlify=False, modelize=True, strict_load=False, tracking=False,
+                 compact=False, **kwargs):
         self.writing = writing
-        self.hexlify = hexlify
-        self.modelize = modelize
+        self.compact = compact
+        self.hexlify = hexlify and not compact
+        self.modelize = modelize and not compact
         self.strict_load = strict_load
-        self.tracker = helpers.Tracker()
+        self.tracking = tracking
+        self.tracker = helpers.Tracker(tracking)
 
     @staticmethod
     def to_bytes(elem):
@@ -925,11 +1422,14 @@ class Modeler(object):
 
     async def uvarint(self, elem):
         """
-        Uvarint untouched
+        Uvarint, stored as uint64
         :param elem:
         :return:
         """
-        return elem
+        if self.writing:
+            return IntegerModel(elem, SerializeType.UINT64) if self.modelize else elem
+        else:
+            return elem.val if isinstance(elem, IModel) else elem
 
     async def uint(self, elem, elem_type, params=None):
         """
@@ -940,7 +1440,7 @@ class Modeler(object):
         :return:
         """
         if self.writing:
-            return IntegerModel(elem, elem_type.WIDTH) if self.modelize else elem
+            return IntegerModel(elem, xmr_type_to_type(elem_type)) if self.modelize else elem
         else:
             return elem.val if isinstance(elem, IModel) else elem
 
@@ -974,6 +1474,9 @@ class Modeler(object):
             if len(data) == 0:
                 return b''
 
+            if self.compact and isinstance(data, (bytes, bytearray, memoryview)):
+                return data
+
             fval = Modeler.to_bytes(data)
             if self.hexlify:
                 return binascii.hexlify(fval).decode('ascii')
@@ -983,8 +1486,10 @@ class Modeler(object):
         else:
             if elem is None:
                 return NoSetSentinel()
-            if self.hexlify:
+            if self.hexlify or (self.compact and isinstance(elem, str)):
                 return bytes(binascii.unhexlify(elem))
+            elif isinstance(elem, bytes):
+                return elem
             else:
                 return bytes(elem)
 
@@ -1020,14 +1525,23 @@ class Modeler(object):
         if container is None:  # todo: reconsider
             return NoSetSentinel()  # if not self.modelize else ArrayModel(obj, xmr_type_to_type(elem_type))
 
+        if self.compact and not hasattr(elem_type, 'kv_serialize') and (
+                issubclass(elem_type, (x.UVarintType, x.IntType))
+                or (issubclass(elem_type, x.BlobType)
+                    and all(isinstance(elem, (bytes, bytearray, memoryview)) for elem in container))):
+            obj.extend(container)
+            return obj
+
         for idx, elem in enumerate(container):
             try:
-                self.tracker.push_index(idx)
+                if self.tracking:
+                    self.tracker.push_index(idx)
                 fvalue = await self._dump_field(elem, elem_type, params[1:] if params else None)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, idx) from e
 
             if not isinstance(fvalue, NoSetSentinel):
                 obj.append(fvalue)
@@ -1059,14 +1573,16 @@ class Modeler(object):
         res = container if container else []
         for i in range(c_len):
             try:
-                self.tracker.push_index(i)
+                if self.tracking:
+                    self.tracker.push_index(i)
                 fvalue = await self._load_field(elem_type,
                                                 params[1:] if params else None,
                                                 x.eref(res, i) if container else None, obj=obj[i])
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, i) from e
 
             if not container and not isinstance(fvalue, NoSetSentinel):
                 res.append(fvalue)
@@ -1108,13 +1624,15 @@ class Modeler(object):
         obj = [] if obj is None else x.get_elem(obj)
         for idx, elem in enumerate(elem):
             try:
-                self.tracker.push_index(idx)
+                if self.tracking:
+                    self.tracker.push_index(idx)
                 fvalue = await self._dump_field(elem, elem_fields[idx], params[1:] if params else None)
                 obj.append(fvalue)
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, idx) from e
 
         return obj
 
@@ -1143,17 +1661,19 @@ class Modeler(object):
         res = elem if elem else []
         for i in range(len(elem_fields)):
             try:
-                self.tracker.push_index(i)
-                fvalue = await self._load_field(params[1:] if params else None,
+                if self.tracking:
+                    self.tracker.push_index(i)
+                fvalue = await self._load_field(elem_fields[i], params[1:] if params else None,
                                                 x.eref(res, i) if elem else None,
                                                 obj=obj[i])
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
                 if not elem:
                     res.append(fvalue)
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, i) from e
 
         return res
 
@@ -1193,26 +1713,30 @@ class Modeler(object):
         fvalue = None
         if isinstance(elem, x.VariantType) or elem_type.WRAPS_VALUE:
             try:
-                self.tracker.push_variant(elem.variant_elem_type)
+                if self.tracking:
+                    self.tracker.push_variant(elem.variant_elem_type)
                 fvalue = {
                     elem.variant_elem: await self._dump_field(getattr(elem, elem.variant_elem), elem.variant_elem_type, obj=obj)
                 }
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackVariant, elem.variant_elem_type) from e
 
         else:
+            fdef = elem_type.find_fdef(elem_type.MFIELDS, elem)
             try:
-                fdef = elem_type.find_fdef(elem_type.MFIELDS, elem)
-                self.tracker.push_variant(fdef[1])
+                if self.tracking:
+                    self.tracker.push_variant(fdef[1])
                 fvalue = {
                     fdef[0]: await self._dump_field(elem, fdef[1], obj=obj)
                 }
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackVariant, fdef[1]) from e
 
         return fvalue
 
@@ -1239,12 +1763,14 @@ class Modeler(object):
                 continue
 
             try:
-                self.tracker.push_variant(field[1])
+                if self.tracking:
+                    self.tracker.push_variant(field[1])
                 fvalue = await self._load_field(field[1], field[2:], elem if not is_wrapped else None, obj=obj[fname])
-                self.tracker.pop()
+                if self.tracking:
+                    self.tracker.pop()
 
             except Exception as e:
-                raise helpers.ArchiveException(e, tracker=self.tracker) from e
+                raise helpers.track_exception(e, self.tracker, helpers.TrackVariant, field[1]) from e
 
             if is_wrapped:
                 elem.set_variant(field[0], fvalue)
@@ -1261,11 +1787,16 @@ class Modeler(object):
         :return:
         """
         elem_type = msg_type if msg_type is not None else msg.__class__
-        obj = collections.OrderedDict() if not x.has_elem(obj) else x.get_elem(obj)
+        if self.writing:
+            obj = collections.OrderedDict() if not x.has_elem(obj) else x.get_elem(obj)
+        else:
+            obj = x.get_elem(obj)
+            msg = elem_type() if msg is None else msg
 
         if hasattr(elem_type, 'kv_serialize'):
             msg = elem_type() if msg is None else msg
-            return await msg.kv_serialize(self, obj=obj)
+            res = await msg.kv_serialize(self, obj=obj)
+            return res if self.writing else msg
 
         fields = elem_type.MFIELDS
         for field in fields:
@@ -1285,7 +1816,8 @@ class Modeler(object):
         fname, ftype, params = field[0], field[1], field[2:]
 
         try:
-            self.tracker.push_field(field[0])
+            if self.tracking:
+                self.tracker.push_field(field[0])
 
             if self.writing:
                 if msg is None:
@@ -1296,10 +1828,11 @@ class Modeler(object):
                 oval = obj[fname] if self.strict_load else (obj[fname] if fname in obj else None)
                 await self._load_field(ftype, params, x.eref(msg, fname), obj=oval)
 
-            self.tracker.pop()
+            if self.tracking:
+                self.tracker.pop()
 
         except Exception as e:
-            raise helpers.ArchiveException(e, tracker=self.tracker) from e
+            raise helpers.track_exception(e, self.tracker, helpers.TrackField, field[0]) from e
 
     async def message_fields(self, msg, fields, obj=None):
         """
@@ -1328,12 +1861,17 @@ class Modeler(object):
         src = elem if self.writing else obj
         dst = obj if self.writing else elem
 
+        # Message side is the source when dumping, the destination when loading
+        # Model side is the destination reference when dumping, the source model when loading
+        melem = x.get_elem(src) if self.writing else x.get_elem(dst)
+        model = dst if self.writing else x.get_elem(src)
+
         # TODO: optional elem, default value for deserialization...
 
         # Blob wrapper. Underlying structure should be serialized as blob.
         if x.is_type(elem_type, BlobFieldWrapper):
-            blobber = Blobber(self.writing, data=x.get_elem(src) if not self.writing else None)
-            fvalue = await blobber.blobize(elem=x.get_elem(src), elem_type=elem_type.ftype, params=params)
+            blobber = Blobber(writing=self.writing, data=x.get_elem(src) if not self.writing else None)
+            fvalue = await blobber.blobize(elem=melem, elem_type=elem_type.ftype, params=params)
             fvalue = NoSetSentinel() if fvalue is None or len(fvalue) == 0 else fvalue
 
         elif issubclass(elem_type, x.UVarintType):
@@ -1349,16 +1887,16 @@ class Modeler(object):
             fvalue = await self.unicode_type(x.get_elem(src))
 
         elif issubclass(elem_type, x.VariantType):
-            fvalue = await self.variant(elem=x.get_elem(src), elem_type=elem_type, params=params, obj=dst)
+            fvalue = await self.variant(elem=melem, elem_type=elem_type, params=params, obj=model)
 
         elif issubclass(elem_type, x.ContainerType):  # container ~ simple list
-            fvalue = await self.container(container=x.get_elem(src), container_type=elem_type, params=params, obj=dst)
+            fvalue = await self.container(container=melem, container_type=elem_type, params=params, obj=model)
 
         elif issubclass(elem_type, x.TupleType):  # tuple ~ simple list
-            fvalue = await self.tuple(elem=x.get_elem(src), elem_type=elem_type, params=params, obj=dst)
+            fvalue = await self.tuple(elem=melem, elem_type=elem_type, params=params, obj=model)
 
         elif issubclass(elem_type, x.MessageType):
-            fvalue = await self.message(x.get_elem(src), msg_type=elem_type, obj=dst)
+            fvalue = await self.message(melem, msg_type=elem_type, obj=model)
 
         else:
             raise TypeError
@@ -1372,6 +1910,431 @@ class Modeler(object):
         return await self.field(elem=elem, elem_type=elem_type, params=params, obj=obj)
 
 
+#
+# Direct KV archive
+#
+
+
+def kv_field_present(fvalue, ftype):
+    """
+    Returns True if the field is stored in the section.
+    Same as the Modeler, missing blobs and containers are omitted, so are empty blob wrapped containers.
+
+    :param fvalue:
+    :param ftype:
+    :return:
+    """
+    if x.is_type(ftype, BlobFieldWrapper):
+        return fvalue is not None and not (issubclass(ftype.ftype, x.ContainerType) and len(fvalue) == 0)
+    elif fvalue is None:
+        return not issubclass(ftype, (x.BlobType, x.ContainerType))
+    return True
+
+
+class KVFieldScanner(object):
+    """
+    Collects field definitions the kv_serialize() override passes to the archive
+    """
+    def __init__(self):
+        self.writing = True
+        self.fields = []
+
+    async def message_field(self, msg, field, fvalue=None, obj=None):
+        self.fields.append(field)
+
+    async def message_fields(self, msg, fields, obj=None):
+        for field in fields:
+            await self.message_field(msg, field, obj=obj)
+        return msg
+
+
+_KV_FIELDS = {}
+
+
+def get_kv_fields(msg_type):
+    """
+    Returns field definitions of the message in the portable storage, honours kv_serialize() overrides.
+    Cached per message type.
+
+    :param msg_type:
+    :return:
+    """
+    fields = _KV_FIELDS.get(msg_type)
+    if fields is None:
+        if hasattr(msg_type, 'kv_serialize'):
+            scanner = KVFieldScanner()
+            helpers.run_sync(msg_type().kv_serialize(scanner, obj=collections.OrderedDict()))
+            fields = scanner.fields
+        else:
+            fields = list(msg_type.MFIELDS)
+        fields = (fields, {fld[0]: fld for fld in fields})
+        _KV_FIELDS[msg_type] = fields
+    return fields
+
+
+_KV_SCHEMAS = {}
+
+
+def kv_schema(msg_type):
+    """
+    Storage types of the message fields, used to serialize compact models.
+    Integers and strings map to SerializeType, messages and variants to a nested dict
+    of their fields, containers to a single element list with the element schema.
+    Cached per message type.
+
+    :param msg_type:
+    :return:
+    """
+    schema = _KV_SCHEMAS.get(msg_type)
+    if schema is None:
+        schema = {}
+        _KV_SCHEMAS[msg_type] = schema  # recursive types
+        for field in get_kv_fields(msg_type)[0]:
+            schema[field[0]] = kv_field_schema(field[1], field[2:])
+    return schema
+
+
+def kv_field_schema(elem_type, params=None):
+    """
+    Storage type schema of the field, see kv_schema()
+
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    if x.is_type(elem_type, BlobFieldWrapper):
+        return SerializeType.STRING
+    elif issubclass(elem_type, x.MessageType):
+        return kv_schema(elem_type)
+    elif issubclass(elem_type, x.VariantType):
+        return {fld[0]: kv_field_schema(fld[1], fld[2:]) for fld in elem_type.MFIELDS}
+    elif issubclass(elem_type, x.ContainerType):
+        return [kv_field_schema(x.container_elem_type(elem_type, params), params[1:] if params else None)]
+    else:
+        return KVArchive.kv_type(elem_type, params)
+
+
+class KVArchive(Archive):
+    """
+    Portable storage archive serializing messages directly from the field definitions.
+    Produces the same storage as Modeler followed by Archive.section() without the intermediate model.
+    """
+
+    def __init__(self, iobj, writing=True, tracking=False, **kwargs):
+        super().__init__(iobj, writing, modeled=False, **kwargs)
+        self.tracking = tracking
+        self.tracker = helpers.Tracker(tracking)
+
+    async def root_message(self, msg, msg_type=None):
+        """
+        Storage header followed by the message section
+        :param msg:
+        :param msg_type:
+        :return:
+        """
+        await self.root()
+        return await self.message(msg, msg_type=msg_type)
+
+    async def message(self, msg, msg_type=None):
+        """
+        Loads/dumps message as a section
+        :param msg:
+        :param msg_type:
+        :return:
+        """
+        elem_type = msg_type if msg_type is not None else msg.__class__
+        fields, findex = get_kv_fields(elem_type)
+
+        if self.writing:
+            fields = [fld for fld in fields if kv_field_present(getattr(msg, fld[0], None) if msg is not None else None, fld[1])]
+            await dump_varint(self.iobj, len(fields))
+            for field in fields:
+                await self.message_field(msg, field)
+            return msg
+
+        msg = elem_type() if msg is None else msg
+        limits = self.limits
+        if limits is not None:
+            limits.enter()
+
+        try:
+            count = await load_varint(self.iobj)
+            if limits is not None:
+                limits.check_container(count)
+
+            for idx in range(count):
+                sec_name = await self.section_name()
+                ent_type = await x.load_uint(self.iobj, 1)
+                field = findex.get(sec_name)
+                if field is None:
+                    await self.skip_entry(ent_type)
+                else:
+                    await self.message_field(msg, field, ent_type=ent_type)
+        finally:
+            if limits is not None:
+                limits.leave()
+        return msg
+
+    async def message_field(self, msg, field, fvalue=None, ent_type=None):
+        """
+        Dumps/Loads message field
+        :param msg:
+        :param field:
+        :param fvalue: explicit value for dump
+        :param ent_type: storage type of the loaded entry
+        :return:
+        """
+        fname, ftype, params = field[0], field[1], field[2:]
+        try:
+            if self.tracking:
+                self.tracker.push_field(fname)
+
+            if self.writing:
+                fvalue = getattr(msg, fname, None) if fvalue is None and msg is not None else fvalue
+                await self.section_name(fname)
+                await self.field(fvalue, ftype, params)
+            else:
+                fvalue = await self.field(getattr(msg, fname, None), ftype, params, ent_type=ent_type)
+                setattr(msg, fname, fvalue)
+
+            if self.tracking:
+                self.tracker.pop()
+
+        except Exception as e:
+            raise helpers.track_exception(e, self.tracker, helpers.TrackField, fname) from e
+
+    async def field(self, elem=None, elem_type=None, params=None, ent_type=None):
+        """
+        Typed storage entry. When dumping, the entry type is derived from the field type.
+        :param elem:
+        :param elem_type:
+        :param params:
+        :param ent_type: storage type of the loaded entry
+        :return:
+        """
+        if self.writing:
+            ent_type = self.kv_type(elem_type, params)
+            await x.dump_uint(self.iobj, ent_type, 1)
+        return await self.kv_value(elem, elem_type, params, ent_type)
+
+    @staticmethod
+    def kv_type(elem_type, params=None):
+        """
+        Storage entry type of the field type
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        if x.is_type(elem_type, BlobFieldWrapper):
+            return SerializeType.STRING
+        elif issubclass(elem_type, x.UVarintType):
+            return SerializeType.UINT64
+        elif issubclass(elem_type, x.IntType):
+            return xmr_type_to_type(elem_type)
+        elif issubclass(elem_type, (x.BlobType, x.UnicodeType)):
+            return SerializeType.STRING
+        elif issubclass(elem_type, (x.VariantType, x.MessageType)):
+            return SerializeType.OBJECT
+        elif issubclass(elem_type, x.ContainerType):
+            celem_type = x.container_elem_type(elem_type, params)
+            ctype = KVArchive.kv_type(celem_type, params[1:] if params else None)
+            return (ctype if not ctype & SerializeType.ARRAY_FLAG else SerializeType.ARRAY) | SerializeType.ARRAY_FLAG
+        elif issubclass(elem_type, x.TupleType):
+            raise ValueError('Tuple cannot be stored in the portable storage')
+        else:
+            raise TypeError
+
+    async def kv_value(self, elem, elem_type, params, ent_type):
+        """
+        Loads/dumps entry value of the given storage type
+        :param elem:
+        :param elem_type:
+        :param params:
+        :param ent_type:
+        :return:
+        """
+        if x.is_type(elem_type, BlobFieldWrapper):
+            if self.writing:
+                data = await Blobber(writing=True).blobize(elem=elem, elem_type=elem_type.ftype, params=params)
+                return await dump_string(self.iobj, data)
+            self._check_type(ent_type, SerializeType.STRING)
+            data = await load_string(self.iobj, limits=self.limits)
+            return await Blobber(writing=False, data=data).blobize(elem_type=elem_type.ftype, params=params)
+
+        elif issubclass(elem_type, (x.UVarintType, x.IntType)):
+            if ent_type not in SerializeTypeSize:
+                raise ValueError('Integer expected, got type 0x%x' % ent_type)
+            if self.writing:
+                return await x.dump_uint(self.iobj, int(elem), type_to_size(ent_type))
+            return await x.load_uint(self.iobj, type_to_size(ent_type))
+
+        elif issubclass(elem_type, x.BlobType):
+            if self.writing:
+                data = getattr(elem, x.BlobType.DATA_ATTR) if isinstance(elem, x.BlobType) else elem
+                return await dump_string(self.iobj, bytes(data))
+            self._check_type(ent_type, SerializeType.STRING)
+            return await load_string(self.iobj, limits=self.limits)
+
+        elif issubclass(elem_type, x.UnicodeType):
+            if self.writing:
+                return await dump_string(self.iobj, elem.encode('utf8') if isinstance(elem, str) else bytes(elem))
+            self._check_type(ent_type, SerializeType.STRING)
+            return (await load_string(self.iobj, limits=self.limits)).decode('utf8')
+
+        elif issubclass(elem_type, x.VariantType):
+            self._check_type(ent_type, SerializeType.OBJECT)
+            return await self.variant(elem, elem_type, params)
+
+        elif issubclass(elem_type, x.ContainerType):
+            if not ent_type & SerializeType.ARRAY_FLAG:
+                raise ValueError('Array expected, got type 0x%x' % ent_type)
+            return await self.kv_array(elem, elem_type, params, ent_type)
+
+        elif issubclass(elem_type, x.MessageType):
+            self._check_type(ent_type, SerializeType.OBJECT)
+            return await self.message(elem, msg_type=elem_type)
+
+        else:
+            raise TypeError
+
+    async def kv_array(self, container, container_type, params, ent_type):
+        """
+        Loads/dumps typed array
+        :param container:
+        :param container_type:
+        :param params:
+        :param ent_type:
+        :return:
+        """
+        elem_type = x.container_elem_type(container_type, params)
+        eparams = params[1:] if params else None
+        entry_type = ent_type & (~SerializeType.ARRAY_FLAG)
+
+        if self.writing:
+            await dump_varint(self.iobj, len(container))
+            if entry_type in SerializeTypeSize:
+                return await dump_pod_array(self.iobj, entry_type, container)
+
+            sub_type = self.kv_type(elem_type, eparams) if entry_type == SerializeType.ARRAY else entry_type
+            for idx, elem in enumerate(container):
+                try:
+                    if self.tracking:
+                        self.tracker.push_index(idx)
+                    if entry_type == SerializeType.ARRAY:
+                        await x.dump_uint(self.iobj, sub_type, 1)
+                    await self.kv_value(elem, elem_type, eparams, sub_type)
+                    if self.tracking:
+                        self.tracker.pop()
+                except Exception as e:
+                    raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, idx) from e
+            return
+
+        limits = self.limits
+        if limits is not None:
+            limits.enter()
+
+        try:
+            c_len = await load_varint(self.iobj)
+            if limits is not None:
+                limits.check_container(c_len)
+
+            if entry_type in SerializeTypeSize and issubclass(elem_type, (x.UVarintType, x.IntType)):
+                res = list(await load_pod_array(self.iobj, entry_type, c_len))
+
+            else:
+                res = []
+                for i in range(c_len):
+                    try:
+                        if self.tracking:
+                            self.tracker.push_index(i)
+                        sub_type = entry_type if entry_type != SerializeType.ARRAY else await x.load_uint(self.iobj, 1)
+                        res.append(await self.kv_value(None, elem_type, eparams, sub_type))
+                        if self.tracking:
+                            self.tracker.pop()
+                    except Exception as e:
+                        raise helpers.track_exception(e, self.tracker, helpers.TrackIndex, i) from e
+        finally:
+            if limits is not None:
+                limits.leave()
+        return res
+
+    async def variant(self, elem, elem_type, params=None):
+        """
+        Variant as a section with a single entry named by the variant field
+        :param elem:
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        if self.writing:
+            if isinstance(elem, x.VariantType) or elem_type.WRAPS_VALUE:
+                field = [fld for fld in elem_type.MFIELDS if fld[0] == elem.variant_elem][0]
+                elem = getattr(elem, elem.variant_elem)
+            else:
+                field = elem_type.find_fdef(elem_type.MFIELDS, elem)
+
+            await dump_varint(self.iobj, 1)
+            await self.section_name(field[0])
+            try:
+                await self.field(elem, field[1], field[2:])
+            except Exception as e:
+                raise helpers.track_exception(e, self.tracker, helpers.TrackVariant, field[1]) from e
+            return
+
+        count = await load_varint(self.iobj)
+        if count != 1:
+            raise ValueError('Variant section has to have exactly one entry, got %s' % count)
+
+        fname = await self.section_name()
+        ent_type = await x.load_uint(self.iobj, 1)
+        for field in elem_type.MFIELDS:
+            if field[0] != fname:
+                continue
+
+            try:
+                fvalue = await self.field(None, field[1], field[2:], ent_type=ent_type)
+            except Exception as e:
+                raise helpers.track_exception(e, self.tracker, helpers.TrackVariant, field[1]) from e
+
+            if elem_type.WRAPS_VALUE:
+                elem = elem_type() if elem is None else elem
+                elem.set_variant(field[0], fvalue)
+                return elem
+            return fvalue
+        raise ValueError('Unknown tag: %s' % fname)
+
+    @staticmethod
+    def _check_type(ent_type, expected):
+        if ent_type != expected:
+            raise ValueError('Entry type 0x%x expected, got 0x%x' % (expected, ent_type))
+
+
+async def dump_kv(writer, msg, msg_type=None, **kwargs):
+    """
+    Dumps the message to the portable storage
+    :param writer:
+    :param msg:
+    :param msg_type:
+    :param kwargs: archive arguments
+    :return:
+    """
+    ar = KVArchive(writer, True, **kwargs)
+    return await ar.root_message(msg, msg_type=msg_type)
+
+
+async def load_kv(reader, msg_type, msg=None, **kwargs):
+    """
+    Loads the message from the portable storage
+    :param reader:
+    :param msg_type:
+    :param msg:
+    :param kwargs: archive arguments
+    :return:
+    """
+    ar = KVArchive(reader, False, **kwargs)
+    return await ar.root_message(msg, msg_type=msg_type)
+
+
 def container_is_raw(container_type, params):
     """
     Returns true if container is statically allocated array
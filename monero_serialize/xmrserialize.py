@@ -38,6 +38,10 @@ from .protobuf import const, load_uvarint, dump_uvarint
 
 _UINT_BUFFER = bytearray(1)
 
+# Length prefixed data bigger than this is read in chunks so a bogus length
+# fails on the end of the data before the whole buffer is allocated.
+_READ_CHUNK = 64 * 1024
+
 
 async def load_uint(reader, width):
     """
@@ -164,6 +168,110 @@ def dump_uint_b_into(n, width, buffer, offset=0):
     return buffer
 
 
+async def load_bytes(reader, size):
+    """
+    Reads size bytes from the reader to a new bytearray.
+    Bigger sizes are read incrementally, the buffer grows only as the data arrives.
+    :param reader:
+    :param size:
+    :return:
+    """
+    if size <= _READ_CHUNK:
+        fvalue = bytearray(size)
+        await reader.areadinto(fvalue)
+        return fvalue
+
+    fvalue = bytearray()
+    chunk = bytearray(_READ_CHUNK)
+    while len(fvalue) < size:
+        ln = min(_READ_CHUNK, size - len(fvalue))
+        if ln != len(chunk):
+            chunk = bytearray(ln)
+        nread = await reader.areadinto(chunk)
+        if nread is not None and nread < ln:
+            raise EOFError('Unexpected end of data')
+        fvalue += chunk
+    return fvalue
+
+
+class LimitExceeded(ValueError):
+    """
+    Decoded data exceeds the decode limits
+    """
+
+
+class DecodeLimits(object):
+    """
+    Bounds resources spent on decoding untrusted data.
+    Length prefixes are checked before anything is allocated for them.
+
+    - max_blob_size: maximal size of a single blob / string in bytes
+    - max_container_size: maximal number of elements in a single container / section
+    - max_depth: maximal nesting depth of the decoded fields
+    - max_total_size: maximal total size of all blobs / strings in bytes
+
+    None disables the particular limit. The object also holds the decoding state
+    (current depth, total size), archives work with own copy, see new_state().
+    """
+
+    def __init__(self, max_blob_size=None, max_container_size=None, max_depth=None, max_total_size=None):
+        self.max_blob_size = max_blob_size
+        self.max_container_size = max_container_size
+        self.max_depth = max_depth
+        self.max_total_size = max_total_size
+        self.depth = 0
+        self.total_size = 0
+
+    def new_state(self):
+        """
+        Returns limits with the same bounds and a fresh decoding state
+        :return:
+        """
+        return DecodeLimits(max_blob_size=self.max_blob_size, max_container_size=self.max_container_size,
+                            max_depth=self.max_depth, max_total_size=self.max_total_size)
+
+    def check_blob(self, size, skipped=False):
+        """
+        Checks blob / string length prefix
+        :param size:
+        :param skipped: the blob is skipped, not counted to the total size
+        :return:
+        """
+        if self.max_blob_size is not None and size > self.max_blob_size:
+            raise LimitExceeded('Blob size %s exceeds the limit %s' % (size, self.max_blob_size))
+        if skipped:
+            return
+
+        self.total_size += size
+        if self.max_total_size is not None and self.total_size > self.max_total_size:
+            raise LimitExceeded('Total size %s exceeds the limit %s' % (self.total_size, self.max_total_size))
+
+    def check_container(self, size):
+        """
+        Checks container size prefix
+        :param size:
+        :return:
+        """
+        if self.max_container_size is not None and size > self.max_container_size:
+            raise LimitExceeded('Container size %s exceeds the limit %s' % (size, self.max_container_size))
+
+    def enter(self):
+        """
+        Nesting level up
+        :return:
+        """
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            raise LimitExceeded('Nesting depth exceeds the limit %s' % self.max_depth)
+        self.depth += 1
+
+    def leave(self):
+        """
+        Nesting level down
+        :return:
+        """
+        self.depth -= 1
+
+
 def eq_obj_slots(l, r):
     """
     Compares objects with __slots__ defined
@@ -403,10 +511,22 @@ class MessageType(XmrType):
         dct = slot_obj_dict(self) if hasattr(self, '__slots__') else self.__dict__
         return '<%s: %s>' % (self.__class__.__name__, dct)
 
+    @classmethod
+    def _field_index(cls):
+        """
+        Field name -> field definition, built once per class
+        :return:
+        """
+        cached = cls.__dict__.get('_MFIELDS_INDEX')
+        if cached is None or cached[0] is not cls.MFIELDS:
+            cached = (cls.MFIELDS, {fld[0]: fld for fld in cls.MFIELDS})
+            cls._MFIELDS_INDEX = cached
+        return cached[1]
+
     def _field(self, fname=None, idx=None):
         fld = None
         if fname is not None:
-            fld = [x for x in self.MFIELDS if x[0] == fname][0]
+            fld = self._field_index()[fname]
         elif idx is not None:
             fld = self.MFIELDS[idx]
         return fld
@@ -422,11 +542,18 @@ class MemoryReaderWriter:
         self.nread = 0
         self.nwritten = 0
 
+    def remaining(self):
+        """
+        Number of bytes left to read
+        :return:
+        """
+        return len(self.buffer)
+
     async def areadinto(self, buf):
         ln = len(buf)
         nread = min(ln, len(self.buffer))
-        for idx in range(nread):
-            buf[idx] = self.buffer.pop(0)
+        buf[:nread] = bytes(self.buffer[:nread])
+        del self.buffer[:nread]
         self.nread += nread
         return nread
 
@@ -437,6 +564,49 @@ class MemoryReaderWriter:
         return nwritten
 
 
+class BufferReader(object):
+    """
+    AsyncReader over an in-memory buffer.
+    Reads from the current offset without consuming the buffer so the data can be revisited.
+    """
+
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+        self.nread = 0
+
+    def skip(self, size):
+        """
+        Moves the offset forward without reading the data
+        :param size:
+        :return:
+        """
+        if self.offset + size > len(self.buffer):
+            raise EOFError('Unexpected end of data, %s bytes missing' % (self.offset + size - len(self.buffer)))
+        self.offset += size
+        self.nread += size
+
+    def remaining(self):
+        """
+        Number of bytes left to read
+        :return:
+        """
+        return len(self.buffer) - self.offset
+
+    async def areadinto(self, buf):
+        ln = len(buf)
+        if self.offset + ln > len(self.buffer):
+            raise EOFError('Unexpected end of data, %s bytes missing' % (self.offset + ln - len(self.buffer)))
+
+        with memoryview(self.buffer) as mv:
+            with mv[self.offset:self.offset + ln] as chunk:
+                buf[:] = chunk
+
+        self.offset += ln
+        self.nread += ln
+        return ln
+
+
 class ElemRefObj:
     def __repr__(self):
         return 'RefObj'
@@ -577,10 +747,16 @@ class Archive(object):
     In order to use the archive for both ways we have to use so-called field references
     as we cannot directly modify given element as a parameter (value-passing) as its performed
     in C++ code. see: eref(), get_elem(), set_elem()
+
+    Decoding of untrusted data can be bounded by the DecodeLimits passed as `limits`.
+    Calls, bytes and time per field are accounted by the xmrstats.ArchiveStats passed as `stats`.
     """
-    def __init__(self, iobj, writing=True, **kwargs):
+    def __init__(self, iobj, writing=True, limits=None, stats=None, **kwargs):
         self.writing = writing
         self.iobj = iobj
+        self.limits = limits.new_state() if limits is not None else None
+        if stats is not None:
+            stats.attach(self)
 
     async def tag(self, tag):
         """
@@ -613,6 +789,14 @@ class Archive(object):
         :return:
         """
 
+    def data_left(self):
+        """
+        Number of bytes left in the reader, None if not known
+        :return:
+        """
+        remaining = getattr(self.iobj, 'remaining', None)
+        return remaining() if remaining is not None else None
+
     async def prepare_container(self, size, container, elem_type=None):
         """
         Prepares container for serialization
@@ -621,6 +805,15 @@ class Archive(object):
         :return:
         """
         if not self.writing:
+            if self.limits is not None:
+                self.limits.check_container(size)
+
+            # Each element other than a container takes at least one byte,
+            # the size derived from the decoded data cannot exceed the data left
+            remaining = self.data_left()
+            if remaining is not None and size > remaining and not is_type(elem_type, ContainerType):
+                raise EOFError('Unexpected end of data, %s elements in %s bytes' % (size, remaining))
+
             if container is None:
                 return gen_elem_array(size, elem_type)
 
@@ -675,7 +868,7 @@ class Archive(object):
         if self.writing:
             return await dump_unicode(self.iobj, elem)
         else:
-            return await load_unicode(self.iobj)
+            return await load_unicode(self.iobj, limits=self.limits)
 
     async def blob(self, elem=None, elem_type=None, params=None):
         """
@@ -690,7 +883,7 @@ class Archive(object):
         if self.writing:
             return await dump_blob(self.iobj, elem=elem, elem_type=elem_type, params=params)
         else:
-            return await load_blob(self.iobj, elem_type=elem_type, params=params, elem=elem)
+            return await load_blob(self.iobj, elem_type=elem_type, params=params, elem=elem, limits=self.limits)
 
     async def container(self, container=None, container_type=None, params=None):
         """
@@ -706,7 +899,7 @@ class Archive(object):
                                         field_archiver=self.dump_field)
         else:
             return await load_container(self.iobj, container_type, params=params, container=container,
-                                        field_archiver=self.load_field)
+                                        field_archiver=self.load_field, limits=self.limits)
 
     async def container_size(self, container_len=None, container_type=None, params=None):
         """
@@ -722,7 +915,10 @@ class Archive(object):
         if self.writing:
             return await dump_container_size(self.iobj, container_len, container_type, params)
         else:
-            raise ValueError('Not supported')
+            c_len = container_type.SIZE if container_type.FIX_SIZE else await load_uvarint(self.iobj)
+            if self.limits is not None:
+                self.limits.check_container(c_len)
+            return c_len
 
     async def container_val(self, elem, container_type, params=None):
         """
@@ -846,34 +1042,41 @@ class Archive(object):
         :return:
         """
         elem_type = elem_type if elem_type else elem.__class__
-        fvalue = None
-        if issubclass(elem_type, UVarintType):
-            fvalue = await self.uvarint(get_elem(elem))
+        limits = self.limits if not self.writing else None
+        if limits is not None:
+            limits.enter()
 
-        elif issubclass(elem_type, IntType):
-            fvalue = await self.uint(elem=get_elem(elem), elem_type=elem_type, params=params)
+        try:
+            fvalue = None
+            if issubclass(elem_type, UVarintType):
+                fvalue = await self.uvarint(get_elem(elem))
 
-        elif issubclass(elem_type, BlobType):
-            fvalue = await self.blob(elem=get_elem(elem), elem_type=elem_type, params=params)
+            elif issubclass(elem_type, IntType):
+                fvalue = await self.uint(elem=get_elem(elem), elem_type=elem_type, params=params)
 
-        elif issubclass(elem_type, UnicodeType):
-            fvalue = await self.unicode_type(get_elem(elem))
+            elif issubclass(elem_type, BlobType):
+                fvalue = await self.blob(elem=get_elem(elem), elem_type=elem_type, params=params)
 
-        elif issubclass(elem_type, VariantType):
-            fvalue = await self.variant(elem=get_elem(elem), elem_type=elem_type, params=params)
+            elif issubclass(elem_type, UnicodeType):
+                fvalue = await self.unicode_type(get_elem(elem))
 
-        elif issubclass(elem_type, ContainerType):  # container ~ simple list
-            fvalue = await self.container(container=get_elem(elem), container_type=elem_type, params=params)
+            elif issubclass(elem_type, VariantType):
+                fvalue = await self.variant(elem=get_elem(elem), elem_type=elem_type, params=params)
 
-        elif issubclass(elem_type, TupleType):  # tuple ~ simple list
-            fvalue = await self.tuple(elem=get_elem(elem), elem_type=elem_type, params=params)
+            elif issubclass(elem_type, ContainerType):  # container ~ simple list
+                fvalue = await self.container(container=get_elem(elem), container_type=elem_type, params=params)
 
-        elif issubclass(elem_type, MessageType):
-            fvalue = await self.message(get_elem(elem), msg_type=elem_type)
+            elif issubclass(elem_type, TupleType):  # tuple ~ simple list
+                fvalue = await self.tuple(elem=get_elem(elem), elem_type=elem_type, params=params)
 
-        else:
-            raise TypeError
+            elif issubclass(elem_type, MessageType):
+                fvalue = await self.message(get_elem(elem), msg_type=elem_type)
 
+            else:
+                raise TypeError
+        finally:
+            if limits is not None:
+                limits.leave()
         return fvalue if self.writing else set_elem(elem, fvalue)
 
     async def dump_field(self, writer, elem, elem_type, params=None):
@@ -913,7 +1116,7 @@ async def dump_blob(writer, elem, elem_type, params=None):
     await writer.awrite(data)
 
 
-async def load_blob(reader, elem_type, params=None, elem=None):
+async def load_blob(reader, elem_type, params=None, elem=None, limits=None):
     """
     Loads blob from reader to the element. Returns the loaded blob.
 
@@ -921,11 +1124,13 @@ async def load_blob(reader, elem_type, params=None, elem=None):
     :param elem_type:
     :param params:
     :param elem:
+    :param limits:
     :return:
     """
     ivalue = elem_type.SIZE if elem_type.FIX_SIZE else await load_uvarint(reader)
-    fvalue = bytearray(ivalue)
-    await reader.areadinto(fvalue)
+    if limits is not None:
+        limits.check_blob(ivalue)
+    fvalue = await load_bytes(reader, ivalue)
 
     if elem is None:
         return fvalue  # array by default
@@ -951,15 +1156,17 @@ async def dump_unicode(writer, elem):
     await writer.awrite(bytes(elem, 'utf8'))
 
 
-async def load_unicode(reader):
+async def load_unicode(reader, limits=None):
     """
     Loads UTF8 string
     :param reader:
+    :param limits:
     :return:
     """
     ivalue = await load_uvarint(reader)
-    fvalue = bytearray(ivalue)
-    await reader.areadinto(fvalue)
+    if limits is not None:
+        limits.check_blob(ivalue)
+    fvalue = await load_bytes(reader, ivalue)
     return str(fvalue, 'utf8')
 
 
@@ -1013,7 +1220,7 @@ async def dump_container(writer, container, container_type, params=None, field_a
         await field_archiver(writer, elem, elem_type, params[1:] if params else None)
 
 
-async def load_container(reader, container_type, params=None, container=None, field_archiver=None):
+async def load_container(reader, container_type, params=None, container=None, field_archiver=None, limits=None):
     """
     Loads container of elements from the reader. Supports the container ref.
     Returns loaded container.
@@ -1023,11 +1230,14 @@ async def load_container(reader, container_type, params=None, container=None, fi
     :param params:
     :param container:
     :param field_archiver:
+    :param limits:
     :return:
     """
     field_archiver = field_archiver if field_archiver else load_field
 
     c_len = container_type.SIZE if container_type.FIX_SIZE else await load_uvarint(reader)
+    if limits is not None:
+        limits.check_container(c_len)
     if container and c_len != len(container):
         raise ValueError('Size mismatch')
 
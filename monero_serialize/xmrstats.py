@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Archive instrumentation, counts calls, bytes and time per field type and per field path.
+
+Instrumentation is enabled by passing ArchiveStats to the archive constructor.
+The stats object then wraps the archive methods on the archive instance and the reader / writer,
+archives created without it run the original code paths, there is no cost when disabled.
+
+Field path is built from the message fields entered, `MessageType.field`, and from the tags
+emitted by the custom serializers, e.g., Transaction;Transaction.vin;TxinToKey.key_offsets
+or Transaction;rctsig_prunable;MGs;ss. The root is the type of the top-level message.
+
+>>> stats = ArchiveStats()
+>>> ar = xmrboost.Archive(reader, False, stats=stats)
+>>> await ar.root()
+>>> await ar.message(None, xmrtypes.Transaction)
+>>> print(stats.table('path'))
+>>> stats.write_folded(fh)  # flamegraph.pl / speedscope input
+'''
+
+import collections
+import time
+
+from . import xmrserialize as x
+
+
+class StatsEntry(object):
+    """
+    Accumulated counters of one field type or field path.
+    Total values include the nested entries, self values do not.
+    """
+    __slots__ = ('calls', 'bytes', 'time', 'self_bytes', 'self_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+        self.time = 0.0
+        self.self_bytes = 0
+        self.self_time = 0.0
+
+    def to_dict(self):
+        return collections.OrderedDict((k, getattr(self, k)) for k in self.__slots__)
+
+    def __repr__(self):
+        return '<StatsEntry: %s>' % dict(self.to_dict())
+
+
+class StatsReaderWriter(object):
+    """
+    Reader / writer wrapper counting the bytes passed through.
+    Other attributes are delegated to the wrapped object.
+    """
+
+    def __init__(self, iobj, stats):
+        self.iobj = iobj
+        self.stats = stats
+
+    async def areadinto(self, buf):
+        nread = await self.iobj.areadinto(buf)
+        self.stats.nbytes += nread
+        return nread
+
+    async def awrite(self, buf):
+        nwritten = await self.iobj.awrite(buf)
+        self.stats.nbytes += len(buf)
+        return nwritten
+
+    def skip(self, size):
+        res = self.iobj.skip(size)
+        self.stats.nbytes += size
+        return res
+
+    def __getattr__(self, item):
+        return getattr(self.iobj, item)
+
+
+def type_name(elem_type, params=None):
+    """
+    Field type name, containers with the element type given by params include it
+    :param elem_type:
+    :param params:
+    :return:
+    """
+    if params and issubclass(elem_type, x.ContainerType) and isinstance(params[0], type):
+        return '%s[%s]' % (elem_type.__name__, params[0].__name__)
+    return elem_type.__name__
+
+
+class ArchiveStats(object):
+    """
+    Instrumentation of x.Archive, xmrboost and xmrrpc archives.
+    One stats object can collect over several archives used one after another.
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.types = collections.OrderedDict()  # type name -> StatsEntry
+        self.paths = collections.OrderedDict()  # path tuple -> StatsEntry
+        self.nbytes = 0
+        self.path = []
+        self.type_frames = []  # [start time, start bytes, child time, child bytes]
+        self.path_frames = []
+        self.brackets = []  # begin_array / begin_object opened a path frame
+        self.pending_tag = None
+
+    def reset(self):
+        self.types.clear()
+        self.paths.clear()
+
+    def attach(self, ar):
+        """
+        Instruments the archive instance
+        :param ar:
+        :return:
+        """
+        ar.iobj = StatsReaderWriter(ar.iobj, self)
+        ar.field = self._wrap_field(ar.field)
+        ar.message_field = self._wrap_message_field(ar.message_field)
+        ar.message = self._wrap_message(ar, ar.message)
+        ar.tag = self._wrap_tag(ar.tag)
+        ar.begin_array = self._wrap_begin(ar.begin_array)
+        ar.begin_object = self._wrap_begin(ar.begin_object)
+        ar.end_array = self._wrap_end(ar.end_array)
+        ar.end_object = self._wrap_end(ar.end_object)
+        return ar
+
+    def _enter(self, frames):
+        frames.append([self.timer(), self.nbytes, 0.0, 0])
+
+    def _leave(self, frames, table, key):
+        t0, b0, child_time, child_bytes = frames.pop()
+        dt = self.timer() - t0
+        db = self.nbytes - b0
+        if frames:
+            frames[-1][2] += dt
+            frames[-1][3] += db
+
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = StatsEntry()
+        entry.calls += 1
+        entry.bytes += db
+        entry.time += dt
+        entry.self_bytes += db - child_bytes
+        entry.self_time += dt - child_time
+
+    def _push_path(self, name):
+        self.path.append(name)
+        self._enter(self.path_frames)
+
+    def _pop_path(self):
+        self._leave(self.path_frames, self.paths, tuple(self.path))
+        self.path.pop()
+
+    def _unwind(self, depth, brackets):
+        """
+        Closes path frames left open by unbalanced begin_array / begin_object
+        :param depth:
+        :param brackets:
+        :return:
+        """
+        while len(self.brackets) > brackets:
+            if self.brackets.pop():
+                self._pop_path()
+        while len(self.path) > depth:
+            self._pop_path()
+
+    def _wrap_field(self, fnc):
+        async def field(elem=None, elem_type=None, params=None, *args, **kwargs):
+            ftype = elem_type if elem_type else elem.__class__
+            tag, self.pending_tag = self.pending_tag, None
+            depth, brackets = len(self.path), len(self.brackets)
+            if tag is not None:
+                self._push_path(tag)
+
+            self._enter(self.type_frames)
+            try:
+                return await fnc(elem, elem_type, params, *args, **kwargs)
+            finally:
+                self._leave(self.type_frames, self.types, type_name(ftype, params))
+                self._unwind(depth, brackets)
+        return field
+
+    def _wrap_message_field(self, fnc):
+        async def message_field(msg, field, *args, **kwargs):
+            self.pending_tag = None
+            depth, brackets = len(self.path), len(self.brackets)
+            self._push_path('%s.%s' % (msg.__class__.__name__ if msg is not None else '?', field[0]))
+            try:
+                return await fnc(msg, field, *args, **kwargs)
+            finally:
+                self.pending_tag = None
+                self._unwind(depth, brackets)
+        return message_field
+
+    def _wrap_message(self, ar, fnc):
+        # The binary archive dumps plain messages in bulk, fields are entered one by one
+        # so the field paths are recorded.
+        plain = type(ar).message is x.Archive.message
+
+        async def message(msg, msg_type=None, *args, **kwargs):
+            elem_type = msg_type if msg_type is not None else msg.__class__
+            root = not self.path
+            if root:
+                self._push_path(elem_type.__name__)
+            try:
+                if plain and not hasattr(elem_type, 'serialize_archive'):
+                    msg = elem_type() if msg is None and not ar.writing else msg
+                    await ar.message_fields(msg, elem_type.MFIELDS)
+                    return msg if not ar.writing else None
+                return await fnc(msg, msg_type, *args, **kwargs)
+            finally:
+                if root:
+                    self._unwind(0, 0)
+        return message
+
+    def _wrap_tag(self, fnc):
+        async def tag(name):
+            self.pending_tag = name
+            return await fnc(name)
+        return tag
+
+    def _wrap_begin(self, fnc):
+        async def begin():
+            tag, self.pending_tag = self.pending_tag, None
+            self.brackets.append(tag is not None)
+            if tag is not None:
+                self._push_path(tag)
+            return await fnc()
+        return begin
+
+    def _wrap_end(self, fnc):
+        async def end():
+            res = await fnc()
+            if self.brackets and self.brackets.pop():
+                self._pop_path()
+            return res
+        return end
+
+    def _table(self, by):
+        if by == 'type':
+            return self.types
+        elif by == 'path':
+            return self.paths
+        raise ValueError('Unknown grouping: %s' % by)
+
+    def rows(self, by='path', sort='time'):
+        """
+        Flat table rows, sorted descending
+        :param by: type or path
+        :param sort: StatsEntry attribute
+        :return: list of (name, StatsEntry)
+        """
+        table = self._table(by)
+        rows = [(';'.join(k) if by == 'path' else k, v) for k, v in table.items()]
+        return sorted(rows, key=lambda r: getattr(r[1], sort), reverse=True)
+
+    def table(self, by='path', sort='time', limit=None):
+        """
+        Text table, self time is relative to the total self time
+        :param by: type or path
+        :param sort:
+        :param limit: number of rows
+        :return:
+        """
+        rows = self.rows(by, sort)[:limit]
+        total = sum(v.self_time for v in self._table(by).values()) or 1.0
+        lines = ['%-60s %10s %12s %12s %12s %7s' % (by, 'calls', 'bytes', 'time ms', 'self ms', 'self %')]
+        for name, e in rows:
+            lines.append('%-60s %10d %12d %12.3f %12.3f %6.2f%%' % (
+                name, e.calls, e.bytes, e.time * 1e3, e.self_time * 1e3, 100.0 * e.self_time / total))
+        return '\n'.join(lines)
+
+    def folded(self, metric='time'):
+        """
+        Folded stacks of the field paths, flamegraph input, one `path;to;field value` line per path.
+        Values are self values, time in microseconds.
+        :param metric: time, bytes or calls
+        :return: list of lines
+        """
+        res = []
+        for path, e in self.paths.items():
+            if metric == 'time':
+                val = int(round(e.self_time * 1e6))
+            elif metric == 'bytes':
+                val = e.self_bytes
+            elif metric == 'calls':
+                val = e.calls
+            else:
+                raise ValueError('Unknown metric: %s' % metric)
+            if val:
+                res.append('%s %d' % (';'.join(path), val))
+        return res
+
+    def write_folded(self, fh, metric='time'):
+        for line in self.folded(metric):
+            fh.write(line + '\n')
+
+    def to_dict(self):
+        """
+        Machine-readable stats
+        :return:
+        """
+        return collections.OrderedDict([
+            ('types', collections.OrderedDict((k, v.to_dict()) for k, v in self.types.items())),
+            ('paths', collections.OrderedDict((';'.join(k), v.to_dict()) for k, v in self.paths.items())),
+        ])
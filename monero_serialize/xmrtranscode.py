@@ -0,0 +1,504 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Streaming transcoding between the boost portable binary archive (xmrboost)
+and the Monero binary serialization (xmrserialize).
+
+The message schema is walked once, primitive values are read from the source archive
+and written to the destination archive right away. The object graph is not built,
+only the framing state is kept (variant tags, container sizes, version headers
+held by the boost archive).
+
+Transaction is the exception as the binary format does not store container sizes of
+the RingCT signatures. Sizes are taken from the streamed prefix, the small RctSigBase
+is materialized as the field order differs between the formats, the prunable part is streamed.
+
+>>> await boost_to_binary(reader, writer, xmr.Transaction)
+'''
+
+from . import xmrserialize as x
+from . import xmrboost as xmrb
+from . import xmrtypes as xmr
+
+
+class BinarySide(object):
+    """
+    Binary serialization framing
+    """
+    boost = False
+
+    def __init__(self, ar):
+        self.ar = ar
+
+    async def message_begin(self, msg_type):
+        """
+        Starts the message, returns fields in the serialization order
+        :param msg_type:
+        :return:
+        """
+        if hasattr(msg_type, 'serialize_archive'):
+            raise ValueError('Custom serialized message cannot be transcoded: %s' % msg_type.__name__)
+        return msg_type.MFIELDS
+
+    async def container_size(self, container_len, container_type, params=None):
+        """
+        Dumps / loads container size
+        :param container_len:
+        :param container_type:
+        :param params:
+        :return:
+        """
+        res = await self.ar.container_size(container_len, container_type, params)
+        return container_len if self.ar.writing else res
+
+    async def variant_tag(self, elem_type, params=None, fdef=None):
+        """
+        Dumps / loads variant tag, returns field definition of the variant
+        :param elem_type:
+        :param params:
+        :param fdef:
+        :return:
+        """
+        if self.ar.writing:
+            await x.dump_uint(self.ar.iobj, fdef[1].VARIANT_CODE, 1)
+            return fdef
+
+        tag = await x.load_uint(self.ar.iobj, 1)
+        for field in elem_type.MFIELDS:
+            if field[1].VARIANT_CODE == tag:
+                return field
+        raise ValueError('Unknown tag: %s' % tag)
+
+    async def tuple_begin(self, elem_type, fields, params=None):
+        """
+        Starts the tuple
+        :param elem_type:
+        :param fields:
+        :param params:
+        :return:
+        """
+        if self.ar.writing:
+            return await x.dump_uvarint(self.ar.iobj, len(fields))
+
+        c_len = await x.load_uvarint(self.ar.iobj)
+        if c_len != len(fields):
+            raise ValueError('Tuple size mismatch')
+
+
+class BoostSide(object):
+    """
+    Boost archive framing, versions are kept in the archive version database
+    """
+    boost = True
+
+    def __init__(self, ar):
+        self.ar = ar
+
+    async def message_begin(self, msg_type, use_version=None):
+        """
+        Starts the message, returns fields in the serialization order
+        :param msg_type:
+        :param use_version:
+        :return:
+        """
+        if hasattr(msg_type, 'boost_serialize'):
+            raise ValueError('Custom serialized message cannot be transcoded: %s' % msg_type.__name__)
+        version = await self.ar.version(msg_type, None) if use_version is None else use_version
+        return xmrb.get_boost_plan(msg_type).fields_for(version)
+
+    async def container_size(self, container_len, container_type, params=None):
+        """
+        Dumps / loads container version and size
+        :param container_len:
+        :param container_type:
+        :param params:
+        :return:
+        """
+        if hasattr(container_type, 'boost_serialize'):
+            raise ValueError('Custom serialized container cannot be transcoded: %s' % container_type.__name__)
+        if xmrb.container_is_versioned(container_type, params):
+            await self.ar.version(container_type, params)
+
+        res = await self.ar.container_size(container_len, container_type, params)
+        return container_len if self.ar.writing else res
+
+    async def variant_tag(self, elem_type, params=None, fdef=None):
+        """
+        Dumps / loads variant version and tag, returns field definition of the variant
+        :param elem_type:
+        :param params:
+        :param fdef:
+        :return:
+        """
+        await self.ar.version(elem_type, params)
+        if self.ar.writing:
+            await xmrb.dump_uvarint(self.ar.iobj, xmrb.variant_code(fdef[1]))
+            return fdef
+
+        tag = await xmrb.load_uvarint(self.ar.iobj)
+        for field in elem_type.MFIELDS:
+            if xmrb.variant_code(field[1]) == tag:
+                return field
+        raise ValueError('Unknown tag: %s' % tag)
+
+    async def tuple_begin(self, elem_type, fields, params=None):
+        """
+        Starts the tuple
+        :param elem_type:
+        :param fields:
+        :param params:
+        :return:
+        """
+        await self.ar.version(elem_type, params)
+
+
+def archive_side(ar):
+    """
+    Returns framing wrapper of the archive
+    :param ar:
+    :return:
+    """
+    return BoostSide(ar) if isinstance(ar, xmrb.Archive) else BinarySide(ar)
+
+
+class Transcoder(object):
+    """
+    Reads the source archive and writes the destination archive in a single pass.
+    One archive is boost, the other one is binary.
+
+    Field methods return the state needed by the callers: primitive value,
+    container size, variant field definition.
+    """
+
+    def __init__(self, src, dst):
+        if src.writing or not dst.writing:
+            raise ValueError('Source archive has to be reading, destination archive writing')
+
+        self.src = archive_side(src)
+        self.dst = archive_side(dst)
+        if self.src.boost == self.dst.boost:
+            raise ValueError('Transcoding between boost and binary archive only')
+
+        self.boost = self.src if self.src.boost else self.dst
+        self.plans = {}
+
+    async def transcode(self, msg_type):
+        """
+        Transcodes one message of the given type
+        :param msg_type:
+        :return:
+        """
+        if issubclass(msg_type, xmr.Transaction):
+            return await self.transaction()
+        return await self.message(msg_type)
+
+    async def field(self, elem_type, params=None):
+        """
+        Transcodes the field
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        if issubclass(elem_type, (x.UVarintType, x.IntType, x.BlobType, x.UnicodeType)):
+            return await self.primitive(elem_type, params)
+
+        elif issubclass(elem_type, x.VariantType):
+            return await self.variant(elem_type, params)
+
+        elif issubclass(elem_type, x.ContainerType):
+            return await self.container(elem_type, params)
+
+        elif issubclass(elem_type, x.TupleType):
+            return await self.tuple(elem_type, params)
+
+        elif issubclass(elem_type, x.MessageType):
+            return await self.message(elem_type)
+
+        else:
+            raise TypeError
+
+    async def primitive(self, elem_type, params=None):
+        """
+        Primitive value or container of primitive values, passed as a whole
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        fvalue = await self.src.ar.field(None, elem_type, params)
+        await self.dst.ar.field(fvalue, elem_type, params)
+        return fvalue
+
+    async def container(self, container_type, params=None):
+        """
+        Transcodes the container, returns the number of elements
+        :param container_type:
+        :param params:
+        :return:
+        """
+        elem_type = x.container_elem_type(container_type, params)
+        if xmrb.TypeWrapper.get(elem_type).elementary:
+            return len(await self.primitive(container_type, params))
+
+        c_len = await self.src.container_size(None, container_type, params)
+        await self.dst.container_size(c_len, container_type, params)
+
+        elem_params = params[1:] if params else None
+        for _ in range(c_len):
+            await self.field(elem_type, elem_params)
+        return c_len
+
+    async def implicit_size(self, container_len, container_type, params=None):
+        """
+        Container size present only in the boost archive
+        :param container_len: expected size
+        :param container_type:
+        :param params:
+        :return:
+        """
+        if self.boost is self.dst:
+            return await self.boost.container_size(container_len, container_type, params)
+
+        c_len = await self.boost.container_size(None, container_type, params)
+        if c_len != container_len:
+            raise ValueError('Container size mismatch, expected %s, got %s' % (container_len, c_len))
+        return c_len
+
+    async def implicit_container(self, container_type, params, sizes):
+        """
+        Container without the size in the binary serialization.
+        Sizes of the nested containers are given by the enclosing transaction.
+
+        :param container_type:
+        :param params:
+        :param sizes: container size for each nesting level
+        :return:
+        """
+        c_len = await self.implicit_size(sizes[0], container_type, params)
+        elem_type = x.container_elem_type(container_type, params)
+        elem_params = params[1:] if params else None
+        for _ in range(c_len):
+            if len(sizes) > 1:
+                await self.implicit_container(elem_type, elem_params, sizes[1:])
+            else:
+                await self.field(elem_type, elem_params)
+
+    async def tuple(self, elem_type, params=None):
+        """
+        Transcodes the tuple
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        elem_fields = params[0] if params else None
+        if elem_fields is None:
+            elem_fields = elem_type.MFIELDS
+
+        await self.src.tuple_begin(elem_type, elem_fields, params)
+        await self.dst.tuple_begin(elem_type, elem_fields, params)
+        for ftype in elem_fields:
+            await self.field(ftype, params[1:] if params else None)
+
+    async def variant_begin(self, elem_type, params=None):
+        """
+        Transcodes the variant tag, returns the variant field definition
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        fdef = await self.src.variant_tag(elem_type, params)
+        await self.dst.variant_tag(elem_type, params, fdef)
+        return fdef
+
+    async def variant(self, elem_type, params=None):
+        """
+        Transcodes the variant, returns the variant field definition
+        :param elem_type:
+        :param params:
+        :return:
+        """
+        fdef = await self.variant_begin(elem_type, params)
+        await self.field(fdef[1], fdef[2:])
+        return fdef
+
+    async def message(self, msg_type, record=False, use_version=None):
+        """
+        Transcodes the message.
+        Fields present only in the source archive are skipped.
+
+        :param msg_type:
+        :param record: returns {field name: field result} if True
+        :param use_version: boost version of the message, the version header is not present
+        :return:
+        """
+        src_fields = await self._message_begin(self.src, msg_type, use_version)
+        dst_fields = await self._message_begin(self.dst, msg_type, use_version)
+        plan = self._message_plan(msg_type, src_fields, dst_fields)
+
+        res = {} if record else None
+        for field, keep in plan:
+            if not keep:
+                await self.src.ar.field(None, field[1], field[2:])
+                continue
+
+            fvalue = await self.field(field[1], field[2:])
+            if record:
+                res[field[0]] = fvalue
+        return res
+
+    async def _message_begin(self, side, msg_type, use_version=None):
+        if side.boost:
+            return await side.message_begin(msg_type, use_version)
+        return await side.message_begin(msg_type)
+
+    def _message_plan(self, msg_type, src_fields, dst_fields):
+        """
+        Pairs source fields with the destination fields, result is cached
+        :param msg_type:
+        :param src_fields:
+        :param dst_fields:
+        :return: list of (field, keep)
+        """
+        key = (msg_type, id(src_fields), id(dst_fields))
+        plan = self.plans.get(key)
+        if plan is not None:
+            return plan
+
+        dst_names = [fld[0] for fld in dst_fields]
+        dst_set = set(dst_names)
+        plan = [(fld, fld[0] in dst_set) for fld in src_fields]
+        if [fld[0] for fld, keep in plan if keep] != dst_names:
+            raise ValueError('Fields of %s cannot be transcoded, source: %s, destination: %s'
+                             % (msg_type.__name__, [fld[0] for fld in src_fields], dst_names))
+
+        self.plans[key] = plan
+        return plan
+
+    async def transaction(self):
+        """
+        Transcodes the RingCT transaction.
+        Sizes needed by the binary serialization are recorded from the prefix.
+        :return:
+        """
+        version = await self.boost.ar.version(xmr.Transaction, None)
+
+        fields = xmr.TransactionPrefix._field_index()
+        tx_version = await self.field(fields['version'][1])
+        await self.field(fields['unlock_time'][1])
+        n_vin, mixin = await self.transaction_inputs(fields['vin'])
+        n_vout = await self.field(fields['vout'][1], fields['vout'][2:])
+        await self.field(fields['extra'][1], fields['extra'][2:])
+
+        if tx_version == 1:
+            raise ValueError('TxV1 not supported')
+
+        rsig = await self.rctsig_base(n_vin, n_vout)
+        if rsig.type != xmr.RctType.Null:
+            await self.rctsig_prunable(rsig.type, n_vin, n_vout, mixin)
+        return version
+
+    async def transaction_inputs(self, field):
+        """
+        Transcodes transaction inputs, returns the number of inputs and the mixin
+        :param field:
+        :return:
+        """
+        container_type, params = field[1], field[2:]
+        c_len = await self.src.container_size(None, container_type, params)
+        await self.dst.container_size(c_len, container_type, params)
+
+        mixin = 0
+        elem_type = x.container_elem_type(container_type, params)
+        for i in range(c_len):
+            fdef = await self.variant_begin(elem_type)
+            if i == 0 and fdef[1] is xmr.TxinToKey:
+                rec = await self.message(fdef[1], record=True)
+                mixin = rec['key_offsets'] - 1
+            else:
+                await self.field(fdef[1], fdef[2:])
+        return c_len, mixin
+
+    async def rctsig_base(self, inputs, outputs):
+        """
+        RctSigBase is materialized, it is small and the field order differs.
+        :param inputs:
+        :param outputs:
+        :return:
+        """
+        if self.src.boost:
+            rsig = await self.src.ar.message(None, xmr.RctSigBase)
+            if inputs > 0:
+                await rsig.serialize_rctsig_base(self.dst.ar, inputs, outputs)
+            return rsig
+
+        if inputs == 0:
+            rsig = xmr.RctSigBase(type=xmr.RctType.Null, txnFee=0, pseudoOuts=[], ecdhInfo=[], outPk=[])
+        else:
+            rsig = xmr.RctSigBase()
+            await rsig.serialize_rctsig_base(self.src.ar, inputs, outputs)
+
+        await self.dst.ar.message(rsig, xmr.RctSigBase)
+        return rsig
+
+    async def rctsig_prunable(self, rct_type, inputs, outputs, mixin):
+        """
+        Streams the prunable signature part
+        :param rct_type:
+        :param inputs:
+        :param outputs:
+        :param mixin:
+        :return:
+        """
+        if rct_type not in (xmr.RctType.Full, xmr.RctType.FullBulletproof,
+                            xmr.RctType.Simple, xmr.RctType.SimpleBulletproof):
+            raise ValueError('Unknown type')
+
+        bulletproof = rct_type in (xmr.RctType.FullBulletproof, xmr.RctType.SimpleBulletproof)
+        simple = rct_type in (xmr.RctType.Simple, xmr.RctType.SimpleBulletproof)
+        if bulletproof and self.dst.boost:
+            raise ValueError('Bulletproofs cannot be transcoded to boost, V is not in the binary serialization')
+
+        await self.boost.ar.version(xmr.RctSigPrunable, None)
+
+        n_range = 0 if bulletproof else outputs
+        await self.implicit_container(x.ContainerType, (xmr.RangeSig, ), [n_range])
+        if n_range == 0:
+            await self.implicit_container(x.ContainerType, (xmr.Bulletproof, ), [outputs if bulletproof else 0])
+
+        mg_elements = inputs if simple else 1
+        mg_ss2_elements = 1 + (1 if simple else inputs)
+        await self.implicit_size(mg_elements, x.ContainerType, (xmr.MgSig, ))
+        for _ in range(mg_elements):
+            await self.boost.message_begin(xmr.MgSig)
+            await self.implicit_container(xmr.KeyM, None, [mixin + 1, mg_ss2_elements])
+            await self.field(xmr.ECKey)
+
+        if n_range == 0:
+            await self.implicit_container(xmr.KeyV, None, [inputs if rct_type == xmr.RctType.SimpleBulletproof else 0])
+
+
+async def boost_to_binary(reader, writer, msg_type, **kwargs):
+    """
+    Transcodes the root boost message to the binary serialization
+    :param reader:
+    :param writer:
+    :param msg_type:
+    :param kwargs: source archive arguments
+    :return:
+    """
+    src = xmrb.Archive(reader, False, **kwargs)
+    await src.root()
+    return await Transcoder(src, x.Archive(writer, True)).transcode(msg_type)
+
+
+async def binary_to_boost(reader, writer, msg_type, **kwargs):
+    """
+    Transcodes the binary serialized message to the root boost message
+    :param reader:
+    :param writer:
+    :param msg_type:
+    :param kwargs: source archive arguments
+    :return:
+    """
+    dst = xmrb.Archive(writer, True)
+    await dst.root()
+    return await Transcoder(x.Archive(reader, False, **kwargs), dst).transcode(msg_type)
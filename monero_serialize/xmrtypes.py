@@ -270,10 +270,7 @@ class Bulletproof(x.MessageType):
         ('b', ECKey),
         ('t', ECKey),
     ]
-
-    async def boost_serialize(self, ar, version=None):
-        await ar.message_fields(self, [('V', ECKey)] + self.MFIELDS)
-        return self
+    BOOST_FIELDS = [('V', ECKey)] + MFIELDS
 
 
 class EcdhInfo(x.ContainerType):
@@ -398,10 +395,10 @@ class RctSigPrunable(x.MessageType):
         if type == RctType.SimpleBulletproof or type == RctType.FullBulletproof:
             await ar.tag('bp')
             await ar.begin_array()
+            await ar.prepare_container(outputs, eref(self, 'bulletproofs'), elem_type=Bulletproof)
             if len(self.bulletproofs) != outputs:
                 raise ValueError('Bulletproofs size mismatch')
 
-            await ar.prepare_container(outputs, eref(self, 'bulletproofs'), elem_type=Bulletproof)
             for i in range(len(self.bulletproofs)):
                 await ar.field(elem=eref(self.bulletproofs, i), elem_type=Bulletproof)
             await ar.end_array()
@@ -450,6 +447,7 @@ class RctSigPrunable(x.MessageType):
                 for k in range(mg_ss2_elements):
                     await ar.field(eref(self.MGs[i].ss[j], k), elem_type=KeyV.ELEM_TYPE)
                 await ar.end_array()
+            await ar.end_array()
 
             await ar.tag('cc')
             await ar.field(eref(self.MGs[i], 'cc'), elem_type=ECKey)
@@ -457,6 +455,7 @@ class RctSigPrunable(x.MessageType):
         await ar.end_array()
 
         if type == RctType.SimpleBulletproof:
+            await ar.tag('pseudoOuts')
             await ar.begin_array()
             await ar.prepare_container(inputs, eref(self, 'pseudoOuts'), elem_type=KeyV)
             if ar.writing and len(self.pseudoOuts) != inputs:
@@ -582,7 +581,7 @@ class Transaction(TransactionPrefix):
             raise ValueError('TxV1 not supported')
 
         else:
-            await ar.prepare_message(eref(self, 'rct_signatures'), RctSigBase)
+            await ar.prepare_message(eref(self, 'rct_signatures'), RctSig)
             await ar.message(self.rct_signatures, RctSigBase)
             if self.rct_signatures.type != RctType.Null:
                 await ar.prepare_message(eref(self.rct_signatures, 'p'), RctSigPrunable)
@@ -766,20 +765,18 @@ class TxSourceEntry(x.MessageType):
         ('mask', ECKey),
         ('multisig_kLRki', MultisigKLRki),
     ]
-
-    async def boost_serialize(self, ar, version):
-        if version < 1:
-            raise ValueError('TxSourceEntry v1 supported only')
-        await self._msg_field(ar, 'outputs')
-        await self._msg_field(ar, 'real_output')
-        await self._msg_field(ar, 'real_out_tx_key')
-        await self._msg_field(ar, 'real_output_in_tx_index')
-        await self._msg_field(ar, 'amount')
-        await self._msg_field(ar, 'rct')
-        await self._msg_field(ar, 'mask')
-        await self._msg_field(ar, 'multisig_kLRki')
-        await self._msg_field(ar, 'real_out_additional_tx_keys')
-        return self
+    BOOST_MIN_VERSION = 1
+    BOOST_FIELDS = [
+        'outputs',
+        'real_output',
+        'real_out_tx_key',
+        'real_output_in_tx_index',
+        'amount',
+        'rct',
+        'mask',
+        'multisig_kLRki',
+        'real_out_additional_tx_keys',
+    ]
 
 
 class TxDestinationEntry(x.MessageType):
@@ -813,28 +810,26 @@ class TransferDetails(x.MessageType):
         ('m_multisig_k', x.ContainerType, ECKey),
         ('m_multisig_info', x.ContainerType, MultisigInfo),
     ]
-
-    async def boost_serialize(self, ar, version):
-        if version < 9:
-            raise ValueError('TransferDetails v9 supported only')
-        await self._msg_field(ar, 'm_block_height')
-        await self._msg_field(ar, 'm_global_output_index')
-        await self._msg_field(ar, 'm_internal_output_index')
-        await self._msg_field(ar, 'm_tx')
-        await self._msg_field(ar, 'm_spent')
-        await self._msg_field(ar, 'm_key_image')
-        await self._msg_field(ar, 'm_mask')
-        await self._msg_field(ar, 'm_amount')
-        await self._msg_field(ar, 'm_spent_height')
-        await self._msg_field(ar, 'm_txid')
-        await self._msg_field(ar, 'm_rct')
-        await self._msg_field(ar, 'm_key_image_known')
-        await self._msg_field(ar, 'm_pk_index')
-        await self._msg_field(ar, 'm_subaddr_index')
-        await self._msg_field(ar, 'm_multisig_info')
-        await self._msg_field(ar, 'm_multisig_k')
-        await self._msg_field(ar, 'm_key_image_partial')
-        return self
+    BOOST_MIN_VERSION = 9
+    BOOST_FIELDS = [
+        'm_block_height',
+        'm_global_output_index',
+        'm_internal_output_index',
+        'm_tx',
+        'm_spent',
+        'm_key_image',
+        'm_mask',
+        'm_amount',
+        'm_spent_height',
+        'm_txid',
+        'm_rct',
+        'm_key_image_known',
+        'm_pk_index',
+        'm_subaddr_index',
+        'm_multisig_info',
+        'm_multisig_k',
+        'm_key_image_partial',
+    ]
 
 
 class TxConstructionData(x.MessageType):
@@ -851,21 +846,19 @@ class TxConstructionData(x.MessageType):
         ('subaddr_account', x.UInt32),
         ('subaddr_indices', x.ContainerType, x.UVarintType),  # original: x.UInt32
     ]
-
-    async def boost_serialize(self, ar, version):
-        if version < 2:
-            raise ValueError('TXConstruction v2 supported only')
-        await self._msg_field(ar, 'sources')
-        await self._msg_field(ar, 'change_dts')
-        await self._msg_field(ar, 'splitted_dsts')
-        await self._msg_field(ar, 'extra')
-        await self._msg_field(ar, 'unlock_time')
-        await self._msg_field(ar, 'use_rct')
-        await self._msg_field(ar, 'dests')
-        await self._msg_field(ar, 'subaddr_account')
-        await self._msg_field(ar, 'subaddr_indices')
-        await self._msg_field(ar, 'selected_transfers')
-        return self
+    BOOST_MIN_VERSION = 2
+    BOOST_FIELDS = [
+        'sources',
+        'change_dts',
+        'splitted_dsts',
+        'extra',
+        'unlock_time',
+        'use_rct',
+        'dests',
+        'subaddr_account',
+        'subaddr_indices',
+        'selected_transfers',
+    ]
 
 
 class PendingTransaction(x.MessageType):
@@ -884,23 +877,21 @@ class PendingTransaction(x.MessageType):
         ('multisig_sigs', x.ContainerType, MultisigStruct),
         ('construction_data', TxConstructionData),
     ]
-
-    async def boost_serialize(self, ar, version):
-        if version < 3:
-            raise ValueError('Pending transaction v3+ supported only')
-        await self._msg_field(ar, idx=0)
-        await self._msg_field(ar, idx=1)
-        await self._msg_field(ar, idx=2)
-        await self._msg_field(ar, idx=3)
-        await self._msg_field(ar, idx=4)
-        await self._msg_field(ar, 'key_images')
-        await self._msg_field(ar, 'tx_key')
-        await self._msg_field(ar, 'dests')
-        await self._msg_field(ar, 'construction_data')
-        await self._msg_field(ar, 'additional_tx_keys')
-        await self._msg_field(ar, 'selected_transfers')
-        await self._msg_field(ar, 'multisig_sigs')
-        return self
+    BOOST_MIN_VERSION = 3
+    BOOST_FIELDS = [
+        'tx',
+        'dust',
+        'fee',
+        'dust_added_to_fee',
+        'change_dts',
+        'key_images',
+        'tx_key',
+        'dests',
+        'construction_data',
+        'additional_tx_keys',
+        'selected_transfers',
+        'multisig_sigs',
+    ]
 
 
 class PendingTransactionVector(x.ContainerType):
@@ -915,6 +906,23 @@ class UnsignedTxSet(x.MessageType):
     ]
 
 
+async def iter_transfers(ar, skip_tx=False, fields=None):
+    """
+    Reads UnsignedTxSet from the boost archive, returns async iterator
+    over the transfers loaded one at a time. Transactions to sign are skipped.
+
+    :param ar: boost archive positioned at UnsignedTxSet, after the root header
+    :param skip_tx: skip the m_tx transaction prefix
+    :param fields: TransferDetails fields to load, None = all
+    :return:
+    """
+    await ar.version(UnsignedTxSet, None)
+    fields_idx = UnsignedTxSet._field_index()
+    await ar.skip_field(fields_idx['txes'][1], fields_idx['txes'][2:])
+    transfers = fields_idx['transfers']
+    return ar.iter_container(transfers[1], transfers[2:], fields=fields, skip=('m_tx', ) if skip_tx else None)
+
+
 class SignedTxSet(x.MessageType):
     BOOST_VERSION = 0
     MFIELDS = [
@@ -1,3 +1,7 @@
 #!/bin/bash
-./venv/bin/python3 -m unittest discover
+# ./test.sh --perf also runs the performance regression gate
+./venv/bin/python3 -m unittest discover || exit 1
+if [ "$1" == "--perf" ]; then
+    ./venv/bin/python3 -m monero_serialize.bench.gate
+fi
 #python -m unittest discover